@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+"""
+admission.py - online admission control for a running task set
+
+AdmissionController holds the admitted tasks and the core count and answers
+"can this task be added?" without rebuilding a TaskSet. It keeps the total
+utilization and density of the tasks as running sums and their densities in
+a max-heap (removals are lazy), so a check costs O(1) for the sums plus an
+amortized O(log n) heap lookup.
+
+Every job runs with its active backups, so the cores see activeBackups + 1
+copies of each task. A task is
+    - rejected if its WCET exceeds its deadline, or if the copies' total
+      utilization exceeds m (no scheduler can meet every deadline then)
+    - admitted if the copies pass the density bound for global EDF
+      (Goossens, Funk and Baruah; Bertogna et al. for constrained deadlines):
+          (k + 1) * sum(density) <= m - (m - 1) * max(density)
+      which for implicit deadlines is the GFB utilization bound
+    - otherwise checked by a bounded simulation of the task set with the new
+      task, fault-free, every task released periodically from its offset, for
+      one hyperperiod plus the largest offset and deadline. A missed deadline
+      rejects the task and a complete run without one admits it. A run cut
+      short by simulationTicks or simulationSeconds is "undecided" and the task
+      is not admitted. The simulation is a test of that one release pattern,
+      not a proof: global EDF has no critical instant, so sporadic releases
+      could still miss.
+Faults are not part of the analysis; the active backups are there to absorb
+them, and keeping cores in reserve means passing a smaller m.
+
+AdmissionDecision: whether a task is admitted and which test decided
+AdmissionController: the admitted tasks and the incremental tests
+"""
+
+import heapq
+import math
+from time import perf_counter
+from collections import namedtuple
+
+from taskset import Task, TaskSet
+from coreset import CoreSet
+import ftmgedf
+
+# decidedBy: "wcet", "utilization", "density", "simulation", or "undecided" when
+# the analysis cannot tell and simulation is off or cut short (the task is then
+# not admitted)
+AdmissionDecision = namedtuple("AdmissionDecision", ["admitted", "decidedBy", "utilization", "density"])
+
+# Sums and bounds closer than this are left to the simulation rather than to
+# floating point rounding
+TOLERANCE = 1e-9
+
+# Ticks simulated between checks of simulationSeconds
+SIMULATION_CHUNK = 16
+
+class AdmissionController(object):
+    def __init__(self, m, activeBackups=0, quantum=1, simulate=True, simulationTicks=1000, simulationSeconds=0.1):
+        """
+        m: cores the tasks may use
+        activeBackups: active backups of every job
+        quantum: tick length of the tasks' times; tasks given as taskset JSON
+                 dicts are converted with it
+        simulate: settle the cases the analysis cannot decide by simulation
+        simulationTicks: longest simulation run, in ticks
+        simulationSeconds: longest simulation run, in wall time
+        """
+        self.m = m
+        self.activeBackups = activeBackups
+        self.quantum = quantum
+        self.simulate = simulate
+        self.simulationTicks = simulationTicks
+        self.simulationSeconds = simulationSeconds
+
+        self.tasks = {}
+        self.utilization = 0.0 # of the tasks, one copy each
+        self.density = 0.0
+        self._densities = [] # (-density, taskId), including removed tasks until they surface
+
+    @staticmethod
+    def fromTaskSet(taskSet, m, **options):
+        """
+        Returns a controller holding every task of taskSet, admitted without checks.
+        """
+        controller = AdmissionController(m, taskSet.num_active_backups, quantum=taskSet.quantum, **options)
+        for task in taskSet:
+            controller._add(task)
+        return controller
+
+    def __contains__(self, taskId):
+        return taskId in self.tasks
+
+    def __len__(self):
+        return len(self.tasks)
+
+    @staticmethod
+    def taskUtilization(task):
+        # A one-shot (aperiodic) task has no long-run utilization
+        return task.wcet / task.period if task.period > 0 else 0.0
+
+    @staticmethod
+    def taskDensity(task):
+        window = min(task.relativeDeadline, task.period) if task.period > 0 else task.relativeDeadline
+        return task.wcet / window if window > 0 else math.inf
+
+    def maxDensity(self):
+        heap = self._densities
+        while heap and (heap[0][1] not in self.tasks or -heap[0][0] != self.taskDensity(self.tasks[heap[0][1]])):
+            heapq.heappop(heap) # removed, or replaced by a task with the same id
+        return -heap[0][0] if heap else 0.0
+
+    def _makeTask(self, task):
+        return task if isinstance(task, Task) else Task(task, self.quantum)
+
+    def check(self, task):
+        """
+        Returns the AdmissionDecision for adding task (a Task, or a taskset
+        JSON task dict), without adding it.
+        """
+        task = self._makeTask(task)
+        if task.id in self.tasks:
+            raise ValueError("Task {0} is already admitted".format(task.id))
+
+        copies = self.activeBackups + 1
+        utilization = self.utilization + self.taskUtilization(task)
+        density = self.density + self.taskDensity(task)
+        maxDensity = max(self.maxDensity(), self.taskDensity(task))
+
+        if task.wcet > task.relativeDeadline:
+            return AdmissionDecision(False, "wcet", utilization, density)
+        if copies * utilization > self.m + TOLERANCE:
+            return AdmissionDecision(False, "utilization", utilization, density)
+        if copies * density < self.m - (self.m - 1) * maxDensity - TOLERANCE:
+            return AdmissionDecision(True, "density", utilization, density)
+        meetsDeadlines = self._simulate(list(self.tasks.values()) + [task]) if self.simulate else None
+        if meetsDeadlines is None:
+            return AdmissionDecision(False, "undecided", utilization, density)
+        return AdmissionDecision(meetsDeadlines, "simulation", utilization, density)
+
+    def admit(self, task):
+        """
+        Adds task if it passes check() and returns the AdmissionDecision.
+        """
+        task = self._makeTask(task)
+        decision = self.check(task)
+        if decision.admitted:
+            self._add(task)
+        return decision
+
+    def _add(self, task):
+        self.tasks[task.id] = task
+        self.utilization += self.taskUtilization(task)
+        self.density += self.taskDensity(task)
+        heapq.heappush(self._densities, (-self.taskDensity(task), task.id))
+        if len(self._densities) > 2 * len(self.tasks) + 16:
+            # Mostly removed tasks: rebuild so churn does not grow the heap
+            self._densities = [(-self.taskDensity(t), t.id) for t in self.tasks.values()]
+            heapq.heapify(self._densities)
+
+    def remove(self, task):
+        """
+        Removes a task (a Task or a task id) and returns it.
+        """
+        taskId = task if isinstance(task, int) else task.id
+        removed = self.tasks.pop(taskId)
+        self.utilization -= self.taskUtilization(removed)
+        self.density -= self.taskDensity(removed)
+        if not self.tasks:
+            # Start the sums over rather than carry rounding into the next task set
+            self.utilization, self.density, self._densities = 0.0, 0.0, []
+        return removed
+
+    def _simulate(self, tasks):
+        """
+        Returns whether tasks meet every deadline in a fault-free run with
+        periodic releases from their offsets, for one hyperperiod plus the
+        largest offset and deadline. Returns None if the run would be longer
+        than simulationTicks or takes longer than simulationSeconds without a
+        miss; a miss found before then still returns False.
+        """
+        periods = [task.period for task in tasks if task.period > 0]
+        hyperperiod = 1
+        for period in periods:
+            hyperperiod = hyperperiod * period // math.gcd(hyperperiod, period)
+            if hyperperiod > self.simulationTicks:
+                break
+        horizon = hyperperiod + max(task.offset + task.relativeDeadline for task in tasks)
+        truncated = horizon > self.simulationTicks
+        horizon = min(horizon, self.simulationTicks)
+
+        data = {
+            "startTime": 0,
+            "endTime": horizon,
+            "taskset": [{"taskId": task.id, "period": task.period, "wcet": task.wcet,
+                         "deadline": task.relativeDeadline, "offset": task.offset} for task in tasks],
+        }
+        taskSet = TaskSet(data, active_backups=self.activeBackups, quantum=1)
+        ftm = ftmgedf.FtmGedfScheduler(taskSet, CoreSet(m=self.m, num_faulty=0))
+        ftm.startRun(0, horizon)
+        deadline = perf_counter() + self.simulationSeconds
+        while ftm.isRunning():
+            ftm.runUntil(ftm.time + SIMULATION_CHUNK)
+            if not ftm.doesMeetDeadlines():
+                return False
+            if perf_counter() > deadline and ftm.isRunning():
+                return None
+        ftm.finishRun()
+        if not ftm.doesMeetDeadlines():
+            return False
+        return None if truncated else True
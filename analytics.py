@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+
+"""
+analytics.py - per-task timing distributions for a built schedule
+
+ScheduleAnalytics: one row per executed job copy (primary or backup) with its
+    response time, lateness, preemption and migration counts and number of cores used,
+    grouped from the schedule's interval arrays in one vectorized pass
+"""
+
+import json
+
+import numpy as np
+
+class ScheduleAnalytics(object):
+    METRICS = ("responseTime", "lateness", "preemptions", "migrations", "coresUsed")
+    # Copy kinds; "primary" is backupId 0, "backup" is every active or passive backup
+    KINDS = ("primary", "backup", "all")
+    PERCENTILES = (50, 90, 95, 99, 100)
+
+    def __init__(self, schedule):
+        """
+        Groups the executed intervals of a post-processed schedule by
+        (taskId, jobId, backupId). Idle and fail intervals are ignored.
+        """
+        self.schedule = schedule
+        self.copies = self._groupCopies(schedule.getIntervalArrays())
+
+    def _groupCopies(self, arrays):
+        executed = arrays["taskId"] > 0
+        start = arrays["start"][executed]
+        end = arrays["end"][executed]
+        coreId = arrays["coreId"][executed]
+        taskId = arrays["taskId"][executed]
+        jobId = arrays["jobId"][executed]
+        backupId = arrays["backupId"][executed]
+        completed = arrays["completed"][executed]
+
+        # A migration is a segment that runs on another core than the copy's previous segment
+        byTime = np.lexsort((start, backupId, jobId, taskId))
+        migrated = np.zeros(len(byTime), dtype=np.int64)
+        if len(byTime) > 1:
+            sameCopy = (taskId[byTime][1:] == taskId[byTime][:-1]) & (jobId[byTime][1:] == jobId[byTime][:-1]) & (backupId[byTime][1:] == backupId[byTime][:-1])
+            migrated[1:] = sameCopy & (coreId[byTime][1:] != coreId[byTime][:-1])
+
+        # Sort by copy, then core, then time, so each copy is one contiguous run
+        # and the cores it used are runs inside it
+        order = np.lexsort((start, coreId, backupId, jobId, taskId))
+        start, end, coreId = start[order], end[order], coreId[order]
+        taskId, jobId, backupId, completed = taskId[order], jobId[order], backupId[order], completed[order]
+
+        n = len(order)
+        newCopy = np.ones(n, dtype=bool)
+        if n > 0:
+            newCopy[1:] = (taskId[1:] != taskId[:-1]) | (jobId[1:] != jobId[:-1]) | (backupId[1:] != backupId[:-1])
+        firstRows = np.flatnonzero(newCopy)
+
+        newCore = newCopy.copy()
+        if n > 0:
+            newCore[1:] |= coreId[1:] != coreId[:-1]
+
+        copies = {
+            "taskId": taskId[firstRows],
+            "jobId": jobId[firstRows],
+            "backupId": backupId[firstRows],
+        }
+        if n == 0:
+            copies["release"] = copies["deadline"] = copies["completion"] = np.zeros(0)
+            copies["segments"] = copies["coresUsed"] = copies["migrations"] = np.zeros(0, dtype=np.int64)
+            return self._addDerived(copies)
+
+        # A copy completes at the end of its completing interval; -inf marks copies that never did
+        completion = np.maximum.reduceat(np.where(completed, end, -np.inf), firstRows)
+        copies["completion"] = np.where(np.isfinite(completion), completion, np.nan)
+        copies["segments"] = np.diff(np.append(firstRows, n))
+        copies["coresUsed"] = np.add.reduceat(newCore.astype(np.int64), firstRows)
+        # Both orders group the rows by copy the same way, so firstRows fits byTime too
+        copies["migrations"] = np.add.reduceat(migrated, firstRows)
+
+        copies["release"], copies["deadline"] = self._releasesAndDeadlines(copies["taskId"], copies["jobId"])
+        return self._addDerived(copies)
+
+    def _releasesAndDeadlines(self, taskIds, jobIds):
+        """
+        Looks up each copy's release time and absolute deadline from the
+        primaries in the task set. Backups share both with their primary.
+        """
+        jobs = [job for task in self.schedule.taskSet for job in task.getJobs() if job.backupId == 0]
+        jobTasks = np.array([job.task.id for job in jobs], dtype=np.int64)
+        jobIds_ = np.array([job.id for job in jobs], dtype=np.int64)
+        releases = np.array([job.releaseTime for job in jobs], dtype=np.float64)
+        deadlines = np.array([job.deadline for job in jobs], dtype=np.float64)
+
+        # Encode (taskId, jobId) as one sortable integer
+        width = int(max(jobIds_.max(initial=0), jobIds.max(initial=0))) + 1
+        known = jobTasks * width + jobIds_
+        order = np.argsort(known)
+        wanted = taskIds * width + jobIds
+        position = np.clip(np.searchsorted(known[order], wanted), 0, max(len(known) - 1, 0))
+        if len(known) == 0 or not np.array_equal(known[order][position], wanted):
+            raise ValueError("Schedule contains jobs that are not in the task set")
+        rows = order[position]
+        return releases[rows], deadlines[rows]
+
+    def _addDerived(self, copies):
+        copies["responseTime"] = copies["completion"] - copies["release"]
+        copies["lateness"] = copies["completion"] - copies["deadline"]
+        copies["preemptions"] = copies["segments"] - 1
+        copies["missed"] = ~(copies["lateness"] <= 0) # incomplete copies count as missed
+        return copies
+
+    def taskIds(self):
+        return [int(x) for x in np.unique(self.copies["taskId"])]
+
+    def mask(self, taskId=None, kind="all"):
+        """
+        Returns the boolean row mask selecting one task's copies (or every
+        task's, with taskId None) of the given kind.
+        """
+        if kind not in ScheduleAnalytics.KINDS:
+            raise ValueError("Unknown copy kind: {0}".format(kind))
+
+        selected = np.ones(len(self.copies["taskId"]), dtype=bool)
+        if taskId is not None:
+            selected &= self.copies["taskId"] == taskId
+        if kind == "primary":
+            selected &= self.copies["backupId"] == 0
+        elif kind == "backup":
+            selected &= self.copies["backupId"] > 0
+        return selected
+
+    def values(self, metric, taskId=None, kind="all"):
+        """
+        Returns the metric for the selected copies. Response time and lateness
+        only exist for copies that completed.
+        """
+        if metric not in ScheduleAnalytics.METRICS:
+            raise ValueError("Unknown metric: {0}".format(metric))
+
+        selected = self.copies[metric][self.mask(taskId, kind)]
+        if metric in ("responseTime", "lateness"):
+            selected = selected[~np.isnan(selected)]
+        return selected
+
+    def percentiles(self, metric, taskId=None, kind="all", percentiles=PERCENTILES):
+        selected = self.values(metric, taskId, kind)
+        if len(selected) == 0:
+            return {}
+        points = np.percentile(selected, percentiles)
+        return dict(("p{0}".format(p), float(v)) for (p, v) in zip(percentiles, points))
+
+    def histogram(self, metric, taskId=None, kind="all", bins=10):
+        """
+        Returns {"edges": [...], "counts": [...]}. Preemptions, migrations and
+        cores used are counted per integer value; the times use bins equal-width bins.
+        """
+        selected = self.values(metric, taskId, kind)
+        if metric in ("preemptions", "migrations", "coresUsed"):
+            counts = np.bincount(selected.astype(np.int64)) if len(selected) else np.zeros(0, dtype=np.int64)
+            edges = np.arange(len(counts) + 1)
+        else:
+            counts, edges = np.histogram(selected, bins=bins)
+        return {"edges": [float(e) for e in edges], "counts": [int(c) for c in counts]}
+
+    def work(self):
+        """
+        Returns {taskId: {"executed", "useful", "wasted", "overhead"}} and a
+        "total" entry. executed is the time any copy of the task's jobs ran,
+        useful is one WCET per completed job, and wasted is the rest: copies
+        lost to faults, cancelled, or still running after another copy had
+        completed, and the preemption and migration overhead charged to them
+        (also given separately as overhead).
+        """
+        arrays = self.schedule.getIntervalArrays()
+        executed = arrays["taskId"] > 0
+        taskIds = arrays["taskId"][executed]
+        durations = (arrays["end"] - arrays["start"])[executed]
+
+        completed = ~np.isnan(self.copies["completion"])
+        completedJobs = np.unique(np.stack([self.copies["taskId"][completed], self.copies["jobId"][completed]], axis=1), axis=0)
+
+        result = {}
+        overheads = {}
+        for (key, ticks) in self.schedule.overheads.items():
+            overheads[key[0]] = overheads.get(key[0], 0) + ticks
+
+        totals = {"executed": 0.0, "useful": 0.0, "wasted": 0.0, "overhead": 0.0}
+        for taskId in self.taskIds():
+            task = self.schedule.taskSet.getTaskById(taskId)
+            entry = {
+                "executed": float(durations[taskIds == taskId].sum()),
+                "useful": float((completedJobs[:, 0] == taskId).sum() * task.wcet) if len(completedJobs) else 0.0,
+            }
+            entry["wasted"] = entry["executed"] - entry["useful"]
+            entry["overhead"] = float(overheads.get(taskId, 0))
+            for key in totals:
+                totals[key] += entry[key]
+            result[taskId] = entry
+        result["total"] = totals
+        return result
+
+    def summary(self, bins=10, percentiles=PERCENTILES):
+        """
+        Returns {taskId: {kind: {...}}} with copy and miss counts and, per
+        metric, the mean, percentiles and histogram, plus the task's "work"
+        entry from work().
+        """
+        result = {}
+        work = self.work()
+        for taskId in self.taskIds():
+            result[taskId] = {"work": work[taskId]}
+            for kind in ScheduleAnalytics.KINDS:
+                selected = self.mask(taskId, kind)
+                if not selected.any():
+                    continue
+
+                entry = {
+                    "copies": int(selected.sum()),
+                    "completed": int((~np.isnan(self.copies["completion"][selected])).sum()),
+                    "missed": int(self.copies["missed"][selected].sum()),
+                }
+                for metric in ScheduleAnalytics.METRICS:
+                    values = self.values(metric, taskId, kind)
+                    entry[metric] = {
+                        "mean": float(values.mean()) if len(values) else None,
+                        "percentiles": self.percentiles(metric, taskId, kind, percentiles),
+                        "histogram": self.histogram(metric, taskId, kind, bins),
+                    }
+                result[taskId][kind] = entry
+        return result
+
+    def toJson(self, indent=2, bins=10):
+        return json.dumps(self.summary(bins), indent=indent, sort_keys=True)
+
+    def report(self, metric="responseTime", percentiles=PERCENTILES):
+        """
+        Returns a plain-text table of one metric's percentiles per task and kind.
+        """
+        header = "{0:<6} {1:<8} {2:>7}".format("task", "kind", "copies")
+        for p in percentiles:
+            header += " {0:>9}".format("p{0}".format(p))
+        lines = [metric, header]
+
+        for taskId in self.taskIds():
+            for kind in ScheduleAnalytics.KINDS:
+                count = int(self.mask(taskId, kind).sum())
+                if count == 0:
+                    continue
+                points = self.percentiles(metric, taskId, kind, percentiles)
+                line = "{0:<6} {1:<8} {2:>7}".format(taskId, kind, count)
+                for p in percentiles:
+                    value = points.get("p{0}".format(p))
+                    line += " {0:>9}".format("-" if value is None else "{0:.2f}".format(value))
+                lines.append(line)
+        return "\n".join(lines)
+
+    def workReport(self):
+        work = self.work()
+        lines = ["work", "{0:<6} {1:>10} {2:>10} {3:>10} {4:>10}".format("task", "executed", "useful", "wasted", "overhead")]
+        for taskId in self.taskIds() + ["total"]:
+            entry = work[taskId]
+            lines.append("{0:<6} {1:>10.1f} {2:>10.1f} {3:>10.1f} {4:>10.1f}".format(taskId, entry["executed"], entry["useful"], entry["wasted"], entry["overhead"]))
+        return "\n".join(lines)
+
+    def printReport(self):
+        for metric in ScheduleAnalytics.METRICS:
+            print("")
+            print(self.report(metric))
+        print("")
+        print(self.workReport())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+
+"""
+batchsim.py - many Monte Carlo trials of FTM-GEDF advanced in lockstep
+
+Every trial of a sweep cell runs the same task set on the same cores, and
+only the faults differ. BatchGedfSimulator keeps B such trials in NumPy arrays
+(remaining time of each job copy, completed jobs, the copy on each core, the
+burst/gap fault state of each faulty core) and advances all of them one tick
+at a time. Trials that finish are dropped from the arrays, so the remaining
+ones do not pay for them.
+
+The model is FtmGedfScheduler's without overheads or affinity and with the
+default BurstyFaultModel. Within a tick the cores are decided one at a time,
+as getLowestPriorityCoreGEDF picks them, the same step for every trial:
+    - the next core is the first one not executing (failed or idle), else the
+      one running the latest deadline; a completed copy stays on its core as
+      executing until the core is decided
+    - a failed core loses its copy; a working one first releases the passive
+      backups of jobs whose every copy was lost, then takes the first queued
+      copy if it ranks at least as high as its own, by (deadline, task id)
+    - a preempted copy is queued again behind its job's other queued copies
+    - a job misses its deadline if a copy finishes at or after it while the
+      job is incomplete
+    - with cancelSiblings, a completing copy cancels its siblings at once, so
+      the cores they ran on are decided again in the same tick
+    - once nothing is queued, the copies on the cores finish without faults,
+      and any that finishes late counts a miss as in finishRun
+    - once every core has failed permanently the run ends, and every job
+      that has not completed counts as a miss
+Faults come from one seeded generator per run rather than from the global
+generators, so the results match FtmGedfScheduler statistically, not trial
+by trial; without faults they match exactly. sweep.compareEngines checks the
+agreement.
+
+BatchGedfSimulator: runs batches of trials of one task set and core set
+runBatchTrials: sweep-style results for a number of trials
+"""
+
+import numpy as np
+
+from taskset import TaskSet
+from coreset import CoreSet
+
+class BatchGedfSimulator(object):
+    def __init__(self, taskSet, coreSetParams, cancelSiblings=False):
+        """
+        taskSet: a TaskSet; its active backups give the copies per job
+        coreSetParams: keyword arguments for CoreSet
+        cancelSiblings: drop the other copies of a job once one completes
+        """
+        coreSet = CoreSet(**coreSetParams)
+        coreSet.setQuantum(taskSet.quantum)
+        self.m = coreSet.m
+        self.numFaulty = coreSet.num_faulty
+        self.lambda_c = coreSet.lambda_c
+        self.lambda_b = coreSet.lambda_b
+        self.lambda_r = coreSet.lambda_r
+        self.burstProb = coreSet.lBurstProb
+        self.gapProb = coreSet.lGapProb
+        self.periodScaler = coreSet.fault_period_scaler
+        self.cancelSiblings = cancelSiblings
+
+        # Jobs in priority order; copy s of job j is column j * copies + s
+        jobs = sorted((job for job in taskSet.jobs if job.backupId == 0), key=lambda x: (x.deadline, x.task.id, x.id))
+        self.numJobs = len(jobs)
+        self.copies = taskSet.num_active_backups + 1
+        self.release = np.array([job.releaseTime for job in jobs], dtype=np.int64)
+        self.deadline = np.array([job.deadline for job in jobs], dtype=np.int64)
+        self.wcet = np.array([job.task.wcet for job in jobs], dtype=np.int64)
+        self.lastRelease = int(self.release.max()) if self.numJobs else -1
+
+        # windowEnd[i]: one past the last job (in priority order) among the
+        # first i+1 released; jobs after it are not released by then
+        byRelease = np.argsort(self.release, kind="stable")
+        self.releaseSorted = self.release[byRelease]
+        self.windowEnd = np.maximum.accumulate(byRelease) + 1 if self.numJobs else np.zeros(0, dtype=np.int64)
+
+    def run(self, trials, seed=0, stopAtFirstMiss=False, batchSize=4096):
+        """
+        Runs trials trials and returns a dict of arrays, one entry per trial:
+        meetsDeadlines, missedJobs (jobs completed after their deadline),
+        ticks (the first tick with nothing queued, like FtmGedfScheduler.time
+        after a run), executedWork and wastedWork.
+
+        stopAtFirstMiss: end a trial as soon as a miss is certain; faster when
+        only meetsDeadlines is needed (missedJobs then counts up to that point)
+        """
+        rng = np.random.default_rng(seed)
+        results = {
+            "meetsDeadlines": np.zeros(trials, dtype=bool),
+            "missedJobs": np.zeros(trials, dtype=np.int64),
+            "ticks": np.zeros(trials, dtype=np.int64),
+            "executedWork": np.zeros(trials, dtype=np.int64),
+            "wastedWork": np.zeros(trials, dtype=np.int64),
+        }
+        for start in range(0, trials, batchSize):
+            stop = min(start + batchSize, trials)
+            self._runBatch(stop - start, rng, stopAtFirstMiss, results, start)
+        return results
+
+    def _runBatch(self, b, rng, stopAtFirstMiss, results, offset):
+        m, F, S, J = self.m, self.numFaulty, self.copies, self.numJobs
+        colWcet = np.repeat(self.wcet, S)
+        colRelease = np.repeat(self.release, S)
+        colDeadline = np.repeat(self.deadline, S)
+        colJob = np.repeat(np.arange(J, dtype=np.int64), S)
+        coreIds = np.arange(m)
+        NONE = np.iinfo(np.int64).max
+        # Queue order of a copy: its job's priority, then when it was queued
+        # (copies start in copy order; a preempted or passive copy goes last)
+        JOB = np.int64(1) << 40
+
+        trialIds = np.arange(offset, offset + b)
+        remaining = np.tile(colWcet, (b, 1))
+        alive = np.ones((b, J * S), dtype=bool) # queued, not yet released or on a core
+        onCore = np.zeros((b, J * S), dtype=bool)
+        order = np.tile(colJob * JOB + np.tile(np.arange(S), J), (b, 1))
+        complete = np.zeros((b, J), dtype=bool)
+        missedJob = np.zeros((b, J), dtype=bool)
+        # Copy on each core, or -1; a copy that completed stays until the core is scheduled again
+        coreJob = np.full((b, m), -1, dtype=np.int64)
+        permFailed = np.zeros((b, m), dtype=bool)
+        periodStart = np.zeros((b, F), dtype=np.int64)
+        burstLength = np.zeros((b, F), dtype=np.int64)
+        gapLength = np.zeros((b, F), dtype=np.int64)
+        lostCopies = np.zeros(b, dtype=bool) # since the last passive backup check
+        certainMiss = np.zeros(b, dtype=bool)
+        executed = np.zeros(b, dtype=np.int64)
+        queuedCount = S
+
+        lo = 0
+        t = 0
+        while len(trialIds) > 0:
+            released = np.searchsorted(self.releaseSorted, t, side="right")
+            hi = int(self.windowEnd[released - 1]) if released > 0 else 0
+            # Jobs before lo are complete with no copy left in any trial
+            while lo < hi and not alive[:, lo * S:(lo + 1) * S].any() and complete[:, lo].all():
+                lo += 1
+            w0, w1 = lo * S, hi * S
+            queued = alive[:, w0:w1] & ~onCore[:, w0:w1] & (colRelease[w0:w1] <= t)
+
+            # Nothing queued once every job is released: the run finishes what is on the cores
+            finishing = ~queued.any(axis=1) & (t > self.lastRelease)
+            if finishing.any():
+                self._finishOnCores(finishing, t, coreJob, alive, remaining, complete, missedJob, executed, colJob,
+                                    colDeadline)
+                self._report(results, trialIds[finishing], missedJob[finishing], t, executed[finishing],
+                             complete[finishing], True)
+                keep = ~finishing
+                trialIds, remaining, alive, onCore, order = trialIds[keep], remaining[keep], alive[keep], onCore[keep], order[keep]
+                complete, missedJob, coreJob, permFailed = complete[keep], missedJob[keep], coreJob[keep], permFailed[keep]
+                periodStart, burstLength, gapLength = periodStart[keep], burstLength[keep], gapLength[keep]
+                lostCopies, certainMiss, executed, queued = lostCopies[keep], certainMiss[keep], executed[keep], queued[keep]
+                if len(trialIds) == 0:
+                    break
+            b = len(trialIds)
+            rows = np.arange(b)
+
+            # Faults, drawn like BurstyFaultModel for every faulty core still alive
+            inactive = permFailed.copy()
+            if F > 0:
+                newPeriod = t >= periodStart + burstLength + gapLength
+                count = int(newPeriod.sum())
+                if count:
+                    periodStart[newPeriod] = t
+                    burstLength[newPeriod] = rng.geometric(self.burstProb, count) * self.periodScaler
+                    gapLength[newPeriod] = rng.geometric(self.gapProb, count) * self.periodScaler
+                cutoff = rng.random((b, F))
+                bursty = t < periodStart + burstLength
+                sampled = ~permFailed[:, :F]
+                permanent = sampled & (cutoff < self.lambda_c)
+                transient = sampled & ~permanent & (cutoff < np.where(bursty, self.lambda_b, self.lambda_r))
+                permFailed[:, :F] |= permanent
+                inactive[:, :F] |= permanent | transient
+
+            # The cores are scheduled one at a time like in FtmGedfScheduler: idle
+            # and failing cores by id, then running ones from the lowest priority
+            queueKey = np.where(queued, order[:, w0:w1], NONE)
+            scheduled = np.zeros((b, m), dtype=bool)
+            for step in range(m):
+                onCores = coreJob >= 0
+                busy = onCores & ~inactive
+                coreKey = np.where(busy, -colDeadline[np.maximum(coreJob, 0)] * m + coreIds, coreIds - NONE // 2)
+                core = np.argmin(np.where(scheduled, NONE, coreKey), axis=1)
+                scheduled[rows, core] = True
+                previous = coreJob[rows, core]
+                down = inactive[rows, core]
+
+                # A failing core loses its copy
+                lost = down & (previous >= 0)
+                if lost.any():
+                    lostRows, lostColumns = rows[lost], previous[lost]
+                    live = alive[lostRows, lostColumns]
+                    alive[lostRows[live], lostColumns[live]] = False
+                    onCore[lostRows[live], lostColumns[live]] = False
+                    lostCopies[lostRows[live]] = True
+                    coreJob[rows[down], core[down]] = -1
+
+                up = ~down
+                # Passive backups for incomplete jobs with no copy left, before the core picks a job
+                check = up & lostCopies
+                if check.any():
+                    queuedCount = self._releasePassive(rows[check], lo, hi, alive, complete, remaining, order,
+                                                       queueKey, colWcet, queuedCount)
+                    lostCopies[check] = False
+
+                # The first queued copy preempts a lower-priority (or, as in the
+                # queue, an equal-priority) copy; the preempted one is queued again
+                if w1 > w0:
+                    top = np.argmin(queueKey, axis=1)
+                    hasTop = queueKey[rows, top] < NONE
+                else:
+                    top = np.zeros(b, dtype=np.int64)
+                    hasTop = np.zeros(b, dtype=bool)
+                topColumn = np.minimum(top + w0, J * S - 1)
+                previousSafe = np.maximum(previous, 0)
+                previousLive = (previous >= 0) & alive[rows, previousSafe]
+                preempt = up & hasTop & (~previousLive | (colJob[topColumn] <= colJob[previousSafe]))
+
+                back = preempt & previousLive
+                if back.any():
+                    backRows, backColumns = rows[back], previous[back]
+                    onCore[backRows, backColumns] = False
+                    order[backRows, backColumns] = colJob[backColumns] * JOB + queuedCount + np.arange(len(backRows))
+                    queuedCount += len(backRows)
+                    queueKey[backRows, backColumns - w0] = order[backRows, backColumns]
+
+                job = np.where(preempt, topColumn, np.where(previousLive, previous, -1))
+                takeRows = rows[preempt]
+                onCore[takeRows, topColumn[preempt]] = True
+                queueKey[takeRows, top[preempt]] = NONE
+                coreJob[rows[up], core[up]] = job[up]
+
+                # Execute one tick
+                running = up & (job >= 0)
+                runRows, runColumns = rows[running], job[running]
+                remaining[runRows, runColumns] -= 1
+                executed[runRows] += 1
+                done = remaining[runRows, runColumns] == 0
+                if done.any():
+                    doneRows, doneColumns = runRows[done], runColumns[done]
+                    doneJobs = colJob[doneColumns]
+                    late = (t >= self.deadline[doneJobs]) & ~complete[doneRows, doneJobs]
+                    missedJob[doneRows[late], doneJobs[late]] = True
+                    complete[doneRows, doneJobs] = True
+                    alive[doneRows, doneColumns] = False
+                    onCore[doneRows, doneColumns] = False
+                    if self.cancelSiblings:
+                        self._cancelSiblings(doneRows, doneJobs, w0, alive, onCore, coreJob, inactive, queueKey,
+                                             colJob)
+
+            # An incomplete job whose deadline has come will complete late
+            if stopAtFirstMiss:
+                certainMiss |= missedJob.any(axis=1)
+                certainMiss |= (~complete[:, lo:hi] & (self.deadline[lo:hi] <= t + 1)).any(axis=1)
+
+            t += 1
+            # With every core failed for good, the remaining jobs can never complete
+            stuck = permFailed.all(axis=1)
+            missedJob[stuck] |= ~complete[stuck]
+            over = stuck | certainMiss
+            if over.any():
+                self._report(results, trialIds[over], missedJob[over], t, executed[over], complete[over], False)
+                keep = ~over
+                trialIds, remaining, alive, onCore, order = trialIds[keep], remaining[keep], alive[keep], onCore[keep], order[keep]
+                complete, missedJob, coreJob, permFailed = complete[keep], missedJob[keep], coreJob[keep], permFailed[keep]
+                periodStart, burstLength, gapLength = periodStart[keep], burstLength[keep], gapLength[keep]
+                lostCopies, certainMiss, executed = lostCopies[keep], certainMiss[keep], executed[keep]
+
+    def _report(self, results, ids, missedJob, t, executed, complete, finished):
+        """
+        Writes the results of the trials ids, which ended at tick t
+        (finished: ran to the end; otherwise stuck or a certain miss).
+        """
+        missed = missedJob.sum(axis=1)
+        results["meetsDeadlines"][ids] = (missed == 0) & finished
+        results["missedJobs"][ids] = missed
+        results["ticks"][ids] = t
+        results["executedWork"][ids] = executed
+        results["wastedWork"][ids] = executed - (complete * self.wcet[None, :]).sum(axis=1)
+
+    def _releasePassive(self, rows, lo, hi, alive, complete, remaining, order, queueKey, colWcet, queuedCount):
+        """
+        Queues a passive backup (in the first copy's column) for every
+        released, incomplete job of rows with no copy left. Returns the
+        updated queue sequence.
+        """
+        S = self.copies
+        aliveJobs = alive[rows, lo * S:hi * S].reshape(len(rows), hi - lo, S).any(axis=2)
+        passive = ~aliveJobs & ~complete[rows, lo:hi]
+        passiveRows, passiveJobs = np.nonzero(passive)
+        if len(passiveRows) == 0:
+            return queuedCount
+        passiveRows = rows[passiveRows]
+        jobs = passiveJobs + lo
+        columns = jobs * S
+        alive[passiveRows, columns] = True
+        remaining[passiveRows, columns] = colWcet[columns]
+        order[passiveRows, columns] = jobs * (np.int64(1) << 40) + queuedCount + np.arange(len(columns))
+        queueKey[passiveRows, columns - lo * S] = order[passiveRows, columns]
+        return queuedCount + len(columns)
+
+    def _cancelSiblings(self, rows, jobs, w0, alive, onCore, coreJob, inactive, queueKey, colJob):
+        """
+        With cancelSiblings: drops the other copies of the jobs that rows
+        just completed, queued ones and those on working cores. A core freed
+        this way that is not scheduled yet this tick picks a new copy.
+        """
+        S = self.copies
+        siblings = jobs[:, None] * S + np.arange(S)[None, :]
+        siblingRows = np.repeat(rows, S).reshape(len(rows), S)
+        waiting = alive[siblingRows, siblings] & ~onCore[siblingRows, siblings]
+        alive[siblingRows[waiting], siblings[waiting]] = False
+        queueKey[siblingRows[waiting], siblings[waiting] - w0] = np.iinfo(np.int64).max
+
+        held = coreJob[rows]
+        heldSafe = np.maximum(held, 0)
+        running = ((held >= 0) & (colJob[heldSafe] == jobs[:, None]) & alive[rows[:, None], heldSafe]
+                   & ~inactive[rows])
+        runningRows, runningCores = np.nonzero(running)
+        if len(runningRows):
+            runningRows = rows[runningRows]
+            columns = coreJob[runningRows, runningCores]
+            alive[runningRows, columns] = False
+            onCore[runningRows, columns] = False
+            coreJob[runningRows, runningCores] = -1
+
+    def _finishOnCores(self, rows, t, coreJob, alive, remaining, complete, missedJob, executed, colJob, colDeadline):
+        """
+        Runs the copies on the cores of rows (a mask) to completion from tick
+        t without faults, like FtmGedfScheduler.finishRun: each copy counts
+        a miss if it completes at or after its deadline. With cancelSiblings,
+        the first copy of a job to complete (lowest core on a tie) stops the others.
+        """
+        m = self.m
+        rows = np.nonzero(rows)[0]
+        held = coreJob[rows]
+        heldSafe = np.maximum(held, 0)
+        live = (held >= 0) & alive[rows[:, None], heldSafe]
+        left = np.where(live, remaining[rows[:, None], heldSafe], 0)
+        finishTick = t + left - 1
+        counted = live
+        work = left
+        if self.cancelSiblings:
+            sameJob = (live[:, :, None] & live[:, None, :]
+                       & (colJob[heldSafe][:, :, None] == colJob[heldSafe][:, None, :]))
+            # earlier[r, i, k]: the copy on core k completes before the one on core i
+            coreIds = np.arange(m)
+            earlier = sameJob & ((finishTick[:, None, :] < finishTick[:, :, None])
+                                 | ((finishTick[:, None, :] == finishTick[:, :, None])
+                                    & (coreIds[None, None, :] < coreIds[None, :, None])))
+            counted = live & ~earlier.any(axis=2)
+            stopTick = np.where(sameJob, finishTick[:, None, :], np.iinfo(np.int64).max).min(axis=2)
+            work = np.where(counted, left, np.where(live, stopTick - t, 0))
+
+        countedRows, countedCores = np.nonzero(counted)
+        columns = held[countedRows, countedCores]
+        jobs = colJob[columns]
+        late = finishTick[countedRows, countedCores] >= colDeadline[columns]
+        missedJob[rows[countedRows[late]], jobs[late]] = True
+        complete[rows[countedRows], jobs] = True
+        executed[rows] += work.sum(axis=1)
+
+def runBatchTrials(label, taskSetData, activeBackups, trials, coreSetParams, seed=0, cancelSiblings=False,
+                   quantum=None, stopAtFirstMiss=False):
+    """
+    Returns result dicts for trials batched trials of one sweep cell, with
+    sweep.runTrial's statistics. The seed seeds the whole batch, so instead
+    of a per-trial "seed" each result has "batchSeed" (seed) and "trial" (its
+    index in the batch); rerunning the batch reproduces it, but it is not the
+    exact-engine trial of any seed.
+    """
+    taskSet = TaskSet(data=taskSetData, active_backups=activeBackups, quantum=quantum)
+    simulator = BatchGedfSimulator(taskSet, coreSetParams, cancelSiblings)
+    outcome = simulator.run(trials, seed, stopAtFirstMiss)
+    return [{
+        "label": label,
+        "activeBackups": activeBackups,
+        "batchSeed": seed,
+        "trial": i,
+        "meetsDeadlines": bool(outcome["meetsDeadlines"][i]),
+        "missedJobs": int(outcome["missedJobs"][i]),
+        "ticks": int(outcome["ticks"][i]),
+        "wastedWork": float(outcome["wastedWork"][i]),
+        "executedWork": float(outcome["executedWork"][i]),
+    } for i in range(trials)]
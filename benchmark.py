@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+
+"""
+benchmark.py - scaling benchmarks for the FTM-GEDF simulator
+
+Runs TaskSet construction, FtmGedfScheduler.buildSchedule (including
+Schedule.postProcessIntervals), the schedule validators and display
+preparation over synthetic workloads. Each case varies one of task count,
+core count, active backups or horizon from a common base case.
+
+python benchmark.py                     compare against benchmark_baseline.json
+python benchmark.py --save              (re)write the baseline
+python benchmark.py --check-engines     compare the batch engine's success
+                                        rates with the exact engine's
+python benchmark.py --check-resimulate  check that resimulate after a
+                                        taskset edit matches a full run
+python benchmark.py --check-shard-merge merge the results of two shard
+                                        queues and check that none is lost
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from taskset import TaskSet
+from coreset import CoreSet
+from instrumentation import SchedulerStats
+from faultmodel import BurstyFaultModel
+import ftmgedf
+import sweep
+import workqueue
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+BASE_CASE = {"tasks": 8, "cores": 4, "backups": 1, "horizon": 200}
+SCALING = {
+    "tasks": [4, 16, 32],
+    "cores": [2, 8],
+    "backups": [0, 3],
+    "horizon": [100, 400],
+}
+
+# (taskset file, active backups, CoreSet parameters, cancelSiblings) for --check-engines
+ENGINE_CASES = [
+    ("test2.json", 0, {"m": 4, "num_faulty": 2, "lambda_c": 0.0, "lambda_b": 0.3, "lambda_r": 0.05}, False),
+    ("test2.json", 1, {"m": 4, "num_faulty": 4, "lambda_c": 0.0}, False),
+    ("test1.json", 1, {"m": 4, "num_faulty": 4, "lambda_c": 0.0}, True),
+    ("test4.json", 0, {"m": 3, "num_faulty": 2, "lambda_c": 0.0}, True),
+]
+# |z| above this fails the engine check
+ENGINE_Z_LIMIT = 3.0
+
+# Taskset edits for --check-resimulate; most remove jobs, so the edited run can end first
+RESIMULATE_EDITS = [
+    ("endTime 18->11", lambda data: data.update({"endTime": 11})),
+    ("endTime 18->15", lambda data: data.update({"endTime": 15})),
+    ("drop task 3", lambda data: data.update({"taskset": [task for task in data["taskset"] if task["taskId"] != 3]})),
+    ("task 2 wcet 4->3", lambda data: data["taskset"][1].update({"wcet": 3})),
+    ("endTime 18->25", lambda data: data.update({"endTime": 25})),
+]
+# (checkpoint interval, cancelSiblings) for each edit
+RESIMULATE_OPTIONS = [(1, False), (3, True), (2, False), (5, True)]
+
+# Metrics where larger is better; everything else is a cost
+THROUGHPUT_METRICS = ("ticksPerSecond", "jobsPerSecond")
+COST_METRICS = ("wallTime", "peakMemory")
+
+def buildCases():
+    cases = [("base", dict(BASE_CASE))]
+    for key in SCALING:
+        for value in SCALING[key]:
+            case = dict(BASE_CASE)
+            case[key] = value
+            cases.append(("{0}={1}".format(key, value), case))
+    return cases
+
+def generateTaskSetData(numTasks, horizon, totalUtilization, seed):
+    """
+    Returns taskset JSON data with integer parameters and implicit deadlines.
+    Utilizations are drawn with UUniFast so they sum to totalUtilization.
+    """
+    rng = random.Random(seed)
+    utilizations = []
+    remaining = totalUtilization
+    for i in range(1, numTasks):
+        nextRemaining = remaining * rng.random() ** (1.0 / (numTasks - i))
+        utilizations.append(remaining - nextRemaining)
+        remaining = nextRemaining
+    utilizations.append(remaining)
+
+    tasks = []
+    for (i, u) in enumerate(utilizations):
+        period = rng.randint(5, 40)
+        wcet = max(1, min(period, int(round(u * period))))
+        tasks.append({"taskId": i + 1, "period": period, "wcet": wcet, "deadline": period, "offset": 0})
+
+    return {"startTime": 0, "endTime": horizon, "taskset": tasks}
+
+def _quiet():
+    # The validators print; keep that out of the measurements' output
+    return contextlib.redirect_stdout(io.StringIO())
+
+def _prepareDisplay(schedule):
+    """
+    Builds the per-interval display elements the way SchedulingDisplay does,
+    without opening a window. Returns None if pygame is not installed.
+    """
+    try:
+        import display
+    except ImportError:
+        return None
+
+    numTasks = len(schedule.taskSet)
+    numCores = len(schedule.coreSet)
+    start, end = schedule.startTime, schedule.endTime
+    elements = 0
+    for interval in schedule.intervals:
+        if interval.taskId == 0:
+            continue
+        if interval.taskId > 0:
+            display.IntervalRectTasks(interval, start, end, numTasks, 1200, 700, None)
+        display.IntervalRectCores(interval, start, end, numCores, 1200, 700, None)
+        elements += 1
+    return elements
+
+def runCase(case, seed=0, measureMemory=False):
+    """
+    Runs one benchmark case and returns its timings. With measureMemory,
+    tracemalloc is active for the whole case and peakMemory is reported.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    data = generateTaskSetData(case["tasks"], case["horizon"], 0.5 * case["cores"] / (case["backups"] + 1), seed)
+
+    if measureMemory:
+        tracemalloc.start()
+
+    timings = {}
+    start = time.perf_counter()
+    taskSet = TaskSet(data=data, active_backups=case["backups"])
+    timings["taskSet"] = time.perf_counter() - start
+
+    coreSet = CoreSet(m=case["cores"], num_faulty=case["cores"] // 2, lambda_c=0.0)
+    stats = SchedulerStats()
+    scheduler = ftmgedf.FtmGedfScheduler(taskSet, coreSet, stats=stats)
+    start = time.perf_counter()
+    schedule = scheduler.buildSchedule(0, case["horizon"])
+    timings["buildSchedule"] = time.perf_counter() - start
+    timings["postProcessIntervals"] = stats.phaseTimes.get(SchedulerStats.PHASE_POST_PROCESS, 0.0)
+
+    start = time.perf_counter()
+    with _quiet():
+        schedule.areWcetsExceeded()
+        schedule.doesMeetDeadlines()
+    timings["validators"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    displayElements = _prepareDisplay(schedule)
+    timings["displayPrep"] = time.perf_counter() - start if displayElements is not None else None
+
+    result = {
+        "timings": timings,
+        "wallTime": sum(t for t in timings.values() if t is not None),
+        "ticks": stats.counters.get("ticks", 0),
+        "jobs": len(taskSet.jobs) * (1 + taskSet.num_active_backups), # every copy, as active backups are created lazily
+        "intervals": len(schedule.intervals),
+    }
+    result["ticksPerSecond"] = result["ticks"] / timings["buildSchedule"]
+    result["jobsPerSecond"] = result["jobs"] / timings["buildSchedule"]
+
+    if measureMemory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peakMemory"] = peak
+
+    return result
+
+def runSuite(repeat=3, seed=0, cases=None):
+    """
+    Runs every case. Timings are the best of `repeat` runs; peak memory comes
+    from one extra run under tracemalloc so it does not skew the timings.
+    """
+    results = {}
+    for (name, case) in (cases or buildCases()):
+        best = None
+        for i in range(repeat):
+            result = runCase(case, seed)
+            if best is None or result["wallTime"] < best["wallTime"]:
+                best = result
+        best["peakMemory"] = runCase(case, seed, measureMemory=True)["peakMemory"]
+        best["case"] = case
+        results[name] = best
+        print("{0:<14} wall {1:8.3f}s  ticks/s {2:10.0f}  jobs/s {3:9.0f}  peak {4:8.1f} KiB".format(
+            name, best["wallTime"], best["ticksPerSecond"], best["jobsPerSecond"], best["peakMemory"] / 1024.0))
+    return results
+
+def compareToBaseline(results, baseline, threshold=0.25):
+    """
+    Returns a list of (case, metric, baseline value, current value) for every
+    metric that got worse than the baseline by more than `threshold` (relative).
+    """
+    regressions = []
+    for name in results:
+        if name not in baseline:
+            continue
+        old, new = baseline[name], results[name]
+        for metric in COST_METRICS:
+            if old.get(metric) and new[metric] > old[metric] * (1.0 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+        for metric in THROUGHPUT_METRICS:
+            if old.get(metric) and new[metric] < old[metric] / (1.0 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+    return regressions
+
+def checkEngines(trials=500, seed=0):
+    """
+    Runs sweep.compareEngines on every ENGINE_CASES cell and returns the
+    names of those whose rates differ by more than ENGINE_Z_LIMIT.
+    """
+    tasksetDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tasksets")
+    failures = []
+    for (fileName, backups, coreSetParams, cancelSiblings) in ENGINE_CASES:
+        with open(os.path.join(tasksetDir, fileName)) as f:
+            data = json.load(f)
+        comparison = sweep.compareEngines(data, backups, trials, coreSetParams, seed=seed,
+                                          cancelSiblings=cancelSiblings)
+        name = "{0} k={1}{2}".format(fileName, backups, " cancel" if cancelSiblings else "")
+        print("{0:<24} exact {1:.3f}  batch {2:.3f}  z {3:+.2f}".format(
+            name, comparison["exact"], comparison["batch"], comparison["z"]))
+        if abs(comparison["z"]) > ENGINE_Z_LIMIT:
+            failures.append(name)
+    return failures
+
+def _runRecord(ftm, schedule):
+    intervals = [(i.startTime, i.endTime, i.taskId, i.jobId, i.backupId, i.coreId, i.jobCompleted)
+                 for i in schedule.intervals]
+    missed = sorted((job.task.id, job.id, job.backupId) for job in ftm.missedJobs)
+    checkpoints = [(checkpoint.time, checkpoint.intervals, sorted(checkpoint.queue, key=repr))
+                   for checkpoint in ftm.checkpoints]
+    return (intervals, missed, checkpoints, ftm.time)
+
+def checkResimulate(seed=0, numSeeds=5):
+    """
+    Runs test1.json, edits it (RESIMULATE_EDITS), then runs the edit both
+    from the start and with FtmGedfScheduler.resimulate from the first run's
+    checkpoints. Returns the names of the cases where the schedules, missed
+    jobs or checkpoints differ.
+    """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "tasksets", "test1.json")) as f:
+        data = json.load(f)
+    coreSetParams = {"m": 4, "num_faulty": 2, "lambda_c": 0.01}
+
+    def run(taskSetData, interval, cancelSiblings, faultSeed, previous=None):
+        ftm = ftmgedf.FtmGedfScheduler(TaskSet(data=taskSetData, active_backups=1), CoreSet(**coreSetParams),
+                                       faultModel=BurstyFaultModel(seed=faultSeed), cancelSiblings=cancelSiblings)
+        if previous is None:
+            schedule = ftm.buildSchedule(0, 18, checkpointInterval=interval)
+        else:
+            schedule = ftm.resimulate(previous.checkpoints, previous.taskSet, checkpointInterval=interval)
+        return ftm, schedule
+
+    failures = []
+    for (name, edit) in RESIMULATE_EDITS:
+        edited = copy.deepcopy(data)
+        edit(edited)
+        for (interval, cancelSiblings) in RESIMULATE_OPTIONS:
+            for faultSeed in range(seed, seed + numSeeds):
+                previous, _ = run(data, interval, cancelSiblings, faultSeed)
+                full = run(edited, interval, cancelSiblings, faultSeed)
+                resumed = run(edited, interval, cancelSiblings, faultSeed, previous)
+                if _runRecord(*full) != _runRecord(*resumed):
+                    failures.append("{0}, interval {1}{2}, seed {3}".format(
+                        name, interval, " cancel" if cancelSiblings else "", faultSeed))
+        print("{0:<20} checked".format(name))
+    return failures
+
+def checkShardMerge(trials=10, seed=0):
+    """
+    Runs one shard queue for test1.json and one for test2.json, merges the
+    result files of both and returns a list of problems: results lost in
+    the merge, or another sweep's results accepted when its manifest is given.
+    """
+    tasksetDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tasksets")
+    problems = []
+    with tempfile.TemporaryDirectory() as root:
+        paths = []
+        for fileName in ("test1.json", "test2.json"):
+            with open(os.path.join(tasksetDir, fileName)) as f:
+                data = json.load(f)
+            directory = os.path.join(root, fileName)
+            queue = workqueue.ShardQueue.create(directory, {fileName: data}, [1], trials, seed=seed, seedsPerShard=5)
+            workqueue.runWorker(directory)
+            paths.append([os.path.join(queue.resultsDir, name) for name in sorted(os.listdir(queue.resultsDir))])
+
+        merged = workqueue.mergeResults(paths[0] + paths[1])
+        for fileName in ("test1.json", "test2.json"):
+            count = sum(1 for result in merged if result["label"] == fileName)
+            print("{0:<12} {1} of {2} results kept".format(fileName, count, trials))
+            if count != trials:
+                problems.append("{0}: {1} of {2} results kept".format(fileName, count, trials))
+        # Shards run twice (a copied results directory) are kept once
+        if len(workqueue.mergeResults(paths[0] + paths[0])) != trials:
+            problems.append("duplicated shards counted twice")
+        try:
+            workqueue.mergeResults(paths[0] + paths[1], workqueue.ShardQueue(os.path.join(root, "test1.json")).manifest())
+            problems.append("another sweep's results were merged into test1.json's")
+        except ValueError:
+            pass
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FTM-GEDF simulator benchmarks")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is kept)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative slowdown flagged as a regression")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check-engines", action="store_true",
+                        help="compare the batch and exact engines' success rates instead of timing")
+    parser.add_argument("--engine-trials", type=int, default=500, help="trials per engine and case for --check-engines")
+    parser.add_argument("--check-resimulate", action="store_true",
+                        help="check that resimulate after taskset edits matches a full run, instead of timing")
+    parser.add_argument("--check-shard-merge", action="store_true",
+                        help="check that merging the results of two shard queues keeps every result, instead of timing")
+    args = parser.parse_args()
+
+    if args.check_shard_merge:
+        problems = checkShardMerge(seed=args.seed)
+        if problems:
+            print("\nShard merge failed:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("\nShard merge keeps every result")
+        sys.exit(0)
+
+    if args.check_resimulate:
+        failures = checkResimulate(args.seed)
+        if failures:
+            print("\nresimulate differs from a full run:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("\nresimulate matches a full run")
+        sys.exit(0)
+
+    if args.check_engines:
+        failures = checkEngines(args.engine_trials, args.seed)
+        if failures:
+            print("\nEngines disagree (|z| > {0:g}): {1}".format(ENGINE_Z_LIMIT, ", ".join(failures)))
+            sys.exit(1)
+        print("\nEngines agree")
+        sys.exit(0)
+
+    results = runSuite(repeat=args.repeat, seed=args.seed)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("\nBaseline written to {0}".format(args.baseline))
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline at {0}; run with --save to create one".format(args.baseline))
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compareToBaseline(results, baseline, args.threshold)
+    if len(regressions) == 0:
+        print("\nNo regressions against {0}".format(args.baseline))
+    else:
+        print("\nRegressions (> {0:.0f}% worse than baseline):".format(100 * args.threshold))
+        for (name, metric, old, new) in regressions:
+            print("  {0}: {1} {2:.6g} -> {3:.6g}".format(name, metric, old, new))
+        sys.exit(1)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+"""
+checkpoint.py - snapshots of a running FtmGedfScheduler
+
+SchedulerCheckpoint: the state of a run at the start of a tick, stored as plain
+    records (ids and numbers, no Job or Core objects) so it can be restored
+    into a fresh scheduler or pickled to disk
+CheckpointSeries: the checkpoints of one run with its task set and settings,
+    saved so the run can be redone incrementally after a task set edit
+divergenceTick: the first tick at which an edited task set can change a run
+"""
+
+import copy
+import pickle
+
+from schedule import ScheduleInterval
+
+# ScheduleInterval fields kept for each interval of the schedule prefix
+INTERVAL_FIELDS = ("startTime", "endTime", "taskId", "jobId", "backupId",
+                   "didPreemptPrevious", "coreId", "jobCompleted")
+
+def jobRecord(job):
+    """
+    Returns (taskId, jobId, backupId, remainingTime, pendingBackups, lastCoreId)
+    for a Job, or the job itself for the None and -1 placeholders.
+    """
+    if job is None or job == -1:
+        return job
+    return (job.task.id, job.id, job.backupId, job.remainingTime, job.pendingBackups, job.lastCoreId)
+
+def makeJob(taskSet, record):
+    """
+    Returns a new Job for a record made by jobRecord.
+    """
+    if record is None or record == -1:
+        return record
+    taskId, jobId, backupId, remainingTime, pendingBackups, lastCoreId = record
+    job = taskSet.getTaskById(taskId).getJobById(jobId).createCopy(backupId, pendingBackups)
+    job.remainingTime = remainingTime
+    job.lastCoreId = lastCoreId
+    return job
+
+def divergenceTick(previousTaskSet, taskSet):
+    """
+    Returns the first tick at which a run of taskSet can decide differently
+    from a run of previousTaskSet with the same cores and faults, or None if
+    both release the same jobs. That is the earliest release of a job whose
+    release time, deadline or WCET differs (added and removed jobs included):
+    before it, both runs queue exactly the same jobs.
+
+    Ending the run is a decision too: a run ends once its queue drains, which
+    can happen right after its last release. So when the edit removes jobs,
+    the tick is at most the last release of taskSet (0 if it has no jobs),
+    since the edited run may end before the previous one releases the jobs
+    it no longer has.
+    """
+    if previousTaskSet.quantum != taskSet.quantum or previousTaskSet.num_active_backups != taskSet.num_active_backups:
+        return 0
+
+    def signatures(tasks, taskId):
+        if taskId not in tasks:
+            return []
+        return [(job.releaseTime, job.deadline, job.task.wcet) for job in tasks[taskId].getJobs() if job.backupId == 0]
+
+    tick = None
+    removesJobs = False
+    for taskId in set(previousTaskSet.tasks) | set(taskSet.tasks):
+        before, after = signatures(previousTaskSet.tasks, taskId), signatures(taskSet.tasks, taskId)
+        removesJobs = removesJobs or len(after) < len(before)
+        for i in range(max(len(before), len(after))):
+            if i < len(before) and i < len(after) and before[i] == after[i]:
+                continue
+            releases = [jobs[i][0] for jobs in (before, after) if i < len(jobs)]
+            tick = min(releases) if tick is None else min(tick, min(releases))
+            break
+    if removesJobs:
+        lastRelease = max([job.releaseTime for job in taskSet.jobs], default=0)
+        tick = lastRelease if tick is None else min(tick, lastRelease)
+    return tick
+
+def intervalRecord(interval):
+    return tuple(getattr(interval, field) for field in INTERVAL_FIELDS)
+
+def makeInterval(record):
+    interval = ScheduleInterval()
+    for (field, value) in zip(INTERVAL_FIELDS, record):
+        setattr(interval, field, value)
+    return interval
+
+class SchedulerCheckpoint(object):
+    def __init__(self, scheduler):
+        """
+        Captures the state of scheduler between two ticks: the queue, the
+        remaining time of every live job, the job on each core, permanent
+        failures, the fault model's state (including its generators), which
+        jobs completed, the passive backup ids handed out, the missed jobs and
+        the schedule so far with its overhead charges.
+        """
+        self.time = scheduler.time
+        self.endTime = scheduler.endTime
+        self.allDeadlinesMet = scheduler.allDeadlinesMet
+        self.queue = [jobRecord(job) for job in scheduler.priorityQueue.jobs]
+        self.cores = dict((coreId, jobRecord(job)) for (coreId, job) in scheduler.coresToJobs.items())
+        self.corePermFail = dict(scheduler.corePermFail)
+        self.taskjobComplete = dict(scheduler.taskjobComplete)
+        self.backupIds = dict(scheduler.taskSet.backup_ids)
+        self.missedJobs = [jobRecord(job) for job in scheduler.missedJobs]
+        self.migrations = scheduler.migrations
+        self.nextRelease = scheduler._nextRelease
+        # A run only appends intervals until it finishes, so its checkpoints share
+        # one list of interval records and each keeps the length of its prefix
+        intervals = scheduler.schedule.intervals
+        log = scheduler._intervalLog
+        log.extend(intervalRecord(interval) for interval in intervals[len(log):])
+        self.intervalLog = log
+        self.intervalCount = len(intervals)
+        self.overheads = dict(scheduler.schedule.overheads)
+
+        pending = scheduler._pendingFaultState
+        if pending is not None:
+            # Restored but not run since: the model has not been given its state yet
+            self.faultState = pending[1]
+        else:
+            self.faultState = scheduler.faultModel.getState()
+
+    @property
+    def intervals(self):
+        """
+        The records of the schedule prefix (see INTERVAL_FIELDS).
+        """
+        return self.intervalLog[:self.intervalCount]
+
+    def __str__(self):
+        return "checkpoint at t={0}: {1} queued jobs, {2} intervals".format(self.time, len(self.queue), len(self.intervals))
+
+    def rebased(self, taskSet):
+        """
+        Returns a copy of this checkpoint for a run of taskSet, an edited
+        version of the task set it was taken from that releases the same jobs
+        before self.time (see divergenceTick). Jobs released before then keep
+        their state; later ones are queued fresh from taskSet.
+        """
+        def releaseTime(taskId, jobId):
+            # Jobs the edit removed were not released yet, like those it changed
+            if taskId not in taskSet:
+                return None
+            job = taskSet.getTaskById(taskId).getJobById(jobId)
+            return job.releaseTime if job is not None else None
+
+        def releasedBefore(taskId, jobId):
+            release = releaseTime(taskId, jobId)
+            return release is not None and release < self.time
+
+        def deadline(record):
+            return taskSet.getTaskById(record[0]).getJobById(record[1]).deadline
+
+        rebased = copy.copy(self)
+        queue = [record for record in self.queue if releasedBefore(record[0], record[1])]
+        queue.extend(jobRecord(job) for job in taskSet.jobs if job.releaseTime >= self.time)
+        # Same order as the queue keeps (stable, so copies of a job stay in their order)
+        queue.sort(key=lambda record: (deadline(record), record[0], record[1]))
+        rebased.queue = queue
+
+        rebased.taskjobComplete = dict(((job.task.id, job.id), False) for job in taskSet.jobs)
+        rebased.backupIds = dict(taskSet.backup_ids)
+        for (key, complete) in self.taskjobComplete.items():
+            if key in rebased.taskjobComplete and releasedBefore(*key):
+                rebased.taskjobComplete[key] = complete
+                rebased.backupIds[key] = self.backupIds[key]
+        rebased.nextRelease = sum(1 for job in taskSet.jobs if job.releaseTime < self.time)
+        return rebased
+
+    def save(self, file_path):
+        # Without the later checkpoints' intervals of the shared list
+        alone = copy.copy(self)
+        alone.intervalLog = self.intervals
+        with open(file_path, "wb") as f:
+            pickle.dump(alone, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, "rb") as f:
+            return pickle.load(f)
+
+class CheckpointSeries(object):
+    def __init__(self, taskSet, settings, checkpoints):
+        """
+        taskSet: the task set of the run
+        settings: everything else the run depends on (cores, faults, options),
+                  compared before the series is reused
+        checkpoints: the run's checkpoints, oldest first
+        """
+        self.taskSet = taskSet
+        self.settings = settings
+        self.checkpoints = checkpoints
+
+    def save(self, file_path):
+        with open(file_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_path):
+        with open(file_path, "rb") as f:
+            return pickle.load(f)
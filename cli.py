@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+
+"""
+cli.py - command line entry point for the FTM-GEDF simulator
+
+python cli.py simulate tasksets/test1.json [--backups 1 --cores 4 --faulty 4 --stats --analytics]
+python cli.py validate tasksets/test1.json [--record-faults faults.npz | --replay-faults faults.npz]
+python cli.py sweep tasksets/test4.json tasksets/test5.json --backup-counts 1 2 3 --trials 20 --workers 4
+python cli.py shard-init /shared/sweep1 tasksets/test4.json --backup-counts 1 2 3 --trials 200
+python cli.py shard-work /shared/sweep1          (on any number of hosts)
+python cli.py shard-merge /shared/sweep1 --output results.json
+python cli.py serve [--port 8642 | --socket /tmp/ftmgedf.sock] [--cache cache/]
+python cli.py estimate tasksets/test1.json --lambda-b 1e-4 --lambda-r 1e-4 --tilt-lambda-b 0.05 --tilt-lambda-r 0.05
+python cli.py search tasksets/test1.json --target 0.9 [--parameter backups|lambda-b|lambda-r]
+python cli.py render tasksets/test1.json [--view tasks|cores|both] [--export chart.png]
+python cli.py render tasksets/test1.json --live
+python cli.py render --sweep-results results.json
+
+Only 'render' imports the display (pygame) and plotting (matplotlib) libraries,
+so the other commands run on machines without a display stack.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+
+from taskset import TaskSetError
+from coreset import CoreSet
+from instrumentation import SchedulerStats
+from analytics import ScheduleAnalytics
+import faultmodel
+import ftmgedf
+import sweep
+import rareevent
+import search
+import releaseloader
+import workqueue
+from resultcache import ResultCache
+from flightrecorder import FlightRecorder
+from checkpoint import CheckpointSeries
+
+FAULT_MODELS = {
+    "bursty": faultmodel.BurstyFaultModel,
+    "fixed": faultmodel.FixedRateFaultModel,
+    "weibull": faultmodel.WeibullAgingFaultModel,
+    "correlated": faultmodel.CorrelatedFaultModel,
+}
+
+def addSimulationArguments(parser):
+    parser.add_argument("--backups", type=int, default=1, help="active backups per job")
+    parser.add_argument("--cores", type=int, default=4, help="number of cores (m)")
+    parser.add_argument("--faulty", type=int, default=4, help="number of faulty cores")
+    parser.add_argument("--bursty-chance", type=float, default=0.3)
+    parser.add_argument("--fault-period-scaler", type=float, default=3, help="time units per step of the burst and gap lengths")
+    parser.add_argument("--lambda-c", type=float, default=0.0, help="permanent fault probability per unit of time")
+    parser.add_argument("--lambda-b", type=float, default=0.5, help="transient fault probability per unit of time in a burst")
+    parser.add_argument("--lambda-r", type=float, default=0.08, help="transient fault probability per unit of time in a gap")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the fault RNGs")
+
+def addRunArguments(parser):
+    # Options of the scheduler runs themselves; estimate and search always use the defaults
+    parser.add_argument("--end", type=float, default=0, help="minimum schedule end time")
+    parser.add_argument("--quantum", default=None,
+                        help="length of one tick in taskset time units, e.g. 1/4 (default: the largest that fits the taskset)")
+    parser.add_argument("--cancel-siblings", action="store_true",
+                        help="drop the other copies of a job as soon as one copy completes")
+    parser.add_argument("--preemption-overhead", type=float, default=0,
+                        help="time added to a preempted job when it resumes on the same core")
+    parser.add_argument("--migration-overhead", type=float, default=0,
+                        help="time added to a preempted job when it resumes on another core")
+    parser.add_argument("--affinity", action="store_true",
+                        help="resume a preempted job on the core it last ran on when that core is idle")
+
+def addCheckpointSeriesArguments(parser):
+    parser.add_argument("--checkpoint-series", metavar="PATH",
+                        help="save the run's checkpoints here; if the file is from a run with the same settings, only "
+                             "re-simulate from where the taskset edits since then can make a difference")
+    parser.add_argument("--checkpoint-interval", type=float, default=50, help="time between saved checkpoints")
+
+def addReleaseArguments(parser):
+    parser.add_argument("--releases", help="sporadic releases (.csv or .npz with taskId and timeInstant) replacing the taskset's")
+
+def addFlightRecorderArguments(parser):
+    parser.add_argument("--flight-recorder", metavar="PATH",
+                        help="keep the last events in a ring buffer and write it here at the first deadline miss "
+                             "(or at the end of a run without one); .json for JSON, else text")
+    parser.add_argument("--flight-capacity", type=int, default=4096, help="events kept by --flight-recorder")
+    parser.add_argument("--flight-level", choices=sorted(FlightRecorder.LEVELS, key=FlightRecorder.LEVELS.get),
+                        default="info", help="debug also records every interval")
+
+def addFaultModelArguments(parser):
+    # Only for the commands that make a single run; sweeps always use the bursty model
+    parser.add_argument("--fault-model", choices=sorted(FAULT_MODELS), default="bursty")
+    parser.add_argument("--record-faults", help="write the run's faults to this .npz trace")
+    parser.add_argument("--replay-faults", help="replay the faults of a .npz trace instead of sampling them")
+
+def coreSetParams(args):
+    return {
+        "m": args.cores,
+        "num_faulty": args.faulty,
+        "bursty_chance": args.bursty_chance,
+        "fault_period_scaler": args.fault_period_scaler,
+        "lambda_c": args.lambda_c,
+        "lambda_b": args.lambda_b,
+        "lambda_r": args.lambda_r,
+    }
+
+def schedulerOptions(args, taskSet):
+    """
+    Returns the FtmGedfScheduler keyword arguments set on the command line,
+    with the overheads rounded up to whole ticks.
+    """
+    return {
+        "cancelSiblings": args.cancel_siblings,
+        "preemptionOverhead": taskSet.ceilTicks(args.preemption_overhead),
+        "migrationOverhead": taskSet.ceilTicks(args.migration_overhead),
+        "affinity": args.affinity,
+    }
+
+def loadTaskSetData(file_path):
+    with open(file_path) as json_data:
+        return json.load(json_data)
+
+def buildFaultModel(args):
+    if args.replay_faults:
+        model = faultmodel.ReplayFaultModel(faultmodel.FaultTrace.load(args.replay_faults))
+    else:
+        model = FAULT_MODELS[args.fault_model]()
+    if args.record_faults:
+        model = faultmodel.RecordingFaultModel(model)
+    return model
+
+def saveFaultTrace(args, ftm):
+    if args.record_faults:
+        ftm.faultModel.trace().save(args.record_faults)
+
+def attachFlightRecorder(args, ftm):
+    """
+    Returns the FlightRecorder attached to ftm for --flight-recorder, or None.
+    """
+    if not args.flight_recorder:
+        return None
+    recorder = FlightRecorder(args.flight_capacity, args.flight_level,
+                              onFirstMiss=lambda r: r.save(args.flight_recorder, atFirstMiss=True))
+    recorder.attach(ftm)
+    return recorder
+
+def saveFlightRecorder(args, recorder):
+    if recorder is not None and recorder.missSnapshot is None:
+        recorder.save(args.flight_recorder)
+
+def runSettings(args):
+    """
+    Returns what a run depends on besides the taskset, to tell whether a
+    saved checkpoint series can be reused.
+    """
+    settings = coreSetParams(args)
+    for name in ("backups", "quantum", "end", "seed", "fault_model", "replay_faults", "cancel_siblings",
+                 "preemption_overhead", "migration_overhead", "affinity"):
+        settings[name] = getattr(args, name)
+    return settings
+
+def loadCheckpointSeries(args):
+    """
+    Returns the saved CheckpointSeries to resume from, or None. A recorded
+    fault trace has to cover the whole run, so --record-faults runs from the start.
+    """
+    if not args.checkpoint_series or args.record_faults or not os.path.exists(args.checkpoint_series):
+        return None
+    series = CheckpointSeries.load(args.checkpoint_series)
+    if series.settings != runSettings(args):
+        print("Checkpoint series is from a run with other settings; running from the start", file=sys.stderr)
+        return None
+    return series
+
+def runSimulation(args, stats=None):
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    taskSet = releaseloader.loadTaskSet(args.taskset, args.backups, quantum=args.quantum, releases=args.releases)
+    coreSet = CoreSet(**coreSetParams(args))
+
+    ftm = ftmgedf.FtmGedfScheduler(taskSet, coreSet, stats=stats, faultModel=buildFaultModel(args),
+                                   **schedulerOptions(args, taskSet))
+    recorder = attachFlightRecorder(args, ftm)
+    interval = taskSet.ceilTicks(args.checkpoint_interval) if args.checkpoint_series else None
+    series = loadCheckpointSeries(args)
+    if series is not None:
+        schedule = ftm.resimulate(series.checkpoints, series.taskSet, checkpointInterval=interval)
+        print("Resumed the saved run at t={0}".format(taskSet.toTime(ftm.resumedFrom)), file=sys.stderr)
+    else:
+        schedule = ftm.buildSchedule(0, taskSet.ceilTicks(args.end), checkpointInterval=interval)
+    if args.checkpoint_series:
+        CheckpointSeries(taskSet, runSettings(args), ftm.checkpoints).save(args.checkpoint_series)
+    saveFaultTrace(args, ftm)
+    saveFlightRecorder(args, recorder)
+    return ftm, schedule
+
+def reportDeadlines(ftm):
+    if ftm.doesMeetDeadlines():
+        print("\nAll deadlines are met! :)")
+    else:
+        print("\nA deadline was missed! :(\n")
+        ftm.printMissedJobs()
+
+def commandSimulate(args):
+    stats = SchedulerStats() if (args.stats or args.stats_json) else None
+    ftm, schedule = runSimulation(args, stats)
+
+    if args.intervals:
+        schedule.printIntervals(displayIdle=True)
+    reportDeadlines(ftm)
+    print("Migrations: {0}".format(ftm.migrations))
+
+    if args.stats:
+        stats.printReport()
+    if args.stats_json:
+        with open(args.stats_json, "w") as f:
+            f.write(stats.toJson())
+
+    if args.analytics or args.analytics_json:
+        analytics = ScheduleAnalytics(schedule)
+        if args.analytics:
+            analytics.printReport()
+        if args.analytics_json:
+            with open(args.analytics_json, "w") as f:
+                f.write(analytics.toJson())
+    return 0
+
+def commandValidate(args):
+    ftm, schedule = runSimulation(args)
+
+    print("\n// Validating the schedule:")
+    schedule.checkWcets()
+    schedule.checkFeasibility()
+    reportDeadlines(ftm)
+
+    ok = ftm.doesMeetDeadlines() and not schedule.areWcetsExceeded()
+    return 0 if ok else 1
+
+def openCache(args):
+    return ResultCache(args.cache, args.cache_size << 20) if args.cache else None
+
+def addCacheArguments(parser):
+    parser.add_argument("--cache", metavar="DIR", help="reuse trial results stored here and add new ones")
+    parser.add_argument("--cache-size", type=int, default=256, help="MB kept in --cache; least recently used results go first")
+
+def commandSweep(args):
+    tasksets = {}
+    for file_path in args.tasksets:
+        tasksets[file_path] = loadTaskSetData(file_path)
+
+    if args.engine == "batch":
+        if args.cache:
+            print("--cache only applies to --engine exact", file=sys.stderr)
+            return 2
+        if args.preemption_overhead or args.migration_overhead or args.affinity:
+            print("--preemption-overhead, --migration-overhead and --affinity only apply to --engine exact",
+                  file=sys.stderr)
+            return 2
+        summary = sweep.summarize(sweep.runBatchSweep(tasksets, args.backup_counts, args.trials, coreSetParams(args),
+                                                      seed=args.seed or 0, cancelSiblings=args.cancel_siblings,
+                                                      quantum=args.quantum, workers=args.workers))
+    else:
+        specs = sweep.buildTrials(tasksets, args.backup_counts, args.trials, coreSetParams(args),
+                                  horizon=args.end, seed=args.seed or 0, cancelSiblings=args.cancel_siblings,
+                                  quantum=args.quantum, preemptionOverhead=args.preemption_overhead,
+                                  migrationOverhead=args.migration_overhead, affinity=args.affinity)
+        cache = openCache(args)
+        summary = sweep.summarize(sweep.runSweep(specs, args.workers, cache))
+        if cache is not None:
+            print("Cache: {0} hits, {1} misses".format(cache.hits, cache.misses), file=sys.stderr)
+
+    text = json.dumps(summary, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+def commandShardInit(args):
+    tasksets = {}
+    for file_path in args.tasksets:
+        tasksets[file_path] = loadTaskSetData(file_path)
+
+    try:
+        queue = workqueue.ShardQueue.create(args.directory, tasksets, args.backup_counts, args.trials, coreSetParams(args),
+                                            horizon=args.end, seed=args.seed or 0, cancelSiblings=args.cancel_siblings,
+                                            quantum=args.quantum, preemptionOverhead=args.preemption_overhead,
+                                            migrationOverhead=args.migration_overhead, affinity=args.affinity,
+                                            seedsPerShard=args.seeds_per_shard)
+    except FileExistsError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(queue.status(), sort_keys=True))
+    return 0
+
+def commandShardWork(args):
+    finished = workqueue.runWorker(args.directory, args.worker_id, leaseSeconds=args.lease, wait=args.wait,
+                                   cache=openCache(args))
+    print("Finished {0} shards; queue: {1}".format(finished, json.dumps(workqueue.ShardQueue(args.directory).status(), sort_keys=True)))
+    return 0
+
+def commandShardMerge(args):
+    try:
+        results, summary = workqueue.mergeQueue(args.directory, args.results, allowPartial=args.partial)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    text = json.dumps(summary, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if args.trials_output:
+        with open(args.trials_output, "w") as f:
+            json.dump(results, f)
+    print(text)
+    return 0
+
+def commandServe(args):
+    # Imported here so the other commands do not load asyncio
+    from service import ScheduleService
+    service = ScheduleService(host=args.host, port=args.port, socketPath=args.socket, workers=args.workers,
+                              cache=openCache(args), batchDelay=args.batch_delay / 1000.0,
+                              maxSeconds=args.max_seconds or None, maxTrials=args.max_trials)
+    service.run()
+    return 0
+
+def commandEstimate(args):
+    tilt = {}
+    for (name, value) in (("lambda_c", args.tilt_lambda_c), ("lambda_b", args.tilt_lambda_b), ("lambda_r", args.tilt_lambda_r)):
+        if value is not None:
+            tilt[name] = value
+
+    result = rareevent.estimateMissProbability(loadTaskSetData(args.taskset), args.backups, coreSetParams(args),
+                                               tilt, trials=args.trials, seed=args.seed or 0,
+                                               confidence=args.confidence, workers=args.workers)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    return 0
+
+def commandSearch(args):
+    data = loadTaskSetData(args.taskset)
+    probeOptions = {"seed": args.seed or 0, "minTrials": args.min_trials, "maxTrials": args.max_trials,
+                    "confidence": args.confidence}
+    if args.parameter == "backups":
+        result = search.minimumBackups(data, coreSetParams(args), args.target, low=int(args.low or 0),
+                                       high=int(10 if args.high is None else args.high), **probeOptions)
+    else:
+        result = search.maximumFaultRate(data, args.backups, coreSetParams(args), args.target,
+                                         parameter=args.parameter.replace("-", "_"),
+                                         low=0.0 if args.low is None else args.low,
+                                         high=1.0 if args.high is None else args.high,
+                                         tolerance=args.tolerance, **probeOptions)
+    print(json.dumps(result, indent=2, sort_keys=True))
+    return 0
+
+def renderLive(args):
+    from display import LiveSchedulingDisplay
+    from livestream import startLiveSimulation
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    taskSet = releaseloader.loadTaskSet(args.taskset, args.backups, quantum=args.quantum, releases=args.releases)
+    coreSet = CoreSet(**coreSetParams(args))
+    ftm = ftmgedf.FtmGedfScheduler(taskSet, coreSet, faultModel=buildFaultModel(args), **schedulerOptions(args, taskSet))
+    recorder = attachFlightRecorder(args, ftm)
+
+    # The schedule ends no earlier than the last deadline; the axis grows if it runs longer
+    endTicks = taskSet.ceilTicks(args.end)
+    horizon = max([endTicks] + [job.deadline for job in taskSet.jobs])
+    thread, intervalQueue = startLiveSimulation(ftm, 0, endTicks)
+
+    display = LiveSchedulingDisplay(coreSet, intervalQueue, horizon, width=args.width, height=args.height,
+                                    fps=33, headless=bool(args.export), timeScale=taskSet.quantum)
+    if args.export:
+        display.wait()
+        for path in display.export(args.export):
+            print("Wrote {0}".format(path))
+    else:
+        display.run()
+
+    thread.join()
+    saveFaultTrace(args, ftm)
+    saveFlightRecorder(args, recorder)
+    reportDeadlines(ftm)
+    return 0
+
+def commandRender(args):
+    if args.sweep_results:
+        with open(args.sweep_results) as f:
+            sweep.plotSummary(json.load(f))
+        return 0
+
+    if not args.taskset:
+        print("Error: render needs a taskset or --sweep-results")
+        return 2
+
+    # The display stack is only needed here
+    from display import SchedulingDisplay
+
+    if args.live:
+        return renderLive(args)
+
+    ftm, schedule = runSimulation(args)
+    reportDeadlines(ftm)
+
+    views = ["tasks", "cores"] if args.view == "both" else [args.view]
+    if args.export:
+        display = SchedulingDisplay(width=args.width, height=args.height, scheduleData=schedule, headless=True)
+        for path in display.export(args.export, views):
+            print("Wrote {0}".format(path))
+        return 0
+
+    for view in views:
+        display = SchedulingDisplay(width=args.width, height=args.height, fps=33, scheduleData=schedule, display_type=view)
+        display.run()
+    return 0
+
+def buildParser():
+    parser = argparse.ArgumentParser(description="FTM-GEDF fault-tolerant multicore scheduling simulator")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    simulate = commands.add_parser("simulate", help="build a schedule and report deadline misses")
+    simulate.add_argument("taskset")
+    addSimulationArguments(simulate)
+    addRunArguments(simulate)
+    addReleaseArguments(simulate)
+    addFaultModelArguments(simulate)
+    addFlightRecorderArguments(simulate)
+    addCheckpointSeriesArguments(simulate)
+    simulate.add_argument("--intervals", action="store_true", help="print every scheduling interval")
+    simulate.add_argument("--stats", action="store_true", help="print phase timers and counters")
+    simulate.add_argument("--stats-json", help="write phase timers and counters to this JSON file")
+    simulate.add_argument("--analytics", action="store_true", help="print per-task response time, lateness, preemption and core percentiles")
+    simulate.add_argument("--analytics-json", help="write per-task percentiles and histograms to this JSON file")
+    simulate.set_defaults(func=commandSimulate)
+
+    validate = commands.add_parser("validate", help="build a schedule and check WCETs and deadlines")
+    validate.add_argument("taskset")
+    addSimulationArguments(validate)
+    addRunArguments(validate)
+    addReleaseArguments(validate)
+    addFaultModelArguments(validate)
+    addFlightRecorderArguments(validate)
+    addCheckpointSeriesArguments(validate)
+    validate.set_defaults(func=commandValidate)
+
+    sweepParser = commands.add_parser("sweep", help="schedulability over active backup counts")
+    sweepParser.add_argument("tasksets", nargs="+")
+    addSimulationArguments(sweepParser)
+    addRunArguments(sweepParser)
+    sweepParser.add_argument("--backup-counts", type=int, nargs="+", default=list(range(1, 11)))
+    sweepParser.add_argument("--trials", type=int, default=20)
+    sweepParser.add_argument("--workers", type=int, default=1)
+    sweepParser.add_argument("--engine", choices=["exact", "batch"], default="exact",
+                             help="batch: vectorized trials (batchsim.py), much faster; the same success rates as exact "
+                                  "within sampling error, but not the same trials")
+    sweepParser.add_argument("--output", help="write the summary JSON here")
+    addCacheArguments(sweepParser)
+    sweepParser.set_defaults(func=commandSweep, end=50)
+
+    shardInit = commands.add_parser("shard-init", help="split a sweep into shards in a shared queue directory")
+    shardInit.add_argument("directory")
+    shardInit.add_argument("tasksets", nargs="+")
+    addSimulationArguments(shardInit)
+    addRunArguments(shardInit)
+    shardInit.add_argument("--backup-counts", type=int, nargs="+", default=list(range(1, 11)))
+    shardInit.add_argument("--trials", type=int, default=20)
+    shardInit.add_argument("--seeds-per-shard", type=int, default=10)
+    shardInit.set_defaults(func=commandShardInit, end=50)
+
+    shardWork = commands.add_parser("shard-work", help="claim and run shards from a queue directory until none are left")
+    shardWork.add_argument("directory")
+    shardWork.add_argument("--worker-id", help="name of this worker in claims (default: host-pid-random)")
+    shardWork.add_argument("--lease", type=float, default=600, help="seconds after which a silent worker's shard is run again")
+    shardWork.add_argument("--wait", action="store_true", help="keep polling until every shard has results")
+    addCacheArguments(shardWork)
+    shardWork.set_defaults(func=commandShardWork)
+
+    shardMerge = commands.add_parser("shard-merge", help="combine the shard results of a queue directory")
+    shardMerge.add_argument("directory")
+    shardMerge.add_argument("results", nargs="*", help="extra result files of this sweep, e.g. copied from another host")
+    shardMerge.add_argument("--partial", action="store_true", help="summarize even if some shards have no results")
+    shardMerge.add_argument("--output", help="write the summary JSON here")
+    shardMerge.add_argument("--trials-output", help="write every trial result here")
+    shardMerge.set_defaults(func=commandShardMerge)
+
+    serve = commands.add_parser("serve", help="answer simulation requests over local HTTP (see service.py)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8642)
+    serve.add_argument("--socket", help="listen on this Unix socket instead of host:port")
+    serve.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    serve.add_argument("--batch-delay", type=float, default=2, help="ms to wait for more requests before dispatching")
+    serve.add_argument("--max-seconds", type=float, default=60,
+                       help="stop any one simulation or trial after this long (0: no limit)")
+    serve.add_argument("--max-trials", type=int, default=10000,
+                       help="refuse /schedulability requests for more trials than this in all")
+    addCacheArguments(serve)
+    serve.set_defaults(func=commandServe)
+
+    estimate = commands.add_parser("estimate", help="deadline miss probability by importance sampling")
+    estimate.add_argument("taskset")
+    addSimulationArguments(estimate)
+    estimate.add_argument("--tilt-lambda-c", type=float, help="permanent fault probability to sample with")
+    estimate.add_argument("--tilt-lambda-b", type=float, help="burst fault probability to sample with")
+    estimate.add_argument("--tilt-lambda-r", type=float, help="gap fault probability to sample with")
+    estimate.add_argument("--trials", type=int, default=1000)
+    estimate.add_argument("--confidence", type=float, default=0.95)
+    estimate.add_argument("--workers", type=int, default=1)
+    estimate.set_defaults(func=commandEstimate)
+
+    searchParser = commands.add_parser("search", help="fewest active backups or highest fault rate reaching a target")
+    searchParser.add_argument("taskset")
+    addSimulationArguments(searchParser)
+    searchParser.add_argument("--parameter", choices=["backups", "lambda-b", "lambda-r"], default="backups",
+                              help="lambda-b/lambda-r search with --backups active backups")
+    searchParser.add_argument("--target", type=float, default=0.9, help="probability of meeting every deadline")
+    searchParser.add_argument("--low", type=float, default=None, help="bottom of the range (default 0)")
+    searchParser.add_argument("--high", type=float, default=None, help="top of the range (default 10 backups, rate 1)")
+    searchParser.add_argument("--tolerance", type=float, default=1e-3, help="precision of a fault rate")
+    searchParser.add_argument("--min-trials", type=int, default=8, help="first round of trials per probe; then doubling")
+    searchParser.add_argument("--max-trials", type=int, default=256, help="trials per probe at most")
+    searchParser.add_argument("--confidence", type=float, default=0.95)
+    searchParser.set_defaults(func=commandSearch)
+
+    render = commands.add_parser("render", help="show a schedule (pygame) or sweep results (matplotlib)")
+    render.add_argument("taskset", nargs="?")
+    addSimulationArguments(render)
+    addRunArguments(render)
+    addReleaseArguments(render)
+    addFaultModelArguments(render)
+    addFlightRecorderArguments(render)
+    render.add_argument("--view", choices=["tasks", "cores", "both"], default="both")
+    render.add_argument("--width", type=int, default=1200)
+    render.add_argument("--height", type=int, default=700)
+    render.add_argument("--sweep-results", help="plot a summary written by 'sweep --output'")
+    render.add_argument("--live", action="store_true", help="show the core view while the simulation runs")
+    render.add_argument("--export", help="write PNGs (e.g. chart.png -> chart_tasks.png, chart_cores.png) without a window")
+    # Only simulate and validate keep checkpoint series; render runs from the start
+    render.set_defaults(func=commandRender, checkpoint_series=None)
+
+    return parser
+
+def reportTaskSetError(error, limit=20):
+    print("Invalid taskset: {0}".format(error), file=sys.stderr)
+    for detail in error.errors[:limit]:
+        print("  " + ", ".join("{0}={1}".format(key, detail[key]) for key in sorted(detail)), file=sys.stderr)
+    if len(error.errors) > limit:
+        print("  ... and {0} more".format(len(error.errors) - limit), file=sys.stderr)
+
+if __name__ == "__main__":
+    args = buildParser().parse_args()
+    try:
+        sys.exit(args.func(args))
+    except TaskSetError as e:
+        reportTaskSetError(e)
+        sys.exit(2)
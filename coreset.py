@@ -5,6 +5,9 @@ coreset.py - simple coreset and core implementation
 
 Written by: Dawson d'Almeida and Justin Washington
 """
+import math
+from fractions import Fraction
+
 import numpy as np
 
 class CoreSetIterator:
@@ -17,9 +20,32 @@ class CoreSetIterator:
         key = next(self.keys)
         return self.coreSet.cores[key]
 
+def perTick(probability, quantum):
+    """
+    Returns the probability per tick of quantum time units that makes
+    probability the chance of at least one event per unit of time.
+    """
+    if quantum == 1:
+        return probability
+    return 1.0 - (1.0 - probability) ** float(quantum)
+
+def wholeTicks(length, quantum):
+    """
+    Returns length time units as a whole number of ticks of quantum time
+    units, rounded up. Exact for floats written with few decimals (0.3, not
+    0.30000000000000004), so lengths that are multiples of the quantum do not
+    round up by one.
+    """
+    return math.ceil(Fraction(str(length)) / Fraction(str(quantum)))
+
 class CoreSet(object):
     def __init__(self, m=1, num_faulty=0, bursty_chance=0.3, fault_period_scaler=3,
                  lambda_c=0.02, lambda_b=0.5, lambda_r=0.08):
+        """
+        The fault probabilities lambda_* are per unit of taskset time and
+        fault_period_scaler is in taskset time units; setQuantum converts
+        them to ticks.
+        """
         self.cores = {}
         self.m = m
         self.num_faulty = num_faulty
@@ -30,10 +56,10 @@ class CoreSet(object):
         for i in range(m-num_faulty):
             self.cores[coreId] = Core(coreId, False, self)
             coreId += 1
-        self.lambda_c = lambda_c
-        self.lambda_b = lambda_b
-        self.lambda_r = lambda_r
-        self.fault_period_scaler = fault_period_scaler
+        #fault parameters per unit of taskset time, and per tick below
+        self.timeParams = {"lambda_c": lambda_c, "lambda_b": lambda_b, "lambda_r": lambda_r,
+                           "fault_period_scaler": fault_period_scaler}
+        self.setQuantum(1)
         #seems backwards, but it isn't. Lower bursty_chance = higher score in geometric
         #distrubution, meaning lGap is longer. 
         self.lGapProb = bursty_chance
@@ -43,6 +69,31 @@ class CoreSet(object):
     def __contains__(self, elt):
         return elt in self.cores
 
+    def setQuantum(self, quantum):
+        """
+        Expresses the fault parameters in ticks of quantum time units, so
+        that a finer quantum keeps the same faults per unit of time: the
+        probabilities become perTick ones and burst and gap lengths are
+        counted in whole ticks (see wholeTicks), so that a fault period ends
+        on a tick. The scheduler calls this with its task set's quantum.
+        """
+        params = self.timeParams
+        self.quantum = quantum
+        self.lambda_c = perTick(params["lambda_c"], quantum)
+        self.lambda_b = perTick(params["lambda_b"], quantum)
+        self.lambda_r = perTick(params["lambda_r"], quantum)
+        self.fault_period_scaler = wholeTicks(params["fault_period_scaler"], quantum)
+
+    def copy(self):
+        """
+        Returns a CoreSet with the same cores, fault parameters and quantum and no jobs assigned.
+        """
+        params = self.timeParams
+        coreSet = CoreSet(self.m, self.num_faulty, self.lGapProb, params["fault_period_scaler"],
+                          params["lambda_c"], params["lambda_b"], params["lambda_r"])
+        coreSet.setQuantum(self.quantum)
+        return coreSet
+
     def __len__(self):
         return len(self.cores)
 
@@ -4,13 +4,20 @@
 display.py - display for CS 330 scheduling library
 """
 
+import collections
 import json
 import math
+import os
 import pygame
 import sys
+import threading
+
+import numpy as np
 
 from taskset import TaskSet
 from schedule import Schedule
+from livestream import IntervalPublisher
+from bisect import bisect_left, bisect_right
 
 BUFFER_TOP = 0
 BUFFER_BOTTOM = 68
@@ -23,19 +30,42 @@ IS_FOR_PRINT = True
 
 LINE_WIDTH = 2
 
+# Narrowest time span the viewport can be zoomed to
+MIN_VIEW_SPAN = 1.0
+
+# The core view switches to the rasterized overview when intervals average
+# fewer than this many pixels wide
+OVERVIEW_MIN_PIXELS_PER_INTERVAL = 3
+# The finest overview level has plot width * 2**levels bins
+OVERVIEW_PYRAMID_LEVELS = 6
+
+# SysFont lookups are slow, and every axis asks for the same few sizes
+_fontCache = {}
+
+def getFont(size, bold=USE_BOLD_FONT):
+    key = (size, bold)
+    if key not in _fontCache:
+        _fontCache[key] = pygame.font.SysFont("mono", size, bold=bold)
+    return _fontCache[key]
+
 ##################################################################
 ##  Static display elements                                     ##
 ##################################################################
 
 class XAxis(object):
-    def __init__(self, startTime, endTime, w, h):
+    def __init__(self, startTime, endTime, w, h, timeScale=1):
+        """
+        startTime and endTime are in ticks; labels show ticks * timeScale,
+        the task set's time quantum, so they read in the units of the data.
+        """
+        self.timeScale = timeScale
         self.build_axis(w, h)
 
         totalTime = endTime - startTime
         tickTime = self.calculate_tick_time(totalTime)
         tickLabelTime = self.calculate_tick_label_time(totalTime)
-        self.build_tick_marks(totalTime, tickTime, w, h)
-        self.build_labels(totalTime, tickLabelTime, w, h)
+        self.build_tick_marks(startTime, totalTime, tickTime, w, h)
+        self.build_labels(startTime, totalTime, tickLabelTime, w, h)
 
     def build_axis(self, w, h):
         # Draw a thin black horizontal line
@@ -59,8 +89,18 @@ class XAxis(object):
             return 1.0
         elif totalTime <= 16.0:
             return 2.0
-        else:
+        elif totalTime <= 100.0:
             return 5.0
+        else:
+            return self.calculate_nice_time(totalTime)
+
+    def calculate_nice_time(self, totalTime):
+        # 1, 2 or 5 times a power of ten, giving at most 20 ticks
+        step = 10.0 ** math.floor(math.log10(totalTime / 20.0))
+        for multiple in (1.0, 2.0, 5.0, 10.0):
+            if totalTime / (step * multiple) <= 20.0:
+                return step * multiple
+        return step * 10.0
 
     def calculate_tick_label_time(self, totalTime):
         if totalTime <= 2.0:
@@ -73,16 +113,23 @@ class XAxis(object):
             return 1.0
         elif totalTime <= 16.0:
             return 2.0
-        else:
+        elif totalTime <= 100.0:
             return 5.0
+        else:
+            return self.calculate_nice_time(totalTime)
+
+    def tick_times(self, startTime, totalTime, tickTime):
+        # Ticks sit on multiples of tickTime, so a panned axis keeps round labels
+        first = int(math.ceil(startTime / tickTime - 1e-9))
+        numTicks = int(math.floor((startTime + totalTime) / tickTime + 1e-9)) - first
+        return [(first + i) * tickTime for i in range(0, numTicks + 1)]
 
-    def build_tick_marks(self, totalTime, tickTime, w, h):
+    def build_tick_marks(self, startTime, totalTime, tickTime, w, h):
         # Put a tick every tickTime seconds
         plotWidth = w - BUFFER_LEFT - BUFFER_RIGHT
-        numTicks = int(math.ceil(totalTime / tickTime))
         self.ticks = []
-        for i in range(0, numTicks+1):
-            px = BUFFER_LEFT + (i * tickTime / totalTime) * plotWidth
+        for t in self.tick_times(startTime, totalTime, tickTime):
+            px = BUFFER_LEFT + ((t - startTime) / totalTime) * plotWidth
 
             if px > w - BUFFER_RIGHT:
                 continue
@@ -95,14 +142,30 @@ class XAxis(object):
             tick = ((px, p1y), (px, p2y), LINE_WIDTH)
             self.ticks.append(tick)
 
-    def build_labels(self, totalTime, tickTime, w, h):
-        # Put a label every tick mark
+    def label_text(self, t):
+        return "{0:.1f}".format(float(t * self.timeScale))
+
+    def fit_label_time(self, startTime, totalTime, tickTime, plotWidth, font):
+        # Coarsen the label step (1, 2 or 5 times a power of ten) until the
+        # widest label fits between two neighbours, so long axes stay legible
+        while True:
+            times = self.tick_times(startTime, totalTime, tickTime)
+            if len(times) <= 1:
+                return tickTime
+            widest = max(font.size(self.label_text(t))[0] for t in times)
+            if tickTime / totalTime * plotWidth >= widest * 1.5:
+                return tickTime
+            mantissa = tickTime / 10.0 ** math.floor(math.log10(tickTime) + 1e-9)
+            tickTime *= 2.5 if 1.5 < mantissa < 3.5 else 2.0
+
+    def build_labels(self, startTime, totalTime, tickTime, w, h):
+        # Put a label every tick mark, or on fewer of them if they would overlap
         plotWidth = w - BUFFER_LEFT - BUFFER_RIGHT
-        numTicks = int(math.ceil(totalTime / tickTime))
-        font = pygame.font.SysFont("mono", int(30 * (h / 720)), bold=USE_BOLD_FONT)
+        font = getFont(int(30 * (h / 720)))
+        tickTime = self.fit_label_time(startTime, totalTime, tickTime, plotWidth, font)
         self.labels = []
-        for i in range(0, numTicks + 1):
-            px = BUFFER_LEFT + (i * tickTime / totalTime) * plotWidth
+        for t in self.tick_times(startTime, totalTime, tickTime):
+            px = BUFFER_LEFT + ((t - startTime) / totalTime) * plotWidth
 
             if px > w - BUFFER_RIGHT:
                 continue
@@ -111,7 +174,7 @@ class XAxis(object):
 
             # Store the text as a tuple of the string, pos tuple, and font:
             # (s, pos, font)
-            label = ("{0:.1f}".format(i * tickTime),  (px, py), font)
+            label = (self.label_text(t),  (px, py), font)
             self.labels.append(label)
 
         # Give the axis a label
@@ -170,7 +233,7 @@ class YAxisTasks(object):
         plotHeight = h - BUFFER_TOP - BUFFER_BOTTOM
         plotBottom = h - BUFFER_BOTTOM
         taskHeight = plotHeight / numTasks
-        font = pygame.font.SysFont("mono", int(30 * (h / 720)), bold=USE_BOLD_FONT)
+        font = getFont(int(30 * (h / 720)))
         self.labels = []
         for (i, task) in enumerate(taskSet):
             px = int(BUFFER_LEFT * 0.8)
@@ -225,7 +288,7 @@ class YAxisCores(object):
         plotHeight = h - BUFFER_TOP - BUFFER_BOTTOM
         plotBottom = h - BUFFER_BOTTOM
         coreHeight = plotHeight / numCores
-        font = pygame.font.SysFont("mono", int(30 * (h / 720)), bold=USE_BOLD_FONT)
+        font = getFont(int(30 * (h / 720)))
         self.labels = []
         for (i, core) in enumerate(coreSet):
             px = int(BUFFER_LEFT * 0.8)
@@ -257,6 +320,24 @@ class YAxisCores(object):
 ##  Interval display elements                                   ##
 ##################################################################
 
+def core_row_extent(coreId, numCores, h):
+    """
+    Returns (top, height) in pixels of a core's interval bar in the core view.
+    """
+    plotHeight = h - BUFFER_TOP - BUFFER_BOTTOM
+    plotBottom = h - BUFFER_BOTTOM
+    coreHeight = plotHeight / numCores
+
+    intervalBottom = plotBottom - int(numCores - ((coreId-(numCores-1)) * coreHeight))
+    intervalHeight = int(coreHeight * 0.4)
+    return intervalBottom - intervalHeight, intervalHeight
+
+def clip_time(t, startTime, endTime):
+    # Intervals reaching far outside the viewport are cut just past its edges,
+    # which keeps pixel coordinates small when zoomed in
+    margin = (endTime - startTime) * 0.01
+    return min(max(t, startTime - margin), endTime + margin)
+
 class IntervalRectTasks(object):
     def __init__(self, interval, startTime, endTime, numTasks, w, h, color):
         self.build_rectangle(interval, startTime, endTime, numTasks, w, h, color)
@@ -271,10 +352,10 @@ class IntervalRectTasks(object):
         intervalTop = intervalBottom - intervalHeight
 
         totalTime = endTime - startTime
-        p1x = int(float(interval.startTime - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT
+        p1x = int(float(clip_time(interval.startTime, startTime, endTime) - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT
         p1y = intervalBottom - intervalHeight
 
-        rectW = int(float(interval.endTime - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT - p1x - 1 # open interval on RHS
+        rectW = int(float(clip_time(interval.endTime, startTime, endTime) - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT - p1x - 1 # open interval on RHS
         rectH = intervalHeight
 
         # Store the rect as a tuple: (x1, y1, width, height)
@@ -304,21 +385,12 @@ class IntervalRectCores(object):
 
 
     def build_rectangle(self, interval, startTime, endTime, numCores, w, h, color):
-        plotHeight = h - BUFFER_TOP - BUFFER_BOTTOM
-        plotBottom = h - BUFFER_BOTTOM
-        coreHeight = plotHeight / numCores
-
-        intervalBottom = plotBottom - int(numCores - ((interval.coreId-(numCores-1)) * coreHeight))
-        intervalHeight = int(coreHeight * 0.4)
-        intervalTop = intervalBottom - intervalHeight
-
-        #print("numCores:", numCores, "; interval.coreId:", interval.coreId, "; intervalBottom:", intervalBottom)
+        p1y, intervalHeight = core_row_extent(interval.coreId, numCores, h)
 
         totalTime = endTime - startTime
-        p1x = int(float(interval.startTime - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT
-        p1y = intervalBottom - intervalHeight
+        p1x = int(float(clip_time(interval.startTime, startTime, endTime) - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT
 
-        rectW = int(float(interval.endTime - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT - p1x - 1 # open interval on RHS
+        rectW = int(float(clip_time(interval.endTime, startTime, endTime) - startTime) / totalTime * (w-BUFFER_LEFT-BUFFER_RIGHT)) + BUFFER_LEFT - p1x - 1 # open interval on RHS
         rectH = intervalHeight
 
         # Store the rect as a tuple: (x1, y1, width, height)
@@ -336,6 +408,115 @@ class IntervalRectCores(object):
         pygame.draw.rect(surface, self.fillColor, self.rect, 0)
         pygame.draw.rect(surface, lineColor, self.rect, lineWidth)
 
+##################################################################
+##  Overview display elements                                   ##
+##################################################################
+
+class CoreOverviewRaster(object):
+    """
+    Per-pixel picture of the core view for when intervals are narrower than a
+    pixel. Each core's busy and failed time is binned with NumPy, and a pyramid
+    of coarser binnings makes zoomed-out views a slice and a sum.
+    """
+    def __init__(self, scheduleData, w, levels=OVERVIEW_PYRAMID_LEVELS):
+        self.startTime = scheduleData.startTime
+        self.endTime = scheduleData.endTime
+        self.plotWidth = w - BUFFER_LEFT - BUFFER_RIGHT
+        self.coreIds = sorted(core.id for core in scheduleData.coreSet)
+
+        self.build_cumulative(scheduleData.getIntervalArrays())
+        self.build_pyramid(levels)
+
+    def build_cumulative(self, arrays):
+        # For each core and category: the intervals' starts and ends in time
+        # order, and the running total of their lengths. Intervals on one
+        # core never overlap, so the ends are sorted too.
+        self.cumulative = []
+        for coreId in self.coreIds:
+            onCore = arrays["coreId"] == coreId
+            categories = []
+            for mask in (arrays["taskId"] > 0, arrays["taskId"] == -1): # busy, failed
+                select = onCore & mask
+                order = np.argsort(arrays["start"][select], kind="stable")
+                starts = arrays["start"][select][order]
+                ends = arrays["end"][select][order]
+                totals = np.concatenate(([0.0], np.cumsum(ends - starts)))
+                categories.append((starts, ends, totals))
+            self.cumulative.append(categories)
+
+    def build_pyramid(self, levels):
+        # Level 0 is the finest; each further level halves the number of bins
+        numBins = self.plotWidth * 2 ** levels
+        edges = np.linspace(self.startTime, self.endTime, numBins + 1)
+        self.pyramid = [self.bin_occupancy(edges)]
+        for k in range(levels):
+            finer = self.pyramid[-1]
+            self.pyramid.append(finer.reshape(finer.shape[0], 2, -1, 2).sum(axis=3))
+
+    def occupied_before(self, starts, ends, totals, t):
+        """
+        Time covered by the intervals (starts, ends) before each instant in t.
+        """
+        k = np.searchsorted(ends, t, side="right")
+        partial = np.zeros_like(t)
+        inside = k < len(starts)
+        kk = k[inside]
+        partial[inside] = np.clip(t[inside] - starts[kk], 0.0, ends[kk] - starts[kk])
+        return totals[k] + partial
+
+    def bin_occupancy(self, edges):
+        """
+        Returns an array (cores, 2, bins) of busy and failed time in each
+        bin between consecutive edges.
+        """
+        occupancy = np.empty((len(self.coreIds), 2, len(edges) - 1))
+        for (i, categories) in enumerate(self.cumulative):
+            for (c, (starts, ends, totals)) in enumerate(categories):
+                occupancy[i, c] = np.diff(self.occupied_before(starts, ends, totals, edges))
+        return occupancy
+
+    def columns(self, viewStart, viewEnd):
+        """
+        Returns an array (cores, 2, plotWidth) with the fraction of each pixel
+        column's time that each core was busy or failed.
+        """
+        width = self.plotWidth
+        totalTime = self.endTime - self.startTime
+
+        # Coarsest level that still has at least one bin per pixel
+        for bins in reversed(self.pyramid):
+            binTime = totalTime / bins.shape[2]
+            b0 = (viewStart - self.startTime) / binTime
+            b1 = (viewEnd - self.startTime) / binTime
+            if b1 - b0 >= width:
+                bounds = np.floor(b0 + np.arange(width + 1) * (b1 - b0) / width).astype(np.int64)
+                bounds = np.clip(bounds, 0, bins.shape[2])
+                sums = np.add.reduceat(bins[:, :, :bounds[-1]], bounds[:-1], axis=2)
+                return sums / (np.diff(bounds) * binTime)
+
+        # Zoomed in past the finest level: bin the pixel columns exactly
+        edges = np.linspace(viewStart, viewEnd, width + 1)
+        return self.bin_occupancy(edges) / np.diff(edges)
+
+    def draw(self, surface, viewStart, viewEnd, numCores, h):
+        fractions = np.clip(self.columns(viewStart, viewEnd), 0.0, 1.0)
+        busy = fractions[:, 0, :, np.newaxis]
+        failed = fractions[:, 1, :, np.newaxis]
+        idle = np.clip(1.0 - busy - failed, 0.0, 1.0)
+
+        background = np.array(SchedulingDisplayColors.BACKGROUND, dtype=np.float64)
+        colors = busy * np.array(SchedulingDisplayColors.OVERVIEW_BUSY) + \
+                 failed * np.array(SchedulingDisplayColors.OVERVIEW_FAILED) + idle * background
+
+        # surfarray uses (x, y, rgb) indexing
+        pixels = np.empty((self.plotWidth, h, 3), dtype=np.uint8)
+        pixels[:, :, :] = background.astype(np.uint8)
+        for (i, coreId) in enumerate(self.coreIds):
+            top, height = core_row_extent(coreId, numCores, h)
+            pixels[:, top:top + height, :] = colors[i].astype(np.uint8)[:, np.newaxis, :]
+
+        surface.blit(pygame.surfarray.make_surface(pixels), (BUFFER_LEFT, 0))
+
 ##################################################################
 ##  Job display elements                                        ##
 ##################################################################
@@ -471,6 +652,8 @@ class SchedulingDisplayColors(object):
         COMPLETION_HAT  = (  20, 40, 100)  # dark blue
         INTERVAL_BORDER = (  0,   0,   0)  # black
         INTERVAL_FILL   = (128, 128, 128)  # light gray
+        OVERVIEW_BUSY   = (150, 150,   0)  # olive
+        OVERVIEW_FAILED = (200,   0,   0)  # red
     else:
         # Fun display for screens
         BACKGROUND      = ( 40,  40,  40)  # dark gray
@@ -483,29 +666,57 @@ class SchedulingDisplayColors(object):
         COMPLETION_HAT  = (255, 248, 100)  # yellow
         INTERVAL_BORDER = (255, 255, 255)  # white
         INTERVAL_FILL   = (  0, 128, 255)  # blue
+        OVERVIEW_BUSY   = (128, 255,   0)  # red-green
+        OVERVIEW_FAILED = (255,   0,   0)  # red
 
 class SchedulingDisplay(object):
-    def __init__(self, width=1080, height=720, fps=30, scheduleData=None, display_type='tasks'):
-        pygame.init()
-        pygame.display.set_caption("CS 330 Scheduling Display")
-
+    def __init__(self, width=1080, height=720, fps=30, scheduleData=None, display_type='tasks', headless=False, overview=None):
+        """
+        headless: render without opening a window (only export() is usable)
+        overview: rasterize the core view (True), draw every interval (False),
+                  or pick by interval density in the viewport (None)
+        """
         self.width = width
         self.height = height
-        self.screen = pygame.display.set_mode((self.width, self.height), pygame.DOUBLEBUF)
+        self.headless = headless
 
-        self.background = pygame.Surface(self.screen.get_size())
-        self.background.fill(SchedulingDisplayColors.BACKGROUND)
-        self.background = self.background.convert()
+        if headless:
+            # Fonts are all a scene needs; no window or video driver
+            pygame.font.init()
+            self.screen = None
+        else:
+            pygame.init()
+            pygame.display.set_caption("CS 330 Scheduling Display")
+            self.screen = pygame.display.set_mode((self.width, self.height), pygame.DOUBLEBUF)
+            self.clock = pygame.time.Clock()
 
-        self.clock = pygame.time.Clock()
         self.fps = fps
 
         self.scheduleData = scheduleData
         self.display_type = display_type
+        # Length of one tick in the units of the task set, for the time labels
+        self.timeScale = getattr(getattr(scheduleData, "taskSet", None), "quantum", 1)
+
+        # The schedule never changes once built, so each view is drawn once
+        # into a surface and the frame loop only blits it. Zooming or panning
+        # clears the cache and redraws only what is inside the viewport.
+        self.scenes = {}
+
+        # Per-core and per-task time indexes, built on first render
+        self.coreIndex = None
+        self.taskIndex = None
+
+        self.overview = overview
+        self.overviewRaster = None
+
+        if scheduleData is not None:
+            self.reset_view()
 
     def parse_input(self):
         """
-        Parse user input from the keyboard.
+        Parse user input from the keyboard and mouse.
+
+        +/- or the mouse wheel zoom, the arrow keys pan and Home shows the whole schedule.
         """
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -513,6 +724,19 @@ class SchedulingDisplay(object):
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     self.running = False
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    self.zoom(0.5)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.zoom(2.0)
+                elif event.key == pygame.K_LEFT:
+                    self.pan(-0.25)
+                elif event.key == pygame.K_RIGHT:
+                    self.pan(0.25)
+                elif event.key == pygame.K_HOME:
+                    self.reset_view()
+            elif event.type == pygame.MOUSEWHEEL:
+                mouseX = pygame.mouse.get_pos()[0]
+                self.zoom(0.8 if event.y > 0 else 1.25, self.pixel_to_time(mouseX))
             elif event.type == pygame.KEYUP:
                 if event.key == pygame.K_s and (event.mod & pygame.KMOD_CTRL):
                     print("Saving schedule as screenshot.png")
@@ -528,78 +752,317 @@ class SchedulingDisplay(object):
 
             self.clock.tick(self.fps)
 
-            if self.scheduleData is not None:
-                if self.display_type == 'tasks':
-                    self.draw_schedule_tasks()
-                    self.draw_axes_tasks()
-                else:
-                    self.draw_schedule_cores()
-                    self.draw_axes_cores()
-
-
+            self.screen.blit(self.get_scene(), (0, 0))
             pygame.display.flip()
-            self.screen.blit(self.background, (0, 0))
 
         pygame.quit()
 
-    def draw_schedule_tasks(self):
-        numTasks = len(self.scheduleData.taskSet)
-        scheduleStartTime = self.scheduleData.startTime
-        scheduleEndTime = self.scheduleData.endTime
+    ##############################################################
+    ##  Viewport                                                ##
+    ##############################################################
 
-        for (i, interval) in enumerate(reversed(self.scheduleData.intervals)):
-            if interval.taskId == 0:
-                continue
+    def reset_view(self):
+        self.set_view(self.scheduleData.startTime, self.scheduleData.endTime)
 
-            intervalRect = IntervalRectTasks(interval, scheduleStartTime, scheduleEndTime, numTasks, self.width, self.height, None)
-            intervalRect.draw(self.background)
+    def set_view(self, viewStart, viewEnd):
+        """
+        Shows [viewStart, viewEnd), clamped to the schedule, and drops cached scenes.
+        """
+        scheduleStart = self.scheduleData.startTime
+        scheduleEnd = self.scheduleData.endTime
+        span = min(max(viewEnd - viewStart, MIN_VIEW_SPAN), scheduleEnd - scheduleStart)
+
+        viewStart = min(max(viewStart, scheduleStart), scheduleEnd - span)
+        self.viewStart = viewStart
+        self.viewEnd = viewStart + span
+        self.scenes = {}
+
+    def zoom(self, factor, centerTime=None):
+        """
+        Scales the visible span by factor (< 1 zooms in) around centerTime,
+        which stays at the same place on screen.
+        """
+        if centerTime is None:
+            centerTime = (self.viewStart + self.viewEnd) / 2.0
+        self.set_view(centerTime - (centerTime - self.viewStart) * factor,
+                      centerTime + (self.viewEnd - centerTime) * factor)
 
+    def pan(self, fraction):
+        """
+        Moves the viewport by a fraction of its width (negative is earlier).
+        """
+        shift = (self.viewEnd - self.viewStart) * fraction
+        self.set_view(self.viewStart + shift, self.viewEnd + shift)
+
+    def pixel_to_time(self, px):
+        plotWidth = self.width - BUFFER_LEFT - BUFFER_RIGHT
+        fraction = min(max(float(px - BUFFER_LEFT) / plotWidth, 0.0), 1.0)
+        return self.viewStart + fraction * (self.viewEnd - self.viewStart)
+
+    def build_indexes(self):
+        """
+        Takes the per-core and per-task time indexes from the schedule and
+        sorts each task's release and deadline times, once.
+        """
+        index = self.scheduleData.getIndex()
+        self.coreIndex = index.byCore
+        self.taskIndex = index.byTask
+
+        # Active copies share their primary's release and deadline
+        self.releaseTimes = {}
+        self.deadlineTimes = {}
         for task in self.scheduleData.taskSet:
-            for job in task.jobs:
-                releaseTime = job.releaseTime
-                releaseArrow = ReleaseArrow(releaseTime, task.id, numTasks, scheduleStartTime, scheduleEndTime, self.width, self.height, None)
-                releaseArrow.draw(self.background)
+            primaries = [job for job in task.jobs if job.backupId == 0]
+            self.releaseTimes[task.id] = sorted(job.releaseTime for job in primaries)
+            self.deadlineTimes[task.id] = sorted(job.deadline for job in primaries)
 
-                deadlineTime = job.deadline
-                deadlineArrow = DeadlineArrow(deadlineTime, task.id, numTasks, scheduleStartTime, scheduleEndTime, self.width, self.height, None)
-                deadlineArrow.draw(self.background)
+    def get_scene(self, display_type=None):
+        """
+        Returns the cached surface for a view ('tasks' or 'cores') at the
+        current viewport, rendering it on first use.
+        """
+        display_type = display_type or self.display_type
+        if display_type not in self.scenes:
+            self.scenes[display_type] = self.render_scene(display_type)
+        return self.scenes[display_type]
+
+    def render_scene(self, display_type):
+        scene = pygame.Surface((self.width, self.height))
+        scene.fill(SchedulingDisplayColors.BACKGROUND)
+
+        if self.scheduleData is not None:
+            if self.coreIndex is None:
+                self.build_indexes()
+
+            # Intervals cut by the viewport edges must not spill into the margins
+            plotRect = pygame.Rect(BUFFER_LEFT, 0, self.width - BUFFER_LEFT - BUFFER_RIGHT + LINE_WIDTH, self.height)
+            scene.set_clip(plotRect)
+            if display_type == 'tasks':
+                self.draw_schedule_tasks(scene)
+            else:
+                self.draw_schedule_cores(scene)
+            scene.set_clip(None)
+
+            if display_type == 'tasks':
+                self.draw_axes_tasks(scene)
+            else:
+                self.draw_axes_cores(scene)
+
+        if not self.headless:
+            scene = scene.convert()
+        return scene
+
+    def export(self, path, views=('tasks', 'cores')):
+        """
+        Writes each view to an image without needing a window. 'chart.png'
+        becomes chart_tasks.png and chart_cores.png. Returns the written paths.
+        """
+        root, ext = os.path.splitext(path)
+        paths = []
+        for view in views:
+            viewPath = "{0}_{1}{2}".format(root, view, ext or ".png")
+            pygame.image.save(self.get_scene(view), viewPath)
+            paths.append(viewPath)
+        return paths
+
+    def draw_schedule_tasks(self, surface):
+        numTasks = len(self.scheduleData.taskSet)
+        viewStart, viewEnd = self.viewStart, self.viewEnd
 
-        for interval in self.scheduleData.intervals:
-            if interval.jobCompleted:
-                completionHat = CompletionHat(interval.endTime, interval.taskId, numTasks, scheduleStartTime, scheduleEndTime, self.width, self.height, None)
-                completionHat.draw(self.background)
+        for taskId in self.taskIndex:
+            for interval in self.taskIndex[taskId].overlapping(viewStart, viewEnd):
+                intervalRect = IntervalRectTasks(interval, viewStart, viewEnd, numTasks, self.width, self.height, None)
+                intervalRect.draw(surface)
 
-    def draw_schedule_cores(self):
+        for task in self.scheduleData.taskSet:
+            releaseTimes = self.releaseTimes[task.id]
+            for k in range(bisect_left(releaseTimes, viewStart), bisect_right(releaseTimes, viewEnd)):
+                releaseArrow = ReleaseArrow(releaseTimes[k], task.id, numTasks, viewStart, viewEnd, self.width, self.height, None)
+                releaseArrow.draw(surface)
+
+            deadlineTimes = self.deadlineTimes[task.id]
+            for k in range(bisect_left(deadlineTimes, viewStart), bisect_right(deadlineTimes, viewEnd)):
+                deadlineArrow = DeadlineArrow(deadlineTimes[k], task.id, numTasks, viewStart, viewEnd, self.width, self.height, None)
+                deadlineArrow.draw(surface)
+
+        for taskId in self.taskIndex:
+            for interval in self.taskIndex[taskId].overlapping(viewStart, viewEnd):
+                if interval.jobCompleted and interval.endTime <= viewEnd:
+                    completionHat = CompletionHat(interval.endTime, interval.taskId, numTasks, viewStart, viewEnd, self.width, self.height, None)
+                    completionHat.draw(surface)
+
+    def use_overview(self):
+        if self.overview is not None:
+            return self.overview
+        plotWidth = self.width - BUFFER_LEFT - BUFFER_RIGHT
+        visible = sum(index.countOverlapping(self.viewStart, self.viewEnd) for index in self.coreIndex.values())
+        return visible * OVERVIEW_MIN_PIXELS_PER_INTERVAL > plotWidth * max(1, len(self.coreIndex))
+
+    def draw_schedule_cores(self, surface):
         numCores = len(self.scheduleData.coreSet)
-        scheduleStartTime = self.scheduleData.startTime
-        scheduleEndTime = self.scheduleData.endTime
+        viewStart, viewEnd = self.viewStart, self.viewEnd
+
+        if self.use_overview():
+            if self.overviewRaster is None:
+                self.overviewRaster = CoreOverviewRaster(self.scheduleData, self.width)
+            self.overviewRaster.draw(surface, viewStart, viewEnd, numCores, self.height)
+            return
+
+        for coreId in self.coreIndex:
+            for interval in self.coreIndex[coreId].overlapping(viewStart, viewEnd):
+                if interval.taskId == 0:
+                    continue
+
+                color = ((interval.taskId * 50 % 255), (interval.taskId * 50 % 255), 0)
+                if interval.taskId == -1:
+                    color = (200,0,0)
+                intervalRect = IntervalRectCores(interval, viewStart, viewEnd, numCores, self.width, self.height, color)
+                intervalRect.draw(surface)
+
+
+    def draw_axes_tasks(self, surface):
+        if self.scheduleData is not None:
+            xaxis = XAxis(self.viewStart, self.viewEnd, self.width, self.height, self.timeScale)
+            xaxis.draw(surface)
+
+            yaxis = YAxisTasks(self.scheduleData.taskSet, self.viewStart, self.viewEnd, self.width, self.height)
+            yaxis.draw(surface)
+
+    def draw_axes_cores(self, surface):
+        if self.scheduleData is not None:
+            xaxis = XAxis(self.viewStart, self.viewEnd, self.width, self.height, self.timeScale)
+            xaxis.draw(surface)
+
+            yaxis = YAxisCores(self.scheduleData.coreSet, self.viewStart, self.viewEnd, self.width, self.height)
+            yaxis.draw(surface)
+
+class LiveSchedulingDisplay(SchedulingDisplay):
+    def __init__(self, coreSet, intervalQueue, horizon, width=1080, height=720, fps=30, startTime=0.0, headless=False,
+                 timeScale=1):
+        """
+        Core view of a simulation that is still running (see livestream.py).
+        A background thread drains intervalQueue; each frame draws only the
+        intervals that arrived since the previous frame onto the cached scene.
+        The time axis doubles whenever an interval ends past horizon.
+        timeScale: the task set's time quantum, for the time labels
+        """
+        SchedulingDisplay.__init__(self, width, height, fps, None, 'cores', headless)
+        self.coreSet = coreSet
+        self.timeScale = timeScale
+        self.intervalQueue = intervalQueue
+        self.viewStart = startTime
+        self.viewEnd = max(horizon, startTime + MIN_VIEW_SPAN)
+
+        # Filled by the consumer thread, emptied by the drawing thread
+        self.arrived = collections.deque()
+        self.finished = threading.Event()
+        self.consumer = None
+
+    def start(self):
+        if self.consumer is None:
+            self.consumer = threading.Thread(target=self.consume, name="live-display", daemon=True)
+            self.consumer.start()
+
+    def consume(self):
+        while True:
+            interval = self.intervalQueue.get()
+            if interval is IntervalPublisher.END_OF_STREAM:
+                self.finished.set()
+                return
+            self.arrived.append(interval)
+
+    def set_view(self, viewStart, viewEnd):
+        # The live view always shows the whole run so far
+        pass
+
+    def render_scene(self, display_type):
+        scene = pygame.Surface((self.width, self.height))
+        scene.fill(SchedulingDisplayColors.BACKGROUND)
+        self.draw_axes(scene)
+        if not self.headless:
+            scene = scene.convert()
+        return scene
+
+    def draw_axes(self, surface):
+        xaxis = XAxis(self.viewStart, self.viewEnd, self.width, self.height, self.timeScale)
+        xaxis.draw(surface)
+
+        yaxis = YAxisCores(self.coreSet, self.viewStart, self.viewEnd, self.width, self.height)
+        yaxis.draw(surface)
+
+    def plot_rect(self):
+        # Stops above the x axis tick marks so they are not shrunk along with the intervals
+        return pygame.Rect(BUFFER_LEFT, 0, self.width - BUFFER_LEFT - BUFFER_RIGHT, self.height - BUFFER_BOTTOM - 2 * LINE_WIDTH)
+
+    def extend_horizon(self, endTime):
+        """
+        Doubles the time axis until endTime fits. What has been drawn so far
+        is shrunk onto the new axis instead of being redrawn, so the display
+        never needs to keep the intervals themselves.
+        """
+        oldScene = self.get_scene()
+        oldSpan = self.viewEnd - self.viewStart
+        while self.viewEnd < endTime:
+            self.viewEnd = self.viewStart + 2 * (self.viewEnd - self.viewStart)
+
+        plotRect = self.plot_rect()
+        plot = oldScene.subsurface(plotRect).copy()
+        scaledWidth = max(1, int(plotRect.width * oldSpan / (self.viewEnd - self.viewStart)))
+
+        self.scenes = {}
+        scene = self.get_scene()
+        scene.blit(pygame.transform.smoothscale(plot, (scaledWidth, plotRect.height)), plotRect.topleft)
+
+    def draw_arrived(self):
+        """
+        Draws the intervals that arrived since the last call onto the scene.
+        Returns how many were drawn.
+        """
+        numCores = len(self.coreSet)
+        count = len(self.arrived)
+        for i in range(count):
+            interval = self.arrived.popleft()
+            if interval.endTime > self.viewEnd:
+                self.extend_horizon(interval.endTime)
 
-        for (i, interval) in enumerate(reversed(self.scheduleData.intervals)):
-            if interval.taskId == 0:
-                continue
-            
             color = ((interval.taskId * 50 % 255), (interval.taskId * 50 % 255), 0)
             if interval.taskId == -1:
                 color = (200,0,0)
-            intervalRect = IntervalRectCores(interval, scheduleStartTime, scheduleEndTime, numCores, self.width, self.height, color)
-            intervalRect.draw(self.background)
+            scene = self.get_scene()
+            scene.set_clip(self.plot_rect())
+            IntervalRectCores(interval, self.viewStart, self.viewEnd, numCores, self.width, self.height, color).draw(scene)
+            scene.set_clip(None)
+        return count
+
+    def wait(self, timeout=None):
+        """
+        Headless helper: draws until the stream ends. Returns False on timeout.
+        """
+        self.start()
+        done = self.finished.wait(timeout)
+        self.draw_arrived()
+        return done
 
+    def export(self, path, views=('cores',)):
+        return SchedulingDisplay.export(self, path, ('cores',))
 
-    def draw_axes_tasks(self):
-        if self.scheduleData is not None:
-            xaxis = XAxis(self.scheduleData.startTime, self.scheduleData.endTime, self.width, self.height)
-            xaxis.draw(self.background)
+    def run(self):
+        """
+        The main loop: check for user input, draw new intervals, update the display.
+        """
+        self.start()
 
-            yaxis = YAxisTasks(self.scheduleData.taskSet, self.scheduleData.startTime, self.scheduleData.endTime, self.width, self.height)
-            yaxis.draw(self.background)
+        self.running = True
+        while self.running:
+            self.parse_input()
 
-    def draw_axes_cores(self):
-        if self.scheduleData is not None:
-            xaxis = XAxis(self.scheduleData.startTime, self.scheduleData.endTime, self.width, self.height)
-            xaxis.draw(self.background)
+            self.clock.tick(self.fps)
 
-            yaxis = YAxisCores(self.scheduleData.coreSet, self.scheduleData.startTime, self.scheduleData.endTime, self.width, self.height)
-            yaxis.draw(self.background)
+            self.draw_arrived()
+            self.screen.blit(self.get_scene(), (0, 0))
+            pygame.display.flip()
+
+        pygame.quit()
 
 if __name__ == '__main__':
     if len(sys.argv) > 1:
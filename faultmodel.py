@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+
+"""
+faultmodel.py - fault models for the faulty cores of a CoreSet
+
+FaultModel: interface; decides each tick whether a faulty core is fine, fails
+    transiently or fails permanently
+BurstyFaultModel: the burst/gap (Gilbert-Elliott style) model the simulator
+    has always used, and the default
+FixedRateFaultModel: memoryless transient and permanent fault rates, per
+    unit of taskset time like the CoreSet's (converted to ticks)
+WeibullAgingFaultModel: permanent faults with a Weibull (wear-out) hazard
+CorrelatedFaultModel: common-cause shocks that take several cores down together
+RecordingFaultModel, FaultTrace, ReplayFaultModel: record the faults of a run
+    to a compressed .npz file and replay them without drawing random numbers
+ScriptedFaultModel: forces chosen faults on top of another model
+"""
+
+import copy
+import math
+import random
+
+import numpy as np
+
+from coreset import perTick, wholeTicks
+
+class FaultModel(object):
+    # Outcome of sampling one core for one tick
+    OK = 0
+    TRANSIENT = 1
+    PERMANENT = 2
+
+    # Attributes that change during a run; getState copies them for checkpoints
+    STATE = ()
+
+    def __init__(self, seed=None):
+        """
+        With seed None the model draws from the global random and np.random
+        generators, like the rest of the simulator. A seed gives the model
+        its own generators, so faults no longer depend on other draws.
+        """
+        self.seed = seed
+        self._seedGenerators()
+        self.coreSet = None
+        self.startTime = 0.0
+
+    def _seedGenerators(self):
+        if self.seed is None:
+            self.rng = random
+            self.npRandom = np.random
+        else:
+            self.rng = random.Random(self.seed)
+            self.npRandom = np.random.RandomState(self.seed)
+        self.random = self.rng.random
+
+    def reset(self, coreSet, startTime=0.0):
+        """
+        Called once at the start of every buildSchedule. A seeded model
+        restarts its generators, so every run sees the same faults.
+        """
+        self.coreSet = coreSet
+        self.startTime = startTime
+        self._seedGenerators()
+
+    def beginTick(self, t):
+        """
+        Called once per tick, before the cores are sampled.
+        """
+        pass
+
+    def clone(self):
+        """
+        Returns an unstarted model with the same parameters.
+        """
+        clone = copy.copy(self)
+        clone._seedGenerators()
+        return clone
+
+    def getState(self):
+        """
+        Returns a picklable copy of everything the model will use to decide
+        future faults, including its generators' states. For an unseeded
+        model these are the global random and np.random states.
+        """
+        state = {
+            "startTime": self.startTime,
+            "random": self.rng.getstate(),
+            "npRandom": self.npRandom.get_state(),
+        }
+        for name in self.STATE:
+            state[name] = copy.deepcopy(getattr(self, name))
+        return state
+
+    def setState(self, state):
+        """
+        Continues from a state returned by getState. reset() must have been
+        called with the same CoreSet first.
+        """
+        self.startTime = state["startTime"]
+        if self.seed is not None:
+            # Fresh generators, so a copied model does not share them with the original
+            self.rng = random.Random()
+            self.npRandom = np.random.RandomState()
+            self.random = self.rng.random
+        self.rng.setstate(state["random"])
+        self.npRandom.set_state(state["npRandom"])
+        for name in self.STATE:
+            setattr(self, name, copy.deepcopy(state[name]))
+
+    def sample(self, coreId, t):
+        """
+        Returns OK, TRANSIENT or PERMANENT for core coreId during [t, t+1).
+        Only called for faulty cores that have not failed permanently, in core order.
+        """
+        raise NotImplementedError
+
+class BurstyFaultModel(FaultModel):
+    STATE = ("faultPeriods", "lastFaultPeriodStart")
+
+    def __init__(self, seed=None):
+        """
+        Each core alternates between a burst period (fault probability
+        lambda_b) and a gap period (lambda_r). Period lengths are geometric,
+        scaled by fault_period_scaler. Every tick can also fail the core
+        permanently with probability lambda_c. All parameters come from the
+        CoreSet, in ticks of its quantum.
+        """
+        FaultModel.__init__(self, seed)
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        #fault periods are (lB, lG) where lB = [start, start+lB) and lG = [start+lB, start+lB+lG)
+        self.faultPeriods = {}
+        self.lastFaultPeriodStart = {}
+        for core in coreSet:
+            self.faultPeriods[core.id] = (0, 0)
+            self.lastFaultPeriodStart[core.id] = startTime
+
+    def isBursty(self, coreId, t):
+        return t < self.lastFaultPeriodStart[coreId] + self.faultPeriods[coreId][0]
+
+    def _advancePeriods(self, coreId, t):
+        """
+        Draws the next burst and gap lengths when the current pair has ended.
+        """
+        coreSet = self.coreSet
+        if t >= self.lastFaultPeriodStart[coreId] + sum(self.faultPeriods[coreId]):
+            self.lastFaultPeriodStart[coreId] = t
+            newLB = self.npRandom.geometric(coreSet.lBurstProb)*coreSet.fault_period_scaler
+            newLG = self.npRandom.geometric(coreSet.lGapProb)*coreSet.fault_period_scaler
+            self.faultPeriods[coreId] = (newLB, newLG)
+
+    def sample(self, coreId, t):
+        coreSet = self.coreSet
+        self._advancePeriods(coreId, t)
+
+        cutoff = self.random()
+        if cutoff < coreSet.lambda_c:
+            return FaultModel.PERMANENT
+        if cutoff < (coreSet.lambda_b if self.isBursty(coreId, t) else coreSet.lambda_r):
+            return FaultModel.TRANSIENT
+        return FaultModel.OK
+
+class FixedRateFaultModel(FaultModel):
+    def __init__(self, lambda_t=None, lambda_c=None, seed=None):
+        """
+        Every unit of time a core fails permanently with probability
+        lambda_c, or else transiently with probability lambda_t (converted to
+        ticks like the CoreSet's, see CoreSet.setQuantum). None takes lambda_r
+        and lambda_c from the CoreSet.
+        """
+        FaultModel.__init__(self, seed)
+        self.lambda_t = lambda_t
+        self.lambda_c = lambda_c
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        self.transientRate = coreSet.lambda_r if self.lambda_t is None else perTick(self.lambda_t, coreSet.quantum)
+        self.permanentRate = coreSet.lambda_c if self.lambda_c is None else perTick(self.lambda_c, coreSet.quantum)
+
+    def sample(self, coreId, t):
+        cutoff = self.random()
+        if cutoff < self.permanentRate:
+            return FaultModel.PERMANENT
+        if cutoff < self.transientRate:
+            return FaultModel.TRANSIENT
+        return FaultModel.OK
+
+class WeibullAgingFaultModel(FaultModel):
+    def __init__(self, shape=2.0, scale=200.0, lambda_t=None, seed=None):
+        """
+        Permanent faults follow a Weibull lifetime with the given shape and
+        scale (in taskset time units since the start of the schedule); shape
+        > 1 models wear-out, so old cores fail more often. Transient faults
+        have the fixed rate lambda_t per unit of time (None takes lambda_r
+        from the CoreSet).
+        """
+        FaultModel.__init__(self, seed)
+        if shape <= 0 or scale <= 0:
+            raise ValueError("Weibull shape and scale must be positive")
+        self.shape = shape
+        self.scale = scale
+        self.lambda_t = lambda_t
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        self.transientRate = coreSet.lambda_r if self.lambda_t is None else perTick(self.lambda_t, coreSet.quantum)
+        self.tickScale = self.scale if coreSet.quantum == 1 else self.scale / float(coreSet.quantum)
+
+    def _cumulativeHazard(self, age):
+        return (age / self.tickScale) ** self.shape
+
+    def permanentProbability(self, t):
+        """
+        Probability that a core alive at t fails permanently during [t, t+1).
+        """
+        age = max(0.0, t - self.startTime)
+        return 1.0 - math.exp(self._cumulativeHazard(age) - self._cumulativeHazard(age + 1.0))
+
+    def sample(self, coreId, t):
+        cutoff = self.random()
+        permanent = self.permanentProbability(t)
+        if cutoff < permanent:
+            return FaultModel.PERMANENT
+        if cutoff < permanent + self.transientRate:
+            return FaultModel.TRANSIENT
+        return FaultModel.OK
+
+class CorrelatedFaultModel(FaultModel):
+    STATE = ("shockEnd", "shockedCores")
+
+    def __init__(self, shockRate=0.05, coupling=0.8, shockLength=2, lambda_t=None, lambda_c=None, seed=None):
+        """
+        Common-cause faults: outside a shock, a shock starts with probability
+        shockRate per unit of time and lasts shockLength time units (rounded
+        up to whole ticks). Each
+        faulty core is hit by a shock with probability coupling and fails for
+        its whole length. On top of that, cores fail independently like
+        FixedRateFaultModel.
+        """
+        FaultModel.__init__(self, seed)
+        self.shockRate = shockRate
+        self.coupling = coupling
+        self.shockLength = shockLength
+        self.lambda_t = lambda_t
+        self.lambda_c = lambda_c
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        quantum = coreSet.quantum
+        self.transientRate = coreSet.lambda_r if self.lambda_t is None else perTick(self.lambda_t, quantum)
+        self.permanentRate = coreSet.lambda_c if self.lambda_c is None else perTick(self.lambda_c, quantum)
+        self.tickShockRate = perTick(self.shockRate, quantum)
+        self.tickShockLength = wholeTicks(self.shockLength, quantum)
+        self.shockEnd = float("-inf")
+        self.shockedCores = set()
+
+    def beginTick(self, t):
+        if t >= self.shockEnd and self.random() < self.tickShockRate:
+            self.shockEnd = t + self.tickShockLength
+            self.shockedCores = set(core.id for core in self.coreSet
+                                    if core.is_faulty and self.random() < self.coupling)
+
+    def sample(self, coreId, t):
+        cutoff = self.random()
+        if cutoff < self.permanentRate:
+            return FaultModel.PERMANENT
+        if t < self.shockEnd and coreId in self.shockedCores:
+            return FaultModel.TRANSIENT
+        if cutoff < self.transientRate:
+            return FaultModel.TRANSIENT
+        return FaultModel.OK
+
+class FaultTrace(object):
+    def __init__(self, times, coreIds, kinds, endTime, numCores):
+        """
+        The non-OK samples of one run, as parallel arrays, and the end of the
+        sampled range. Every sample before endTime that is not listed was OK.
+        """
+        self.times = np.asarray(times, dtype=np.int64)
+        self.coreIds = np.asarray(coreIds, dtype=np.int16)
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        self.endTime = int(endTime)
+        self.numCores = int(numCores)
+
+    def __len__(self):
+        return len(self.times)
+
+    def save(self, file_path):
+        np.savez_compressed(file_path, times=self.times, coreIds=self.coreIds, kinds=self.kinds,
+                            endTime=np.int64(self.endTime), numCores=np.int64(self.numCores))
+
+    @staticmethod
+    def load(file_path):
+        with np.load(file_path) as data:
+            return FaultTrace(data["times"], data["coreIds"], data["kinds"],
+                              int(data["endTime"]), int(data["numCores"]))
+
+class RecordingFaultModel(FaultModel):
+    STATE = ("times", "coreIds", "kinds", "endTime")
+
+    def __init__(self, model):
+        """
+        Wraps another model and records every fault it produces.
+        """
+        FaultModel.__init__(self)
+        self.model = model
+        self.times = []
+        self.coreIds = []
+        self.kinds = []
+        self.endTime = 0
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        self.model.reset(coreSet, startTime)
+        self.times = []
+        self.coreIds = []
+        self.kinds = []
+        self.endTime = startTime
+
+    def beginTick(self, t):
+        self.model.beginTick(t)
+        self.endTime = t + 1
+
+    def sample(self, coreId, t):
+        kind = self.model.sample(coreId, t)
+        if kind != FaultModel.OK:
+            self.times.append(t)
+            self.coreIds.append(coreId)
+            self.kinds.append(kind)
+        return kind
+
+    def trace(self):
+        return FaultTrace(self.times, self.coreIds, self.kinds, self.endTime, len(self.coreSet))
+
+    def clone(self):
+        clone = FaultModel.clone(self)
+        clone.model = self.model.clone()
+        return clone
+
+    def getState(self):
+        state = FaultModel.getState(self)
+        state["model"] = self.model.getState()
+        return state
+
+    def setState(self, state):
+        FaultModel.setState(self, state)
+        self.model.setState(state["model"])
+
+class ReplayFaultModel(FaultModel):
+    def __init__(self, trace, fallback=None):
+        """
+        Replays a FaultTrace. Past the end of the trace, samples come from
+        fallback (a FaultModel) if one is given, and are OK otherwise.
+        """
+        FaultModel.__init__(self)
+        self.trace = trace
+        self.fallback = fallback
+        self.events = {}
+        for (t, coreId, kind) in zip(trace.times.tolist(), trace.coreIds.tolist(), trace.kinds.tolist()):
+            self.events[(coreId, t)] = kind
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        for (coreId, t) in self.events:
+            if coreId not in coreSet.cores:
+                raise ValueError("Fault trace has core {0}, which is not in the core set".format(coreId))
+        if self.fallback is not None:
+            # The fallback takes over where the trace ends
+            self.fallback.reset(coreSet, max(startTime, self.trace.endTime))
+
+    def beginTick(self, t):
+        if self.fallback is not None and t >= self.trace.endTime:
+            self.fallback.beginTick(t)
+
+    def sample(self, coreId, t):
+        if t < self.trace.endTime:
+            return self.events.get((coreId, t), FaultModel.OK)
+        if self.fallback is not None:
+            return self.fallback.sample(coreId, t)
+        return FaultModel.OK
+
+    def clone(self):
+        clone = FaultModel.clone(self)
+        if self.fallback is not None:
+            clone.fallback = self.fallback.clone()
+        return clone
+
+    def getState(self):
+        state = FaultModel.getState(self)
+        if self.fallback is not None:
+            state["fallback"] = self.fallback.getState()
+        return state
+
+    def setState(self, state):
+        FaultModel.setState(self, state)
+        if self.fallback is not None:
+            self.fallback.setState(state["fallback"])
+
+class ScriptedFaultModel(FaultModel):
+    def __init__(self, events, fallback=None):
+        """
+        Forces the given faults, for what-if runs such as "core 2 fails
+        permanently at tick 500". events is a list of (time, coreId, kind)
+        where time is a tick (an integer count of quanta, not taskset time
+        units) and coreId a faulty core: only those are sampled.
+        Every other sample comes from fallback (OK without one). The fallback
+        is sampled even when an event overrides it, so the other cores keep
+        their faults; with a ReplayFaultModel fallback they stay exactly the same.
+        """
+        FaultModel.__init__(self)
+        self.fallback = fallback
+        self.events = {}
+        for (t, coreId, kind) in events:
+            if t != int(t):
+                raise ValueError("Fault event time {0} is not a whole tick".format(t))
+            if kind not in (FaultModel.OK, FaultModel.TRANSIENT, FaultModel.PERMANENT):
+                raise ValueError("Unknown fault kind {0}".format(kind))
+            self.events[(coreId, int(t))] = kind
+
+    def reset(self, coreSet, startTime=0.0):
+        FaultModel.reset(self, coreSet, startTime)
+        for (coreId, t) in self.events:
+            if coreId not in coreSet.cores:
+                raise ValueError("Fault event has core {0}, which is not in the core set".format(coreId))
+            if not coreSet.getCoreById(coreId).is_faulty:
+                raise ValueError("Fault event has core {0}, which is not faulty and is never sampled".format(coreId))
+        if self.fallback is not None:
+            self.fallback.reset(coreSet, startTime)
+
+    def beginTick(self, t):
+        if self.fallback is not None:
+            self.fallback.beginTick(t)
+
+    def sample(self, coreId, t):
+        kind = self.fallback.sample(coreId, t) if self.fallback is not None else FaultModel.OK
+        return self.events.get((coreId, t), kind)
+
+    def clone(self):
+        clone = FaultModel.clone(self)
+        if self.fallback is not None:
+            clone.fallback = self.fallback.clone()
+        return clone
+
+    def getState(self):
+        state = FaultModel.getState(self)
+        if self.fallback is not None:
+            state["fallback"] = self.fallback.getState()
+        return state
+
+    def setState(self, state):
+        FaultModel.setState(self, state)
+        if self.fallback is not None:
+            self.fallback.setState(state["fallback"])
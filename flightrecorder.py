@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""
+flightrecorder.py - bounded event log for post-mortem debugging of a run
+
+FlightRecorder: keeps the most recent scheduler events in a fixed-size ring
+    buffer and freezes a copy of it when the first deadline is missed, so a
+    long run can be debugged without logging all of it
+"""
+
+import collections
+import json
+import sys
+
+from instrumentation import SchedulerEvents
+
+class FlightRecorder(object):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING}
+
+    # Level of each recorded event; an event is recorded if its level is at
+    # least the recorder's
+    EVENT_LEVELS = {
+        SchedulerEvents.INTERVAL: DEBUG,
+        SchedulerEvents.RELEASE: INFO,
+        SchedulerEvents.DISPATCH: INFO,
+        SchedulerEvents.PREEMPT: INFO,
+        SchedulerEvents.COMPLETE: INFO,
+        SchedulerEvents.PASSIVE_RELEASE: INFO,
+        SchedulerEvents.CANCEL: INFO,
+        SchedulerEvents.FAULT: WARNING,
+        SchedulerEvents.MISS: WARNING,
+    }
+
+    FIELDS = ("seq", "time", "level", "event", "coreId", "taskId", "jobId", "backupId")
+
+    def __init__(self, capacity=4096, level=INFO, onFirstMiss=None):
+        """
+        capacity: number of events kept; older ones are dropped
+        level: DEBUG, INFO or WARNING (or its name); DEBUG adds every interval
+        onFirstMiss: called as onFirstMiss(recorder) once the first deadline
+                     miss is recorded, e.g. to dump the buffer
+        """
+        self.capacity = capacity
+        self.level = FlightRecorder.LEVELS[level] if isinstance(level, str) else level
+        self.onFirstMiss = onFirstMiss
+        self.buffer = collections.deque(maxlen=capacity)
+        self.seq = 0
+        self.missSnapshot = None
+        self._callbacks = {}
+
+    def attach(self, scheduler):
+        """
+        Registers for the events at or above the level only, so the others
+        cost the scheduler nothing.
+        """
+        for (event, level) in FlightRecorder.EVENT_LEVELS.items():
+            if level >= self.level:
+                callback = self._callbacks.setdefault(event, self._recorderFor(level))
+                scheduler.addObserver(event, callback)
+
+    def detach(self, scheduler):
+        for (event, callback) in self._callbacks.items():
+            scheduler.removeObserver(event, callback)
+
+    def _recorderFor(self, level):
+        buffer = self.buffer
+
+        def record(event, t, coreId, job):
+            # Store ids, not the job: jobs change after the event
+            if event == SchedulerEvents.INTERVAL:
+                taskId, jobId, backupId = job.taskId, job.jobId, getattr(job, "backupId", -1)
+            elif job is None or job == -1:
+                taskId, jobId, backupId = None, None, None # no job, or the failed-core placeholder
+            else:
+                taskId, jobId, backupId = job.task.id, job.id, job.backupId
+            buffer.append((self.seq, t, level, event, coreId, taskId, jobId, backupId))
+            self.seq += 1
+            if event == SchedulerEvents.MISS and self.missSnapshot is None:
+                self.missSnapshot = list(buffer)
+                if self.onFirstMiss is not None:
+                    self.onFirstMiss(self)
+        return record
+
+    def clear(self):
+        self.buffer.clear()
+        self.seq = 0
+        self.missSnapshot = None
+
+    def records(self, atFirstMiss=False):
+        """
+        Returns the buffered events as dicts, oldest first. With atFirstMiss,
+        returns the buffer as it was when the first miss was recorded (empty
+        if there was none).
+        """
+        rows = (self.missSnapshot or []) if atFirstMiss else self.buffer
+        return [dict(zip(FlightRecorder.FIELDS, row)) for row in rows]
+
+    def dropped(self):
+        """
+        Number of events recorded so far that are no longer in the buffer.
+        """
+        return self.seq - len(self.buffer)
+
+    def format(self, atFirstMiss=False):
+        names = dict((level, name.upper()) for (name, level) in FlightRecorder.LEVELS.items())
+        lines = []
+        for record in self.records(atFirstMiss):
+            job = "" if record["taskId"] is None else " task {0} job {1} backup {2}".format(record["taskId"], record["jobId"], record["backupId"])
+            core = "" if record["coreId"] is None else " core {0}".format(record["coreId"])
+            lines.append("#{0} t={1} {2:<7} {3}{4}{5}".format(record["seq"], record["time"], names[record["level"]], record["event"], core, job))
+        return "\n".join(lines)
+
+    def dump(self, stream=None, atFirstMiss=False):
+        stream = stream if stream is not None else sys.stderr
+        stream.write(self.format(atFirstMiss) + "\n")
+
+    def toJson(self, indent=None, atFirstMiss=False):
+        return json.dumps({"capacity": self.capacity, "dropped": self.dropped(), "events": self.records(atFirstMiss)},
+                          indent=indent)
+
+    def save(self, file_path, atFirstMiss=False):
+        """
+        Writes the events as JSON (.json) or as text lines (any other extension).
+        """
+        with open(file_path, "w") as f:
+            if file_path.endswith(".json"):
+                f.write(self.toJson(indent=1, atFirstMiss=atFirstMiss))
+            else:
+                self.dump(f, atFirstMiss)
@@ -7,16 +7,23 @@ EdfPriorityQueue: priority queue that prioritizes by absolute deadline
 EdfScheduler: scheduling algorithm that executes EDF (preemptive)
 """
 
+import copy
 import json
 import sys
 import math
-import random
+from time import perf_counter
 
 from taskset import *
 from coreset import *
 from scheduleralgorithm import *
 from schedule import ScheduleInterval, Schedule
-from display import SchedulingDisplay
+from instrumentation import SchedulerEvents, SchedulerStats
+from faultmodel import FaultModel, BurstyFaultModel, ScriptedFaultModel
+from checkpoint import SchedulerCheckpoint, makeJob, makeInterval, divergenceTick
+
+# Part of every cached result's key (see resultcache.py); bump it whenever a
+# change makes the simulator produce different schedules for the same inputs
+SIMULATOR_VERSION = 5
 
 class EdfPriorityQueue(PriorityQueue):
     def __init__(self, jobReleaseDict):
@@ -45,10 +52,11 @@ class EdfPriorityQueue(PriorityQueue):
         currentJobs.sort(key = lambda x: (x[1].deadline, x[1].task.id, x[1].id))
         return currentJobs[0][0] # get the index from the tuple in the 0th position
 
-    def popJob(self, t, previousJob):
+    def popJob(self, t, previousJob, keepTies=False):
         """
         Remove and returns the highest-priority job of those release at or before t,
         or None if no jobs are released at or after t.
+        With keepTies, a queued copy of equal priority does not preempt previousJob.
         """
         Jobs = [(i, job) for (i, job) in enumerate(self.jobs) if job.releaseTime <= t]
         if len(Jobs) == 0:
@@ -56,13 +64,24 @@ class EdfPriorityQueue(PriorityQueue):
 
         Jobs.sort(key=lambda x: (x[1].deadline, x[1].task.id))
         if previousJob and previousJob != -1 and (Jobs[0][1].deadline > previousJob.deadline or
-                            (Jobs[0][1].deadline == previousJob.deadline and Jobs[0][1].task.id > previousJob.task.id)):
+                            (Jobs[0][1].deadline == previousJob.deadline and
+                             (Jobs[0][1].task.id > previousJob.task.id or (keepTies and Jobs[0][1].task.id == previousJob.task.id)))):
             return previousJob, False
 
         # else add previous job and pop new one
         if previousJob:
-            return self.jobs.pop(Jobs[0][0]), True  # get the index from the tuple in the 0th position
-        return self.jobs.pop(Jobs[0][0]), False
+            return self._takeJob(Jobs[0][0]), True  # get the index from the tuple in the 0th position
+        return self._takeJob(Jobs[0][0]), False
+
+    def peekJob(self, t):
+        """
+        Returns the job popJob would give an idle core at t, without removing
+        it, or None if no queued job is released by t.
+        """
+        released = [job for job in self.jobs if job.releaseTime <= t]
+        if len(released) == 0:
+            return None
+        return min(released, key=lambda x: (x.deadline, x.task.id))
 
     def popNextJob(self, t):
         """
@@ -75,7 +94,7 @@ class EdfPriorityQueue(PriorityQueue):
             return t
 
         laterJobs.sort(key = lambda x: (x[1].releaseTime, x[1].deadline, x[1].task.id))
-        return self.jobs.pop(laterJobs[0][0]) # get the index from the tuple in the 0th position
+        return self._takeJob(laterJobs[0][0]) # get the index from the tuple in the 0th position
 
     def popPreemptingJob(self, t, job):
         """
@@ -97,7 +116,7 @@ class EdfPriorityQueue(PriorityQueue):
             return None
 
         hpJobs.sort(key = lambda x: (x[1].releaseTime, x[1].deadline, x[1].task.id))
-        return self.jobs.pop(hpJobs[0][0]) # get the index from the tuple in the 0th position
+        return self._takeJob(hpJobs[0][0]) # get the index from the tuple in the 0th position
 
     def containsJobOrBackup(self, taskId, jobId):
         for curJob in self.jobs:
@@ -105,152 +124,541 @@ class EdfPriorityQueue(PriorityQueue):
                 return True
         return False
 
+    def removeJobAndBackups(self, taskId, jobId):
+        """
+        Removes every queued copy of a job and returns them, including copies
+        holding pending active backups.
+        """
+        removed = [job for job in self.jobs if job.id == jobId and job.task.id == taskId]
+        if removed:
+            self.jobs = [job for job in self.jobs if not (job.id == jobId and job.task.id == taskId)]
+        return removed
+
 class FtmGedfScheduler(SchedulerAlgorithm):
-    def __init__(self, taskSet, coreSet):
-        SchedulerAlgorithm.__init__(self, taskSet, coreSet)
+    def __init__(self, taskSet, coreSet, stats=None, faultModel=None, cancelSiblings=False,
+                 preemptionOverhead=0, migrationOverhead=0, affinity=False):
+        SchedulerAlgorithm.__init__(self, taskSet, coreSet, stats)
         #has a taskset, coreset, schedule, priorityqueue
+        #fault rates are per unit of taskset time; the run samples them per tick
+        coreSet.setQuantum(taskSet.quantum)
+        #decides when faulty cores fail; defaults to the burst/gap model driven by the CoreSet's lambdas
+        self.faultModel = faultModel if faultModel is not None else BurstyFaultModel()
+        #completion policy: when one copy of a job completes, drop its other copies
+        #(queued ones, and running ones so their cores take new work) instead of running them out
+        self.cancelSiblings = cancelSiblings
+        #ticks added to a preempted job's remaining time when it resumes on the core it
+        #last ran on (preemptionOverhead) or on another core (migrationOverhead)
+        self.preemptionOverhead = preemptionOverhead
+        self.migrationOverhead = migrationOverhead
+        #dispatch policy: an idle core is interchangeable with any other idle core, so
+        #hand a resuming job back to the core it last ran on if that one is idle too
+        self.affinity = affinity
+
+
+    def buildSchedule(self, startTime, endTime, checkpointInterval=None):
+        """
+        Simulates the task set until every job has run and returns the Schedule.
 
+        checkpointInterval: if set, self.checkpoints collects a SchedulerCheckpoint
+        every checkpointInterval ticks (starting at time 0)
+        """
+        self.startRun(startTime, endTime)
+        return self.resume(checkpointInterval=checkpointInterval)
+
+    def startRun(self, startTime, endTime):
+        """
+        Resets the scheduler to the first tick of a new run.
+        """
+        self._runStart = perf_counter() if self.stats else None
 
-    def buildSchedule(self, startTime, endTime):
         self._buildPriorityQueue(EdfPriorityQueue)
-        self.time = 0.0
+        self.time = 0
+        self.endTime = endTime
         self.schedule.startTime = self.time
         self.allDeadlinesMet = True
         self.missedJobs = []
+        self.checkpoints = []
+        self._intervalLog = []
+        self.migrations = 0
 
         #job that is running on each core
-        coresToJobs = {}
-
-        #tracks if the core is in a bursty period. Fault periods are (lB, lG)
-        #where intially: lB = [time, time+lBdur) and lG = [time+lBdur, time+lBdur+lGdur)
-        coreFaultPeriods = {}
-        coresToBursty = {}
-        coreLastFaultPeriodStart = {}
-        corePermFail = {}
+        self.coresToJobs = {}
+
+        #cores that failed permanently are no longer sampled by the fault model
+        self.faultModel.reset(self.coreSet, self.time)
+        self._pendingFaultState = None
+        self.corePermFail = {}
         for core in self.coreSet:
-            coresToJobs[core.id] = None
-            coreFaultPeriods[core.id] = (0,0)
-            coreLastFaultPeriodStart[core.id] = 0
-            coresToBursty[core.id] = False
-            corePermFail[core.id] = False
+            self.coresToJobs[core.id] = None
+            self.corePermFail[core.id] = False
 
         #track if a task.id and job.id have completed for removal of jobs from passive backup and queue
-        taskjobComplete = {}
+        self.taskjobComplete = {}
         for job in self.taskSet.jobs: #use job id (as all jobs and their backups have the same job id)
-            taskjobComplete[(job.task.id, job.id)] = False
-
-        # Loop until the priority queue is empty, executing jobs preemptively in edf order
-        while not self.priorityQueue.isEmpty():
-            #set bursty periods 
-            #currently each core can have a different lB and lG. Can be easily changed to identical
-            for core in self.coreSet:
-                if core.is_faulty and not corePermFail[core.id]:
-                    if self.time == coreLastFaultPeriodStart[core.id] + sum(coreFaultPeriods[core.id]):
-                        coreLastFaultPeriodStart[core.id] = self.time
-                        newLB = self.coreSet.getLB()
-                        newLG = self.coreSet.getLG()
-                        coreFaultPeriods[core.id] = (newLB, newLG)
-                    coresToBursty[core.id] = self.time < coreLastFaultPeriodStart[core.id] + coreFaultPeriods[core.id][0] #lB
-                    
-                    cutoff = random.random()
-                    #check permanent fails
-                    if cutoff < core.coreSet.lambda_c:
-                        corePermFail[core.id] = True
-                        core.deactivate()
-                    elif (coresToBursty[core.id] and cutoff < core.coreSet.lambda_b) or \
-                        (not coresToBursty[core.id] and cutoff < core.coreSet.lambda_r):
-                        core.deactivate()
-                    else:
-                        core.activate()
-            # for iterating through cores by Id
-            coreListIds = [core.id for core in self.coreSet]
-            # build schedule from the queue
-            while len(coreListIds) > 0:
-                # get the current lowest priority core of the remaining cores
-                core, is_executing = self.coreSet.getLowestPriorityCoreGEDF(coreListIds)
-
-                #job currently on the core
-                previousJob = core.getJob()
-                #placeholder for job we're about to execute 
-                job = None
-                #if the core is not active, we can just add a fail interval right away
-                if not core.is_active:
-                    self.schedule.addFailInterval(self.time, self.time+1.0, core.id)
-                    job = -1
+            self.taskjobComplete[(job.task.id, job.id)] = False
+
+        #release events are derived from a release-ordered view of the jobs, only when observed
+        self._releaseOrder = None
+        self._nextRelease = 0
+
+    def isRunning(self):
+        # Once every core has failed permanently the queued jobs can never run, so the run ends
+        return not self.priorityQueue.isEmpty() and not self.allCoresFailed()
+
+    def allCoresFailed(self):
+        return all(self.corePermFail.values())
+
+    def resume(self, endTime=None, checkpointInterval=None):
+        """
+        Runs the current run (started or restored) to the end and returns the Schedule.
+        """
+        if endTime is not None:
+            self.endTime = endTime
+        self.runUntil(None, checkpointInterval)
+        return self.finishRun()
+
+    def runUntil(self, time, checkpointInterval=None):
+        """
+        Executes ticks until self.time reaches time (None: until the queue is
+        empty). The run can then be checkpointed, resumed or run further.
+        """
+        if self._pendingFaultState is not None:
+            model, state = self._pendingFaultState
+            model.setState(state)
+            self._pendingFaultState = None
+
+        while self.isRunning() and (time is None or self.time < time):
+            if checkpointInterval and self.time % checkpointInterval == 0:
+                self.checkpoints.append(SchedulerCheckpoint(self))
+            self._step()
+
+    def _step(self):
+        """
+        Executes one tick: samples faults, then makes one scheduling decision per core.
+        """
+        # stats and observers are optional; with neither, the hot path only pays a few falsy checks
+        stats = self.stats
+        notify = self._notify if self.observers else None
+        faultModel = self.faultModel
+        corePermFail = self.corePermFail
+        taskjobComplete = self.taskjobComplete
+        coresToJobs = self.coresToJobs
+
+        if notify:
+            if self._releaseOrder is None:
+                self._releaseOrder = sorted(self.taskSet.jobs, key=lambda x: x.releaseTime)
+            releaseOrder = self._releaseOrder
+            while self._nextRelease < len(releaseOrder) and releaseOrder[self._nextRelease].releaseTime <= self.time:
+                notify(SchedulerEvents.RELEASE, self.time, None, releaseOrder[self._nextRelease])
+                self._nextRelease += 1
+        if stats:
+            stats.count("ticks")
+            phaseStart = perf_counter()
+
+        #sample faults for every faulty core that is still alive
+        faultModel.beginTick(self.time)
+        for core in self.coreSet:
+            if core.is_faulty and not corePermFail[core.id]:
+                fault = faultModel.sample(core.id, self.time)
+                #check permanent fails
+                if fault == FaultModel.PERMANENT:
+                    corePermFail[core.id] = True
+                    core.deactivate()
+                    if stats:
+                        stats.count("permanentFaults")
+                elif fault == FaultModel.TRANSIENT:
+                    core.deactivate()
                 else:
-                    #check if passive backups needs to be released into priority queue
-                    stillNeedToComplete = [job for job in taskjobComplete.keys() if taskjobComplete[job]==False]
-                    for ids in stillNeedToComplete:
-                        taskId, jobId = ids[0], ids[1]
-                        if self.shouldReleasePassive(taskId, jobId):
-                            passiveJob = self.taskSet.copyJob(taskId, jobId)
-                            self.priorityQueue.addJob(passiveJob)
-                            taskjobComplete[(passiveJob.task.id, passiveJob.id)] = False
-
-                    # Make a scheduling decision resulting in an interval
-                    interval, job, willFinish = self._makeSchedulingDecision(self.time, previousJob, core)
-
-                    # Execute new job for 1 time step
-                    if job and job != -1:
-                        if willFinish:
-                            if self.time >= job.deadline and not taskjobComplete[(job.task.id, job.id)]:
-                                self.allDeadlinesMet = False
-                                self.missedJobs.append(job)
-                            job.executeToCompletion()
-                            taskjobComplete[(job.task.id, job.id)] = True
-                        else:
-                            job.execute(1)
-
-                    # Add interval to the schedule
-                    self.schedule.addInterval(interval)
+                    core.activate()
+                    continue
+                if stats:
+                    stats.count("faults")
+                if notify:
+                    lostJob = core.getJob()
+                    notify(SchedulerEvents.FAULT, self.time, core.id, lostJob if lostJob != -1 else None)
+        if stats:
+            stats.addTime(SchedulerStats.PHASE_FAULTS, phaseStart)
+
+        # for iterating through cores by Id
+        coreListIds = [core.id for core in self.coreSet]
+        # build schedule from the queue
+        while len(coreListIds) > 0:
+            # get the current lowest priority core of the remaining cores
+            if stats:
+                stats.count("coreDecisions")
+                phaseStart = perf_counter()
+            core, is_executing = self.coreSet.getLowestPriorityCoreGEDF(coreListIds)
+            if self.affinity and core.is_active:
+                core = self._affineCore(core, is_executing, coreListIds)
+            if stats:
+                stats.addTime(SchedulerStats.PHASE_CORE_SELECTION, phaseStart)
+
+            #job currently on the core
+            previousJob = core.getJob()
+            #placeholder for job we're about to execute 
+            job = None
+            #if the core is not active, we can just add a fail interval right away
+            if not core.is_active:
+                if stats:
+                    phaseStart = perf_counter()
+                failInterval = self.schedule.addFailInterval(self.time, self.time+1, core.id)
+                if notify:
+                    notify(SchedulerEvents.INTERVAL, self.time, core.id, failInterval)
+                if stats:
+                    stats.addTime(SchedulerStats.PHASE_INTERVALS, phaseStart)
+                    stats.count("intervals")
+                job = -1
+            else:
+                #check if passive backups needs to be released into priority queue
+                if stats:
+                    phaseStart = perf_counter()
+                stillNeedToComplete = [job for job in taskjobComplete.keys() if taskjobComplete[job]==False]
+                for ids in stillNeedToComplete:
+                    taskId, jobId = ids[0], ids[1]
+                    if self.shouldReleasePassive(taskId, jobId):
+                        passiveJob = self.taskSet.copyJob(taskId, jobId)
+                        self.priorityQueue.addJob(passiveJob)
+                        taskjobComplete[(passiveJob.task.id, passiveJob.id)] = False
+                        if stats:
+                            stats.count("passiveReleases")
+                        if notify:
+                            notify(SchedulerEvents.PASSIVE_RELEASE, self.time, None, passiveJob)
+                if stats:
+                    stats.addTime(SchedulerStats.PHASE_PASSIVE, phaseStart)
+
+                # Make a scheduling decision resulting in an interval
+                interval, job, willFinish = self._makeSchedulingDecision(self.time, previousJob, core)
+
+                if stats or notify:
+                    self._reportDecision(interval, previousJob, job, willFinish, core)
+
+                # Execute new job for 1 time step
+                if job and job != -1:
+                    if willFinish:
+                        if self.time >= job.deadline and not taskjobComplete[(job.task.id, job.id)]:
+                            self.allDeadlinesMet = False
+                            self.missedJobs.append(job)
+                            if notify:
+                                notify(SchedulerEvents.MISS, self.time, core.id, job)
+                        job.executeToCompletion()
+                        taskjobComplete[(job.task.id, job.id)] = True
+                        if self.cancelSiblings:
+                            self._cancelSiblings(job, core)
+                    else:
+                        job.execute(1)
+
+                # Add interval to the schedule
+                if stats:
+                    phaseStart = perf_counter()
+                self.schedule.addInterval(interval)
+                if stats:
+                    stats.addTime(SchedulerStats.PHASE_INTERVALS, phaseStart)
+                    stats.count("intervals")
+                if notify:
+                    notify(SchedulerEvents.INTERVAL, self.time, core.id, interval)
 
-                # Update the time and job
-                coresToJobs[core.id] = job
-                core.setJob(job)
+            # Update the time and job
+            coresToJobs[core.id] = job
+            core.setJob(job)
 
-                # remove core from current core list to consider
-                coreListIds.remove(core.id)
+            # remove core from current core list to consider
+            coreListIds.remove(core.id)
 
-            self.time += 1
+        self.time += 1
+
+    def _affineCore(self, core, is_executing, coreListIds):
+        """
+        Picks among the cores GEDF treats alike so jobs stay where they ran.
+
+        If every undecided core is executing, returns the one running the
+        lowest-priority job by (deadline, task id), so a job is only evicted
+        for one that outranks it rather than for an equal-deadline one that
+        would then take another core. If core is idle, returns the core the
+        next dispatched job last ran on when that one is idle and undecided
+        too; otherwise core.
+        """
+        if is_executing:
+            cores = [self.coreSet.getCoreById(coreId) for coreId in coreListIds]
+            return max(cores, key=lambda c: (c.job.deadline, c.job.task.id))
+
+        job = self.priorityQueue.peekJob(self.time)
+        if job is None or job.lastCoreId is None or job.lastCoreId == core.id or job.lastCoreId not in coreListIds:
+            return core
+        lastCore = self.coreSet.getCoreById(job.lastCoreId)
+        if lastCore.is_active and lastCore.getJob() is None:
+            return lastCore
+        return core
+
+    def _chargeDispatch(self, job, core):
+        """
+        Charges the overhead of resuming a preempted job on core and counts
+        the migration if it last ran elsewhere. A copy's first dispatch is free.
+        """
+        if job.lastCoreId is None:
+            return
+        if job.lastCoreId == core.id:
+            overhead = self.preemptionOverhead
+        else:
+            overhead = self.migrationOverhead
+            self.migrations += 1
+            if self.stats:
+                self.stats.count("migrations")
+        if overhead:
+            job.remainingTime += overhead
+            key = (job.task.id, job.id, job.backupId)
+            self.schedule.overheads[key] = self.schedule.overheads.get(key, 0) + overhead
+            if self.stats:
+                self.stats.count("overheadTicks", overhead)
+
+    def _cancelSiblings(self, job, core):
+        """
+        Drops every other copy of a job that completes this tick: queued copies
+        leave the queue, and copies on other cores are taken off, so a core
+        that has not been scheduled yet this tick picks a new job right away.
+        """
+        stats = self.stats
+        notify = self._notify if self.observers else None
+
+        for sibling in self.priorityQueue.removeJobAndBackups(job.task.id, job.id):
+            if stats:
+                stats.count("cancelledCopies", 1 + sibling.pendingBackups)
+            if notify:
+                notify(SchedulerEvents.CANCEL, self.time, None, sibling)
+
+        for other in self.coreSet:
+            sibling = other.getJob()
+            if other is core or not other.is_active or not sibling or sibling == -1:
+                continue
+            if sibling.task.id == job.task.id and sibling.id == job.id:
+                other.setJob(None)
+                self.coresToJobs[other.id] = None
+                if stats:
+                    stats.count("cancelledCopies")
+                if notify:
+                    notify(SchedulerEvents.CANCEL, self.time, other.id, sibling)
+
+    def _siblingStopTimes(self):
+        """
+        For the jobs left on the cores at the end of a run: returns
+        {coreId: time} for the copies that stop at time because another copy
+        of the same job completes during that tick. The first core to finish a
+        job (lowest core id on a tie) keeps it.
+        """
+        finishTicks = {}
+        for core in self.coreSet:
+            job = self.coresToJobs[core.id]
+            if job is not None and job != -1 and job.remainingTime > 0:
+                finishTick = self.time + math.ceil(job.remainingTime) - 1
+                finishTicks.setdefault((job.task.id, job.id), []).append((finishTick, core.id))
+
+        stopTimes = {}
+        for copies in finishTicks.values():
+            copies.sort()
+            for (finishTick, coreId) in copies[1:]:
+                stopTimes[coreId] = copies[0][0]
+        return stopTimes
+
+    def finishRun(self):
+        """
+        Runs the jobs still on the cores to completion, closes the schedule and returns it.
+        """
+        stats = self.stats
+        notify = self._notify if self.observers else None
+        coresToJobs = self.coresToJobs
+        stopTimes = self._siblingStopTimes() if self.cancelSiblings else {}
+
+        # With every core failed for good, the jobs that have not completed never will
+        if self.allCoresFailed():
+            for job in self.taskSet.jobs:
+                if not self.taskjobComplete[(job.task.id, job.id)]:
+                    self.allDeadlinesMet = False
+                    self.missedJobs.append(job)
+                    if notify:
+                        notify(SchedulerEvents.MISS, self.time, None, job)
 
         # If there are still previous job, complete them, add intervals
         for core in self.coreSet:
             previousJob = coresToJobs[core.id]
             cur_time = self.time
-            if previousJob is not None and previousJob is not -1:
+            if previousJob is not None and previousJob != -1:
                 while previousJob.remainingTime > 0:
+                    if core.id in stopTimes and cur_time >= stopTimes[core.id]:
+                        if stats:
+                            stats.count("cancelledCopies")
+                        if notify:
+                            notify(SchedulerEvents.CANCEL, cur_time, core.id, previousJob)
+                        break
                     job_complete = False
                     if previousJob.remainingTime <= 1:
                         previousJob.executeToCompletion()
                         job_complete = True
+                        if stats:
+                            stats.count("completions")
+                        if notify:
+                            notify(SchedulerEvents.COMPLETE, cur_time, core.id, previousJob)
                         if cur_time >= previousJob.deadline:
                             should_add = True
                             self.allDeadlinesMet = False
                             for job in self.missedJobs:
                                 if job.id == previousJob.id and job.task.id == previousJob.task.id:
                                     should_add = False
-                                if should_add:
-                                    self.missedJobs.append(previousJob)
+                            if should_add:
+                                self.missedJobs.append(previousJob)
+                                if notify:
+                                    notify(SchedulerEvents.MISS, cur_time, core.id, previousJob)
                     else:
                         previousJob.execute(1)
                     # Add the final idle interval
                     interval = ScheduleInterval()
                     interval.initialize(cur_time, cur_time+1, previousJob, False, core.id, job_complete)
                     self.schedule.addInterval(interval)
+                    if notify:
+                        notify(SchedulerEvents.INTERVAL, cur_time, core.id, interval)
                     cur_time += 1
             # Add empty interval at end of each one
             finalInterval = ScheduleInterval()
             finalInterval.initialize(cur_time, cur_time+1, None, False, core.id, False)
             self.schedule.addInterval(finalInterval)
+            if notify:
+                notify(SchedulerEvents.INTERVAL, cur_time, core.id, finalInterval)
 
         # Post-process the intervals to set the end time and whether the job completed
         latestDeadline = max([job.deadline for job in self.taskSet.jobs])
-        endTime = max(self.time + 1.0, latestDeadline, float(endTime))
+        endTime = max(self.time + 1, latestDeadline, math.ceil(self.endTime))
+        if stats:
+            phaseStart = perf_counter()
+        # Merging reorders the intervals: later checkpoints start a list of their own
+        self._intervalLog = []
         self.schedule.postProcessIntervals(endTime)
+        if stats:
+            stats.addTime(SchedulerStats.PHASE_POST_PROCESS, phaseStart)
+            if self._runStart is not None:
+                stats.addTime(SchedulerStats.PHASE_TOTAL, self._runStart)
         
         return self.schedule
 
 
+    def checkpoint(self):
+        """
+        Returns a SchedulerCheckpoint of the run at the start of tick self.time.
+        """
+        checkpoint = SchedulerCheckpoint(self)
+        # Forks of this checkpoint may draw from the global generators before this
+        # run continues, so it picks its fault state up from the checkpoint as well
+        self._pendingFaultState = (self.faultModel, checkpoint.faultState)
+        return checkpoint
+
+    def restore(self, checkpoint, faultModel=None):
+        """
+        Puts this scheduler in the state saved by checkpoint; resume() or
+        runUntil() continue from there. The checkpoint can come from another
+        scheduler built from the same task set and core set parameters.
+
+        faultModel: a model to decide the faults from the checkpoint on,
+        instead of continuing self.faultModel from its saved state
+        """
+        self._runStart = perf_counter() if self.stats else None
+
+        self._buildPriorityQueue(EdfPriorityQueue)
+        self.priorityQueue.jobs = [makeJob(self.taskSet, record) for record in checkpoint.queue]
+
+        self.time = checkpoint.time
+        self.endTime = checkpoint.endTime
+        self.allDeadlinesMet = checkpoint.allDeadlinesMet
+        self.missedJobs = [makeJob(self.taskSet, record) for record in checkpoint.missedJobs]
+        self.checkpoints = []
+        self.migrations = checkpoint.migrations
+        self.corePermFail = dict(checkpoint.corePermFail)
+        self.taskjobComplete = dict(checkpoint.taskjobComplete)
+        self.taskSet.backup_ids = dict(checkpoint.backupIds)
+        self._releaseOrder = None
+        self._nextRelease = checkpoint.nextRelease
+
+        self.coresToJobs = {}
+        for core in self.coreSet:
+            job = makeJob(self.taskSet, checkpoint.cores[core.id])
+            self.coresToJobs[core.id] = job
+            core.setJob(job)
+
+        self.schedule = Schedule(None, self.taskSet, self.coreSet)
+        self.schedule.startTime = 0.0
+        self._intervalLog = checkpoint.intervals
+        for record in self._intervalLog:
+            self.schedule.addInterval(makeInterval(record))
+        self.schedule.overheads = dict(checkpoint.overheads)
+
+        if faultModel is not None:
+            self.faultModel = faultModel
+        self.faultModel.reset(self.coreSet, self.time)
+        # Applied when the run continues, so that forks using the global generators
+        # each start from the checkpoint's generator state
+        self._pendingFaultState = None if faultModel is not None else (self.faultModel, checkpoint.faultState)
+
+    def resimulate(self, checkpoints, previousTaskSet, checkpointInterval=None):
+        """
+        Runs this scheduler's task set, an edited version of previousTaskSet,
+        reusing the checkpoints of a run of previousTaskSet with the same
+        cores, fault model and options. Both runs are identical until the
+        first tick the edit can change (see divergenceTick), so the run resumes
+        from the last checkpoint at or before it and only the rest is
+        simulated again. Returns the Schedule; self.resumedFrom is the tick
+        the run resumed from.
+
+        checkpointInterval: keep checkpointing like the previous run, so that
+        self.checkpoints can serve the next edit
+        """
+        divergence = divergenceTick(previousTaskSet, self.taskSet)
+        usable = [checkpoint for checkpoint in checkpoints if divergence is None or checkpoint.time <= divergence]
+        if len(usable) == 0:
+            raise ValueError("No checkpoint at or before tick {0} to resume from".format(divergence))
+        start = max(usable, key=lambda checkpoint: checkpoint.time)
+
+        self.restore(start.rebased(self.taskSet))
+        self.resumedFrom = start.time
+        # finishRun starts a new list, so keep the one this run's checkpoints share
+        intervalLog = self._intervalLog
+        schedule = self.resume(checkpointInterval=checkpointInterval)
+        if checkpointInterval:
+            earlier = [checkpoint.rebased(self.taskSet) for checkpoint in checkpoints if checkpoint.time < start.time]
+            for checkpoint in earlier:
+                # Their prefixes are the start of this run's interval list too
+                checkpoint.intervalLog = intervalLog
+            self.checkpoints = earlier + self.checkpoints
+        return schedule
+
+    def fork(self, checkpoint=None, faultModel=None, faultEvents=None):
+        """
+        Returns a new scheduler that continues from checkpoint (default: the
+        current tick) on its own copies of the cores, schedule and queue, so
+        several forks of one run can be resumed independently.
+
+        faultModel: a different fault model for the continuation
+        faultEvents: (time, coreId, FaultModel kind) faults forced on top of the
+        continued fault model, e.g. [(500, 2, FaultModel.PERMANENT)]; time is
+        in ticks, not taskset time units, and coreId must be a faulty core that
+        is still alive at the checkpoint (ValueError otherwise, see
+        ScriptedFaultModel)
+        """
+        if checkpoint is None:
+            checkpoint = self.checkpoint()
+
+        taskSet = copy.copy(self.taskSet)
+        forked = FtmGedfScheduler(taskSet, self.coreSet.copy(), faultModel=self.faultModel.clone(),
+                                  cancelSiblings=self.cancelSiblings, preemptionOverhead=self.preemptionOverhead,
+                                  migrationOverhead=self.migrationOverhead, affinity=self.affinity)
+        forked.restore(checkpoint, faultModel)
+        if faultEvents:
+            for (t, coreId, kind) in faultEvents:
+                if t < forked.time:
+                    raise ValueError("Fault event at tick {0} is before the fork at tick {1}".format(t, forked.time))
+                if forked.corePermFail.get(coreId):
+                    raise ValueError("Fault event has core {0}, which failed permanently before the fork".format(coreId))
+            scripted = ScriptedFaultModel(faultEvents)
+            scripted.reset(forked.coreSet, forked.time)
+            scripted.fallback = forked.faultModel
+            forked.faultModel = scripted
+        return forked
+
     def _makeSchedulingDecision(self, t, previousJob, lowest_core):
         """
         Makes a scheduling decision after time t.
@@ -266,14 +674,23 @@ class FtmGedfScheduler(SchedulerAlgorithm):
         if previousJob and previousJob != -1 and previousJob.remainingTime == 0:
             previousJob = None
 
+        stats = self.stats
+        if stats:
+            phaseStart = perf_counter()
         # get lowest prio core
         # newJob == previousJob if previousJob has the highest priority
-        newJob, didPreemptPrevious = self.priorityQueue.popJob(t, previousJob)
-        if newJob and newJob != -1 and newJob.remainingTime <= 1:
-            willFinish = True
+        newJob, didPreemptPrevious = self.priorityQueue.popJob(t, previousJob, keepTies=self.affinity)
+        if newJob and newJob != -1:
+            if newJob is not previousJob:
+                self._chargeDispatch(newJob, lowest_core)
+            newJob.lastCoreId = lowest_core.id
+            if newJob.remainingTime <= 1:
+                willFinish = True
         # if preempted, add previous job back to queue
         if didPreemptPrevious and previousJob and previousJob != -1:
             self.priorityQueue.addJob(previousJob)
+        if stats:
+            stats.addTime(SchedulerStats.PHASE_QUEUE, phaseStart)
 
         # update core job
         lowest_core.setJob(newJob)
@@ -282,6 +699,30 @@ class FtmGedfScheduler(SchedulerAlgorithm):
 
         return interval, newJob, willFinish
 
+    def _reportDecision(self, interval, previousJob, job, willFinish, core):
+        """
+        Feeds one core's scheduling decision to the stats and observers.
+        Only called when at least one of them is present.
+        """
+        stats = self.stats
+        notify = self._notify if self.observers else None
+        if interval.didPreemptPrevious:
+            if stats:
+                stats.count("preemptions")
+            if notify:
+                notify(SchedulerEvents.PREEMPT, self.time, core.id, previousJob)
+        if job and job != -1:
+            if job is not previousJob:
+                if stats:
+                    stats.count("dispatches")
+                if notify:
+                    notify(SchedulerEvents.DISPATCH, self.time, core.id, job)
+            if willFinish:
+                if stats:
+                    stats.count("completions")
+                if notify:
+                    notify(SchedulerEvents.COMPLETE, self.time, core.id, job)
+
     def shouldReleasePassive(self, taskId, jobId):
         '''
         Checks if the original or a backup of a job is still either executing
@@ -331,19 +772,26 @@ if __name__ == "__main__":
     taskSet.printTasks()
     taskSet.printJobs()
 
-    ftm = FtmGedfScheduler(taskSet, coreSet)
-    schedule = ftm.buildSchedule(0, 6)
+    stats = SchedulerStats()
+    ftm = FtmGedfScheduler(taskSet, coreSet, stats=stats)
+
+    # pygame is only imported when a window is actually shown. The core view
+    # draws the schedule while it is simulated instead of after the run
+    from display import LiveSchedulingDisplay
+    from livestream import startLiveSimulation
+
+    horizon = max([6] + [job.deadline for job in taskSet.jobs])
+    thread, intervalQueue = startLiveSimulation(ftm, 0, 6)
+    LiveSchedulingDisplay(coreSet, intervalQueue, horizon, width=1200, height=700, fps=33,
+                          timeScale=taskSet.quantum).run()
+    thread.join()
+    schedule = ftm.schedule
 
     schedule.printIntervals(displayIdle=True)
+    stats.printReport()
 
     if ftm.doesMeetDeadlines():
         print("\nAll deadlines are met! :)")
     else:
         print("\nA deadline was missed! :(\n")
         ftm.printMissedJobs()
-    
-    displayTasks = SchedulingDisplay(width=1200, height=700, fps=33, scheduleData=schedule, display_type='tasks')
-    displayTasks.run()
-
-    displayCores = SchedulingDisplay(width=1200, height=700, fps=33, scheduleData=schedule, display_type='cores')
-    displayCores.run()
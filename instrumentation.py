@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""
+instrumentation.py - optional profiling and monitoring for scheduler runs
+
+SchedulerEvents: names of the events a scheduler reports to its observers
+SchedulerStats: per-phase timers and operation counters for one or more runs
+"""
+
+import json
+import time
+
+class SchedulerEvents(object):
+    # Each observer is called as observer(event, time, coreId, job)
+    RELEASE = "release"                  # job became eligible (coreId is None)
+    DISPATCH = "dispatch"                # job started or resumed on a core
+    PREEMPT = "preempt"                  # job was pushed back to the queue
+    COMPLETE = "complete"                # job finishes at the end of this tick
+    FAULT = "fault"                      # core failed; job is the one it loses (or None)
+    PASSIVE_RELEASE = "passiveRelease"   # passive backup added to the queue (coreId is None)
+    INTERVAL = "interval"                # one tick's ScheduleInterval was added (passed as job)
+    CANCEL = "cancel"                    # copy dropped because a sibling completed (coreId None if queued)
+    MISS = "miss"                        # job completed after its deadline (the first copy to complete)
+
+    ALL = (RELEASE, DISPATCH, PREEMPT, COMPLETE, FAULT, PASSIVE_RELEASE, INTERVAL, CANCEL, MISS)
+
+class SchedulerStats(object):
+    # Phases timed inside FtmGedfScheduler.buildSchedule
+    PHASE_FAULTS = "faultSampling"
+    PHASE_PASSIVE = "passiveBackupCheck"
+    PHASE_CORE_SELECTION = "coreSelection"
+    PHASE_QUEUE = "queueOperations"
+    PHASE_INTERVALS = "intervalEmission"
+    PHASE_POST_PROCESS = "postProcess"
+    PHASE_TOTAL = "total"
+
+    def __init__(self):
+        """
+        Accumulates wall time per phase and named operation counters.
+        Passing the same instance to several runs aggregates them.
+        """
+        self.phaseTimes = {}
+        self.phaseCalls = {}
+        self.counters = {}
+
+    def addTime(self, phase, startTime):
+        """
+        Charges the time elapsed since startTime (from time.perf_counter())
+        to the given phase.
+        """
+        elapsed = time.perf_counter() - startTime
+        self.phaseTimes[phase] = self.phaseTimes.get(phase, 0.0) + elapsed
+        self.phaseCalls[phase] = self.phaseCalls.get(phase, 0) + 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        self.phaseTimes = {}
+        self.phaseCalls = {}
+        self.counters = {}
+
+    def toDict(self):
+        phases = {}
+        for phase in self.phaseTimes:
+            phases[phase] = {"seconds": self.phaseTimes[phase], "calls": self.phaseCalls[phase]}
+        return {"phases": phases, "counters": dict(self.counters)}
+
+    def toJson(self, indent=2):
+        return json.dumps(self.toDict(), indent=indent, sort_keys=True)
+
+    def report(self):
+        """
+        Returns the stats as a plain-text table, phases sorted by time spent.
+        """
+        total = self.phaseTimes.get(SchedulerStats.PHASE_TOTAL, 0.0)
+        lines = ["{0:<22} {1:>12} {2:>10} {3:>7}".format("phase", "seconds", "calls", "%")]
+        for phase in sorted(self.phaseTimes, key=lambda p: -self.phaseTimes[p]):
+            seconds = self.phaseTimes[phase]
+            share = 100.0 * seconds / total if total > 0 else 0.0
+            lines.append("{0:<22} {1:>12.6f} {2:>10} {3:>7.1f}".format(phase, seconds, self.phaseCalls[phase], share))
+
+        lines.append("")
+        lines.append("{0:<22} {1:>12}".format("counter", "value"))
+        for name in sorted(self.counters):
+            lines.append("{0:<22} {1:>12}".format(name, self.counters[name]))
+        return "\n".join(lines)
+
+    def printReport(self):
+        print("\nScheduler stats:")
+        print(self.report())
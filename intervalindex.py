@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+"""
+intervalindex.py - time-sorted index over schedule intervals
+
+TimeSortedIntervals: the intervals of one row (a core or a task) sorted by
+start time, with bisect-searchable start and end arrays for range queries
+ScheduleIndex: per-core, per-task and per-job lookups over a whole schedule
+"""
+
+from bisect import bisect_left, bisect_right
+
+class TimeSortedIntervals(object):
+    def __init__(self, intervals):
+        """
+        Builds the index once. The intervals must not change afterwards.
+        """
+        self.intervals = sorted(intervals, key=lambda x: (x.startTime, x.endTime))
+        self.starts = [interval.startTime for interval in self.intervals]
+
+        # Running maximum of the end times. On one core intervals never overlap
+        # and this is just the end times; a task's copies can overlap, and the
+        # running maximum keeps the array sorted so it can still be bisected.
+        self.maxEnds = []
+        maxEnd = float("-inf")
+        for interval in self.intervals:
+            maxEnd = max(maxEnd, interval.endTime)
+            self.maxEnds.append(maxEnd)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def _bounds(self, t0, t1):
+        # Everything before lo ends at or before t0; everything from hi on starts at or after t1
+        return bisect_right(self.maxEnds, t0), bisect_left(self.starts, t1)
+
+    def overlapping(self, t0, t1):
+        """
+        Yields the intervals that overlap [t0, t1), in start order.
+        """
+        lo, hi = self._bounds(t0, t1)
+        for k in range(lo, hi):
+            interval = self.intervals[k]
+            if interval.endTime > t0:
+                yield interval
+
+    def containing(self, t):
+        """
+        Returns the intervals with startTime <= t < endTime.
+        """
+        lo = bisect_right(self.maxEnds, t)
+        hi = bisect_right(self.starts, t)
+        return [interval for interval in self.intervals[lo:hi] if interval.endTime > t]
+
+    def countOverlapping(self, t0, t1):
+        """
+        Upper bound on the number of intervals overlapping [t0, t1), in O(log n).
+        """
+        lo, hi = self._bounds(t0, t1)
+        return max(0, hi - lo)
+
+class ScheduleIndex(object):
+    def __init__(self, intervals):
+        """
+        Query layer over a post-processed schedule: one TimeSortedIntervals
+        per core (idle and fail intervals included) and per task, and the rows
+        of self.intervals for each (taskId, jobId, backupId).
+        """
+        self.intervals = intervals
+
+        byCore = {}
+        byTask = {}
+        self.jobRows = {}
+        for (row, interval) in enumerate(intervals):
+            byCore.setdefault(interval.coreId, []).append(interval)
+            if interval.taskId > 0:
+                byTask.setdefault(interval.taskId, []).append(interval)
+                self.jobRows.setdefault((interval.taskId, interval.jobId, interval.backupId), []).append(row)
+
+        self.byCore = {}
+        for coreId in byCore:
+            self.byCore[coreId] = TimeSortedIntervals(byCore[coreId])
+        self.byTask = {}
+        for taskId in byTask:
+            self.byTask[taskId] = TimeSortedIntervals(byTask[taskId])
+
+        # Copies of each job, for (taskId, jobId) lookups without a backup id
+        self.copies = {}
+        for key in self.jobRows:
+            self.jobRows[key].sort(key=lambda row: intervals[row].startTime)
+            self.copies.setdefault(key[:2], []).append(key[2])
+        for key in self.copies:
+            self.copies[key].sort()
+
+    def coreAt(self, coreId, t):
+        """
+        Returns the interval on core coreId that contains time t, or None.
+        """
+        if coreId not in self.byCore:
+            return None
+        found = self.byCore[coreId].containing(t)
+        return found[0] if found else None
+
+    def coreRange(self, coreId, t0, t1):
+        if coreId not in self.byCore:
+            return []
+        return list(self.byCore[coreId].overlapping(t0, t1))
+
+    def taskRange(self, taskId, t0, t1):
+        if taskId not in self.byTask:
+            return []
+        return list(self.byTask[taskId].overlapping(t0, t1))
+
+    def range(self, t0, t1):
+        """
+        Returns every interval overlapping [t0, t1), core by core.
+        """
+        result = []
+        for coreId in sorted(self.byCore):
+            result.extend(self.byCore[coreId].overlapping(t0, t1))
+        return result
+
+    def jobKeys(self):
+        return self.jobRows.keys()
+
+    def jobIntervals(self, taskId, jobId, backupId=None):
+        """
+        Returns the intervals in which a job ran, in start order. With
+        backupId None, every copy of the job is included.
+        """
+        if backupId is not None:
+            return [self.intervals[row] for row in self.jobRows.get((taskId, jobId, backupId), [])]
+
+        result = []
+        for copy in self.copies.get((taskId, jobId), []):
+            result.extend(self.intervals[row] for row in self.jobRows[(taskId, jobId, copy)])
+        result.sort(key=lambda x: x.startTime)
+        return result
+
+    def completionTime(self, taskId, jobId, backupId=None):
+        """
+        Returns when the job (or, with backupId None, its first copy) completed,
+        or None if it never did.
+        """
+        ends = [x.endTime for x in self.jobIntervals(taskId, jobId, backupId) if x.jobCompleted]
+        return min(ends) if ends else None
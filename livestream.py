@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+livestream.py - stream closed schedule intervals out of a running simulation
+
+ClosedInterval: one finished stretch of a core running the same job (or failing)
+IntervalPublisher: turns a scheduler's per-tick intervals into ClosedIntervals
+    on a thread-safe queue
+startLiveSimulation: runs buildSchedule on a background thread with a publisher
+"""
+
+import queue
+import threading
+from collections import namedtuple
+
+from instrumentation import SchedulerEvents
+
+# Field names match ScheduleInterval, so display elements accept either
+ClosedInterval = namedtuple("ClosedInterval",
+                            ["coreId", "taskId", "jobId", "backupId", "startTime", "endTime", "jobCompleted"])
+
+class IntervalPublisher(object):
+    # Put on the queue after the last interval of a run
+    END_OF_STREAM = None
+
+    def __init__(self, intervalQueue=None):
+        """
+        Collects the one-tick intervals a scheduler emits, merges consecutive
+        ticks of the same job on the same core, and puts each merged interval
+        on intervalQueue once it can no longer grow. Idle time is not published.
+        """
+        self.queue = intervalQueue if intervalQueue is not None else queue.Queue()
+        self.open = {} # coreId -> [taskId, jobId, backupId, start, end]
+
+    def attach(self, scheduler):
+        scheduler.addObserver(SchedulerEvents.INTERVAL, self.onInterval)
+
+    def detach(self, scheduler):
+        scheduler.removeObserver(SchedulerEvents.INTERVAL, self.onInterval)
+
+    def onInterval(self, event, t, coreId, interval):
+        key = (interval.taskId, interval.jobId, interval.backupId)
+        current = self.open.get(coreId)
+        if current is not None:
+            if tuple(current[:3]) == key and current[4] == interval.startTime:
+                current[4] = interval.endTime
+                if interval.jobCompleted:
+                    self._close(coreId, True)
+                return
+            self._close(coreId, False)
+
+        if interval.isIdle():
+            return
+        self.open[coreId] = [interval.taskId, interval.jobId, interval.backupId, interval.startTime, interval.endTime]
+        if interval.jobCompleted:
+            self._close(coreId, True)
+
+    def _close(self, coreId, completed):
+        taskId, jobId, backupId, start, end = self.open.pop(coreId)
+        self.queue.put(ClosedInterval(coreId, taskId, jobId, backupId, start, end, completed))
+
+    def close(self):
+        """
+        Flushes every open interval and marks the end of the stream.
+        """
+        for coreId in list(self.open):
+            self._close(coreId, False)
+        self.queue.put(IntervalPublisher.END_OF_STREAM)
+
+def startLiveSimulation(scheduler, startTime, endTime, intervalQueue=None):
+    """
+    Starts scheduler.buildSchedule(startTime, endTime) on a daemon thread,
+    publishing its intervals. Returns (thread, queue).
+    """
+    publisher = IntervalPublisher(intervalQueue)
+    publisher.attach(scheduler)
+
+    def run():
+        try:
+            scheduler.buildSchedule(startTime, endTime)
+        finally:
+            publisher.detach(scheduler)
+            publisher.close()
+
+    thread = threading.Thread(target=run, name="live-simulation", daemon=True)
+    thread.start()
+    return thread, publisher.queue
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+"""
+rareevent.py - importance sampling for rare deadline misses
+
+With realistic fault rates almost every trial meets all deadlines, so plain
+Monte Carlo needs an enormous number of runs to see a miss. Here faults are
+drawn with inflated (tilted) probabilities instead, and each trial is weighted
+by the likelihood ratio of its fault draws under the CoreSet's real
+probabilities, which keeps the estimate unbiased.
+
+TiltedBurstyFaultModel: the burst/gap fault model with tilted probabilities,
+    accumulating the likelihood ratio of its draws
+ImportanceSampler: runs weighted trials of one task set and core set
+estimateMissProbability: the miss probability with a confidence interval
+"""
+
+import math
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import numpy as np
+
+from taskset import TaskSet
+from coreset import CoreSet, perTick
+from faultmodel import FaultModel, BurstyFaultModel
+import ftmgedf
+
+def outcomeProbabilities(lambda_c, lambda_x):
+    """
+    Returns the probabilities of (OK, TRANSIENT, PERMANENT) for one draw of
+    the burst/gap model: a uniform cutoff below lambda_c fails the core
+    permanently, otherwise one below lambda_x (lambda_b or lambda_r) fails
+    it transiently.
+    """
+    permanent = min(max(lambda_c, 0.0), 1.0)
+    transient = max(min(lambda_x, 1.0) - permanent, 0.0)
+    return (1.0 - permanent - transient, transient, permanent)
+
+class TiltedBurstyFaultModel(BurstyFaultModel):
+    STATE = BurstyFaultModel.STATE + ("logLikelihoodRatio",)
+
+    def __init__(self, lambda_c=None, lambda_b=None, lambda_r=None, seed=None):
+        """
+        Samples faults like BurstyFaultModel but with the given fault
+        probabilities (None keeps the CoreSet's). Burst and gap lengths are
+        not tilted. Every outcome possible under the real probabilities must
+        stay possible under the tilted ones.
+        """
+        BurstyFaultModel.__init__(self, seed)
+        self.lambda_c = lambda_c
+        self.lambda_b = lambda_b
+        self.lambda_r = lambda_r
+        self.logLikelihoodRatio = 0.0
+
+    def reset(self, coreSet, startTime=0.0):
+        BurstyFaultModel.reset(self, coreSet, startTime)
+        self.logLikelihoodRatio = 0.0
+
+        quantum = coreSet.quantum
+        self.tiltedC = coreSet.lambda_c if self.lambda_c is None else perTick(self.lambda_c, quantum)
+        self.tiltedB = coreSet.lambda_b if self.lambda_b is None else perTick(self.lambda_b, quantum)
+        self.tiltedR = coreSet.lambda_r if self.lambda_r is None else perTick(self.lambda_r, quantum)
+
+        # logRatios[bursty][kind] = log P_real(kind) - log P_tilted(kind)
+        self.logRatios = {}
+        for (bursty, real, tilted) in ((True, coreSet.lambda_b, self.tiltedB), (False, coreSet.lambda_r, self.tiltedR)):
+            realProbabilities = outcomeProbabilities(coreSet.lambda_c, real)
+            tiltedProbabilities = outcomeProbabilities(self.tiltedC, tilted)
+            ratios = []
+            for kind in (FaultModel.OK, FaultModel.TRANSIENT, FaultModel.PERMANENT):
+                p, q = realProbabilities[kind], tiltedProbabilities[kind]
+                if q == 0.0:
+                    if p > 0.0:
+                        raise ValueError("Tilted fault probabilities never produce an outcome the real ones can")
+                    ratios.append(0.0) # never drawn
+                elif p == 0.0:
+                    ratios.append(float("-inf"))
+                else:
+                    ratios.append(math.log(p) - math.log(q))
+            self.logRatios[bursty] = ratios
+
+    def sample(self, coreId, t):
+        self._advancePeriods(coreId, t)
+        bursty = self.isBursty(coreId, t)
+
+        cutoff = self.random()
+        if cutoff < self.tiltedC:
+            kind = FaultModel.PERMANENT
+        elif cutoff < (self.tiltedB if bursty else self.tiltedR):
+            kind = FaultModel.TRANSIENT
+        else:
+            kind = FaultModel.OK
+        self.logLikelihoodRatio += self.logRatios[bursty][kind]
+        return kind
+
+    def likelihoodRatio(self):
+        return math.exp(self.logLikelihoodRatio)
+
+class ImportanceSampler(object):
+    def __init__(self, taskSetData, activeBackups, coreSetParams, tilt=None):
+        """
+        taskSetData: taskset JSON data
+        coreSetParams: keyword arguments for CoreSet; its lambdas are the real fault rates
+        tilt: dict with any of lambda_c, lambda_b, lambda_r to sample faults with
+        """
+        self.tilt = dict(tilt or {})
+        taskSet = TaskSet(data=taskSetData, active_backups=activeBackups)
+        self.scheduler = ftmgedf.FtmGedfScheduler(taskSet, CoreSet(**coreSetParams))
+
+        # Every trial restarts from the same first tick instead of rebuilding the task set
+        self.scheduler.startRun(0, 0)
+        self.start = self.scheduler.checkpoint()
+
+        # Once the latest deadline has passed, every job has either met its deadline or missed it
+        self.latestDeadline = max(job.deadline for job in taskSet.jobs)
+
+    def runTrial(self, seed):
+        """
+        Returns (missed, likelihood ratio) for one trial.
+        """
+        scheduler = self.scheduler
+        model = TiltedBurstyFaultModel(seed=seed, **self.tilt)
+        scheduler.restore(self.start, model)
+        scheduler.runUntil(self.latestDeadline)
+
+        if scheduler.isRunning():
+            missed = not scheduler.allDeadlinesMet or not all(scheduler.taskjobComplete.values())
+        else:
+            # The queue emptied first; the jobs still on the cores run to completion without faults
+            scheduler.finishRun()
+            missed = not scheduler.allDeadlinesMet
+        return missed, model.likelihoodRatio()
+
+    def runTrials(self, seeds):
+        results = [self.runTrial(seed) for seed in seeds]
+        return np.array([r[0] for r in results], dtype=bool), np.array([r[1] for r in results], dtype=np.float64)
+
+def _runChunk(args):
+    taskSetData, activeBackups, coreSetParams, tilt, seeds = args
+    return ImportanceSampler(taskSetData, activeBackups, coreSetParams, tilt).runTrials(seeds)
+
+def summarizeTrials(missed, weights, confidence=0.95):
+    """
+    Returns the importance-sampling estimate of the miss probability from
+    per-trial miss indicators and likelihood ratios.
+    """
+    n = len(missed)
+    values = np.where(missed, weights, 0.0)
+    estimate = float(values.mean()) if n else 0.0
+    standardError = float(values.std(ddof=1) / math.sqrt(n)) if n > 1 else float("inf")
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+    # Kish effective sample size of the weights
+    sumSquares = float((weights ** 2).sum())
+    effectiveSampleSize = float(weights.sum()) ** 2 / sumSquares if sumSquares > 0 else 0.0
+
+    return {
+        "trials": n,
+        "tiltedMisses": int(missed.sum()),
+        "missProbability": estimate,
+        "standardError": standardError,
+        "relativeError": standardError / estimate if estimate > 0 else None,
+        "confidence": confidence,
+        "confidenceInterval": [max(0.0, estimate - z * standardError), estimate + z * standardError],
+        "effectiveSampleSize": effectiveSampleSize,
+        # Should be close to 1; far from it, the tilt is too strong for this many trials
+        "meanWeight": float(weights.mean()) if n else None,
+    }
+
+def estimateMissProbability(taskSetData, activeBackups, coreSetParams, tilt=None, trials=1000,
+                            seed=0, confidence=0.95, workers=1):
+    """
+    Estimates the probability that a run misses at least one deadline.
+    Trial i uses fault seed seed + i. Without a tilt this is plain Monte Carlo.
+    """
+    seeds = list(range(seed, seed + trials))
+    if workers <= 1:
+        missed, weights = ImportanceSampler(taskSetData, activeBackups, coreSetParams, tilt).runTrials(seeds)
+    else:
+        chunks = [seeds[i::workers] for i in range(workers)]
+        with Pool(workers) as pool:
+            results = pool.map(_runChunk, [(taskSetData, activeBackups, coreSetParams, tilt, chunk) for chunk in chunks])
+        missed = np.concatenate([r[0] for r in results])
+        weights = np.concatenate([r[1] for r in results])
+    return summarizeTrials(missed, weights, confidence)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+
+"""
+releaseloader.py - streaming ingestion of sporadic release lists
+
+Long sporadic traces are read in fixed-size chunks of parallel arrays
+(taskIds, times) instead of one Python object per release, and checked with
+vectorized comparisons rather than one spawnJob call at a time.
+
+iterJsonTaskSet: the top-level keys of a taskset JSON file, with its
+    releaseTimes array streamed in chunks
+readCsvReleases / readNpzReleases: release chunks from columnar files
+ReleaseValidator: per-task monotonicity and minimum inter-arrival checks
+loadTaskSet: builds a TaskSet from a taskset file and an optional release file
+"""
+
+import itertools
+import json
+import re
+
+import numpy as np
+
+from taskset import TaskSet, TaskSetError, TaskSetJsonKeys, timeQuantum, toFraction
+
+# Releases per chunk; a chunk costs about 16 bytes per release
+CHUNK_SIZE = 1 << 18
+
+WHITESPACE = re.compile(r"\s*")
+
+def toTicksArray(values, quantum):
+    """
+    Vectorized taskset.toTicks. Returns (ticks, bad) where bad marks the
+    values that are not multiples of quantum (their ticks are 0).
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        scaled = values.astype(np.int64) * quantum.denominator
+        bad = scaled % quantum.numerator != 0
+        return np.where(bad, 0, scaled // quantum.numerator), bad
+
+    exact = values.astype(np.float64) * quantum.denominator / quantum.numerator
+    ticks = np.rint(exact)
+    with np.errstate(invalid="ignore"):
+        bad = ~np.isfinite(exact) | (np.abs(exact - ticks) > 1e-9 * np.maximum(1.0, np.abs(exact)))
+    return np.where(bad, 0, ticks).astype(np.int64), bad
+
+def releaseChunks(releaseTimes, chunkSize=CHUNK_SIZE):
+    """
+    Yields (taskIds, times) chunks from a list of release dicts, as found
+    under "releaseTimes" in taskset JSON data.
+    """
+    for start in range(0, len(releaseTimes), chunkSize):
+        yield _makeChunk(releaseTimes[start:start + chunkSize], start)
+
+def _makeChunk(releases, firstRow):
+    try:
+        taskIds = [int(release[TaskSetJsonKeys.KEY_RELEASETIMES_TASKID]) for release in releases]
+        times = [release[TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE] for release in releases]
+    except (KeyError, TypeError, ValueError) as e:
+        raise TaskSetError("Malformed release near row {0}: {1!r}".format(firstRow, e),
+                           [{"reason": TaskSetError.MALFORMED, "row": firstRow}])
+    times = np.array(times)
+    if times.dtype.kind not in "iuf":
+        # Strings or mixed values: take the slow exact path per value
+        times = np.array([float(toFraction(t)) for t in times.tolist()], dtype=np.float64)
+    return np.array(taskIds, dtype=np.int64), times
+
+class _JsonStream(object):
+    """
+    Decodes one JSON value at a time from a text file, reading it in blocks.
+    """
+    def __init__(self, f, blockSize=1 << 20):
+        self.f = f
+        self.blockSize = blockSize
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        block = self.f.read(self.blockSize)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        c = self.peek()
+        if c == "" or c not in chars:
+            raise TaskSetError("Invalid taskset JSON: expected one of {0!r}, found {1!r}".format(chars, c or "end of file"))
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # The value may just continue in the next block
+                if not self._fill():
+                    raise TaskSetError("Invalid taskset JSON: {0}".format(e))
+                continue
+            if end == len(self.buffer) and self._fill():
+                continue # a number at the end of the block may have more digits
+            self.pos = end
+            return value
+
+def iterJsonTaskSet(f, chunkSize=CHUNK_SIZE):
+    """
+    Yields (key, value) for each top-level key of a taskset JSON file, except
+    that the releaseTimes array is yielded as one or more (releaseTimes,
+    (taskIds, times)) chunks, so it never has to be held in memory whole.
+    """
+    stream = _JsonStream(f)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == TaskSetJsonKeys.KEY_RELEASETIMES:
+            for chunk in _iterReleaseArray(stream, chunkSize):
+                yield (key, chunk)
+        else:
+            yield (key, stream.value())
+        if stream.expect(",}") == "}":
+            return
+
+def _iterReleaseArray(stream, chunkSize):
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        yield _makeChunk([], 0) # an empty list still means sporadic releases
+        return
+    releases = []
+    row = 0
+    while True:
+        releases.append(stream.value())
+        if len(releases) == chunkSize:
+            yield _makeChunk(releases, row)
+            row += len(releases)
+            releases = []
+        if stream.expect(",]") == "]":
+            break
+    if releases:
+        yield _makeChunk(releases, row)
+
+def readCsvReleases(file_path, chunkSize=CHUNK_SIZE):
+    """
+    Yields (taskIds, times) chunks from a CSV file whose header row names a
+    taskId and a timeInstant column.
+    """
+    with open(file_path) as f:
+        columns = [column.strip() for column in f.readline().split(",")]
+        try:
+            taskColumn = columns.index(TaskSetJsonKeys.KEY_RELEASETIMES_TASKID)
+            timeColumn = columns.index(TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE)
+        except ValueError:
+            raise TaskSetError("{0}: the header must name {1} and {2} columns".format(
+                file_path, TaskSetJsonKeys.KEY_RELEASETIMES_TASKID, TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE))
+
+        row = 0
+        while True:
+            lines = list(itertools.islice(f, chunkSize))
+            if not lines:
+                return
+            try:
+                table = np.loadtxt(lines, delimiter=",", usecols=(taskColumn, timeColumn), ndmin=2)
+            except ValueError as e:
+                raise TaskSetError("{0}: malformed row between rows {1} and {2}: {3}".format(file_path, row, row + len(lines), e),
+                                   [{"reason": TaskSetError.MALFORMED, "row": row}])
+            times = table[:, 1]
+            if np.array_equal(times, np.trunc(times)) and np.abs(times).max(initial=0) < 2 ** 53:
+                times = times.astype(np.int64) # integer times take the exact path
+            yield table[:, 0].astype(np.int64), times
+            row += len(lines)
+
+def readNpzReleases(file_path, chunkSize=CHUNK_SIZE):
+    """
+    Yields (taskIds, times) chunks from an .npz file with taskId and
+    timeInstant arrays (see np.savez).
+    """
+    with np.load(file_path) as data:
+        try:
+            taskIds = data[TaskSetJsonKeys.KEY_RELEASETIMES_TASKID]
+            times = data[TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE]
+        except KeyError:
+            raise TaskSetError("{0}: needs {1} and {2} arrays".format(
+                file_path, TaskSetJsonKeys.KEY_RELEASETIMES_TASKID, TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE))
+    if len(taskIds) != len(times):
+        raise TaskSetError("{0}: taskId and timeInstant have different lengths".format(file_path))
+    for start in range(0, len(taskIds), chunkSize):
+        yield taskIds[start:start + chunkSize].astype(np.int64), times[start:start + chunkSize]
+
+def readReleases(file_path, chunkSize=CHUNK_SIZE):
+    if file_path.endswith(".npz"):
+        return readNpzReleases(file_path, chunkSize)
+    if file_path.endswith(".csv"):
+        return readCsvReleases(file_path, chunkSize)
+    raise TaskSetError("Unknown release file type (expected .csv or .npz): {0}".format(file_path))
+
+class ReleaseValidator(object):
+    # Sentinel for "no release of this task yet"
+    NONE = np.iinfo(np.int64).min
+
+    def __init__(self, taskSet, maxErrors=100):
+        """
+        Checks release chunks against taskSet, carrying each task's last
+        release from one chunk to the next. Keeps the first maxErrors errors
+        and counts the rest.
+        """
+        self.quantum = taskSet.quantum
+        self.taskIds = np.array(sorted(task.id for task in taskSet), dtype=np.int64)
+        self.periods = np.array([taskSet.getTaskById(taskId).period for taskId in self.taskIds.tolist()], dtype=np.int64)
+        self.last = np.full(len(self.taskIds), ReleaseValidator.NONE, dtype=np.int64)
+        self.maxErrors = maxErrors
+        self.errors = []
+        self.errorCount = 0
+        self.row = 0
+
+    def check(self, taskIds, times):
+        """
+        Returns (ticks, valid) for one chunk: the release times in ticks and
+        the mask of the releases that passed every check.
+        """
+        n = len(taskIds)
+        ticks, notMultiple = toTicksArray(times, self.quantum)
+
+        position = np.clip(np.searchsorted(self.taskIds, taskIds), 0, max(len(self.taskIds) - 1, 0))
+        unknown = (self.taskIds[position] != taskIds) if len(self.taskIds) else np.ones(n, dtype=bool)
+        usable = ~unknown & ~notMultiple
+
+        # Group the usable rows by task, keeping file order within a task
+        rows = np.flatnonzero(usable)
+        rows = rows[np.argsort(position[rows], kind="stable")]
+        p = position[rows]
+        t = ticks[rows]
+
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = p[1:] != p[:-1]
+        previous = np.empty_like(t)
+        previous[1:] = t[:-1]
+        previous[first] = self.last[p[first]]
+        hasPrevious = previous != ReleaseValidator.NONE
+
+        gap = np.where(hasPrevious, t - np.where(hasPrevious, previous, 0), 0)
+        notMonotonic = hasPrevious & (gap < 0)
+        tooSoon = hasPrevious & ~notMonotonic & (self.periods[p] > 0) & (gap < self.periods[p])
+
+        if len(rows):
+            lastRows = np.flatnonzero(np.append(p[1:] != p[:-1], True))
+            self.last[p[lastRows]] = t[lastRows]
+
+        valid = usable.copy()
+        valid[rows[notMonotonic | tooSoon]] = False
+        # Every bad row has one reason; they are kept in row order, so the
+        # first maxErrors errors are the first ones in the file
+        reasons = {}
+        for (reason, badRows) in ((TaskSetError.UNKNOWN_TASK, np.flatnonzero(unknown)),
+                                  (TaskSetError.NOT_MULTIPLE, np.flatnonzero(notMultiple & ~unknown)),
+                                  (TaskSetError.NOT_MONOTONIC, np.sort(rows[notMonotonic])),
+                                  (TaskSetError.TOO_SOON, np.sort(rows[tooSoon]))):
+            reasons.update((k, reason) for k in badRows[:self.maxErrors].tolist())
+            self.errorCount += len(badRows)
+        for k in sorted(reasons)[:max(0, self.maxErrors - len(self.errors))]:
+            self.errors.append({
+                "reason": reasons[k],
+                "row": self.row + k,
+                "taskId": int(taskIds[k]),
+                "timeInstant": times[k].item(),
+            })
+
+        self.row += n
+        return ticks, valid
+
+    def raiseIfInvalid(self):
+        if self.errorCount:
+            first = self.errors[0]
+            raise TaskSetError("{0} invalid release(s); first at row {1}: task {2} at {3} ({4})".format(
+                self.errorCount, first["row"], first["taskId"], first["timeInstant"], first["reason"]), self.errors)
+
+def loadTaskSet(file_path, active_backups=0, quantum=None, releases=None, chunkSize=CHUNK_SIZE):
+    """
+    Builds a TaskSet from a taskset JSON file, streaming its releaseTimes.
+    releases: a .csv or .npz release file that replaces the file's releaseTimes
+
+    Without an explicit quantum, it is picked from the task parameters like
+    TaskSet(data) does (see timeQuantum), wherever the other keys are in the
+    file; releases that are not multiples of it are errors.
+    """
+    with open(file_path) as f:
+        events = iterJsonTaskSet(f, chunkSize)
+        header = {}
+        buffered = None
+        for (key, value) in events:
+            if key != TaskSetJsonKeys.KEY_RELEASETIMES:
+                header[key] = value
+            elif releases is not None:
+                continue # replaced by the release file
+            elif TaskSetJsonKeys.KEY_TASKSET in header:
+                # The tasks are known, so the rest of the releases stream straight into jobs
+                chunks = itertools.chain([value], _releasesOnly(events, header))
+                return _build(header, active_backups, quantum, chunks)
+            else:
+                # Releases before the tasks: keep the compact chunks until the tasks arrive
+                buffered = (buffered or []) + [value]
+
+    if releases is not None:
+        return _build(header, active_backups, quantum, readReleases(releases, chunkSize))
+    return _build(header, active_backups, quantum, buffered)
+
+def _releasesOnly(events, header):
+    for (key, value) in events:
+        if key == TaskSetJsonKeys.KEY_RELEASETIMES:
+            yield value
+        else:
+            header[key] = value
+
+def _build(header, active_backups, quantum, chunks):
+    if quantum is None:
+        quantum = timeQuantum(header)
+    return TaskSet(header, active_backups, quantum=quantum, releases=chunks)
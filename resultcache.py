@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""
+resultcache.py - content-addressed on-disk cache of trial results
+
+A trial's result only depends on its inputs (taskset data, CoreSet
+parameters, active backups, seed, horizon and scheduler options) and on the
+simulator itself, so results are stored under the SHA-256 of those inputs in
+canonical JSON plus ftmgedf.SIMULATOR_VERSION. Re-running or extending a
+sweep then only simulates the trials it has not seen.
+
+Entries are small JSON files in a two-level directory tree. A hit refreshes
+the entry's mtime, and once the cache grows past its size cap the entries
+with the oldest mtimes are evicted first (LRU). Writes go through a rename,
+so several processes can share a cache directory.
+
+ResultCache: get/put of trial results by spec
+"""
+
+import hashlib
+import json
+import os
+import uuid
+
+from ftmgedf import SIMULATOR_VERSION
+
+# Spec fields that determine a trial's result; the label only names it
+KEY_FIELDS = ("taskset", "activeBackups", "coreSet", "horizon", "seed", "cancelSiblings", "quantum",
+              "preemptionOverhead", "migrationOverhead", "affinity")
+
+def specKey(spec):
+    """
+    Returns the hex SHA-256 of a trial spec's inputs and the simulator version.
+    """
+    inputs = dict((field, spec.get(field)) for field in KEY_FIELDS)
+    inputs["simulatorVersion"] = SIMULATOR_VERSION
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResultCache(object):
+    def __init__(self, directory, maxBytes=256 << 20):
+        """
+        directory: created if missing; may be shared by several processes
+        maxBytes: size the entries are evicted down to once exceeded
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None # bytes, counted on the first put
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".json")
+
+    def get(self, spec):
+        """
+        Returns the cached result of spec, relabeled with spec's label, or None.
+        """
+        path = self._path(specKey(spec))
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted meanwhile, or left truncated by a crash
+            self.misses += 1
+            return None
+        self.hits += 1
+        result["label"] = spec["label"]
+        return result
+
+    def put(self, spec, result):
+        path = self._path(specKey(spec))
+        record = dict(result)
+        record.pop("label", None)
+        data = json.dumps(record, sort_keys=True, separators=(",", ":"))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = "{0}.tmp-{1}".format(path, uuid.uuid4().hex)
+        with open(temporary, "w") as f:
+            f.write(data)
+        try:
+            # Another process (or an earlier run) may have stored the same key
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(temporary, path)
+
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.maxBytes:
+            self.evict()
+
+    def _entries(self):
+        for sub in os.listdir(self.directory):
+            subPath = os.path.join(self.directory, sub)
+            if not os.path.isdir(subPath):
+                continue
+            for name in os.listdir(subPath):
+                if name.endswith(".json"):
+                    yield os.path.join(subPath, name)
+
+    def size(self):
+        """
+        Returns the total size of the entries in bytes.
+        """
+        total = 0
+        for path in self._entries():
+            try:
+                total += os.stat(path).st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self, targetBytes=None):
+        """
+        Removes least recently used entries until the cache holds at most
+        targetBytes (default: 90% of maxBytes, so puts do not evict one entry
+        each). Returns the number removed.
+        """
+        targetBytes = int(self.maxBytes * 0.9) if targetBytes is None else targetBytes
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(entry[1] for entry in entries)
+        removed = 0
+        for (_, size, path) in entries:
+            if total <= targetBytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass # another process evicted it
+            total -= size
+        self._size = total
+        return removed
+
+    def clear(self):
+        return self.evict(0)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.size(), "maxBytes": self.maxBytes}
@@ -7,7 +7,10 @@ schedule.py - parser/serializer for schedule to/from JSON file
 import json
 import sys
 
+import numpy as np
+
 from taskset import TaskSet
+from intervalindex import ScheduleIndex
 
 class ScheduleJsonKeys(object):
     # Schedule
@@ -28,6 +31,10 @@ class Schedule(object):
         self.taskSet = taskSet
         self.coreSet = coreSet
         self.intervals = []
+        # (taskId, jobId, backupId) -> preemption/migration overhead ticks the copy was charged
+        self.overheads = {}
+        self._intervalArrays = None
+        self._index = None
 
         if data is not None: #When SchedulerAlgorithm is initialized, data is always NONE
             # If the schedule has been provided in JSON, parse it
@@ -60,6 +67,8 @@ class Schedule(object):
     #this is called at the very end of each SchedulerAlgorithm's buildSchedule fn
     def postProcessIntervals(self, endTime):
         self.endTime = endTime
+        self._intervalArrays = None
+        self._index = None
 
         self.intervals.sort(key = lambda x: (x.coreId, x.startTime))
         # Post-process the intervals, setting the end time and whether
@@ -71,7 +80,7 @@ class Schedule(object):
                 oneMoreThanLastIndex = i+1
                 t = self.intervals[oneMoreThanLastIndex]
                 #find last index + 1
-                while s.taskId is t.taskId and s.jobId is t.jobId and s.coreId is t.coreId and s.backupId is s.backupId:
+                while s.taskId == t.taskId and s.jobId == t.jobId and s.coreId == t.coreId and s.backupId == t.backupId:
                     oneMoreThanLastIndex = oneMoreThanLastIndex+1
                     if oneMoreThanLastIndex < len(self.intervals):
                         t = self.intervals[oneMoreThanLastIndex]
@@ -94,11 +103,52 @@ class Schedule(object):
 
     def addInterval(self, interval):
         self.intervals.append(interval)
+        self._intervalArrays = None
+        self._index = None
 
     def addFailInterval(self, startTime, endTime, coreId):
         failInterval = ScheduleInterval()
         failInterval.initialize(startTime, endTime, -1, False, coreId, False)
         self.intervals.append(failInterval)
+        self._intervalArrays = None
+        self._index = None
+        return failInterval
+
+    def getIndex(self):
+        """
+        Returns the ScheduleIndex over the post-processed intervals, built
+        on first use and reused until the intervals change.
+        """
+        if self._index is None:
+            self._index = ScheduleIndex(self.intervals)
+        return self._index
+
+    @staticmethod
+    def _timeArray(times):
+        if all(isinstance(t, int) for t in times):
+            return np.array(times, dtype=np.int64)
+        return np.array(times, dtype=np.float64)
+
+    def getIntervalArrays(self):
+        """
+        Returns the intervals as a dict of parallel NumPy arrays (start, end,
+        coreId, taskId, jobId, backupId, completed), in self.intervals order.
+        Built once and reused until the intervals change.
+        """
+        if self._intervalArrays is None:
+            intervals = self.intervals
+            self._intervalArrays = {
+                # int64 for simulated schedules, which run on integer ticks;
+                # float64 for schedules parsed from JSON
+                "start": self._timeArray([x.startTime for x in intervals]),
+                "end": self._timeArray([x.endTime for x in intervals]),
+                "coreId": np.array([x.coreId for x in intervals], dtype=np.int64),
+                "taskId": np.array([x.taskId for x in intervals], dtype=np.int64),
+                "jobId": np.array([x.jobId for x in intervals], dtype=np.int64),
+                "backupId": np.array([x.backupId for x in intervals], dtype=np.int64),
+                "completed": np.array([x.jobCompleted for x in intervals], dtype=bool),
+            }
+        return self._intervalArrays
     
 
     def printIntervals(self, displayIdle=True):
@@ -110,21 +160,13 @@ class Schedule(object):
     def areWcetsExceeded(self):
         """
         Returns a boolean indicating whether all jobs execute for
-        at most their WCET value.
+        at most their WCET value plus the overheads they were charged.
         """
-        jobDurations = {}
-        for interval in self.intervals:
-            if interval.isIdle():
-                continue
-
-            task = self.taskSet.getTaskById(interval.taskId)
-            job = task.getJobById(interval.jobId)
-
-            key = (task.id, job.id)
-            duration = interval.endTime - interval.startTime
-            jobDurations[key] = jobDurations.get(key, 0) + duration
-
-            if jobDurations[key] > task.wcet:
+        index = self.getIndex()
+        for key in index.jobKeys():
+            task = self.taskSet.getTaskById(key[0])
+            duration = sum(x.endTime - x.startTime for x in index.jobIntervals(*key))
+            if duration > task.wcet + self.overheads.get(key, 0):
                 return True
 
         return False
@@ -138,16 +180,24 @@ class Schedule(object):
 
     def doesMeetDeadlines(self):
         """
-        Returns a boolean indicating whether all deadlines are met.
+        Returns a boolean indicating whether all deadlines are met. A job meets
+        its deadline if its first copy (primary or backup) to complete does.
         """
-        for interval in self.intervals:
-            if interval.jobCompleted:
-                job = self.taskSet.getTaskById(interval.taskId).getJobById(interval.jobId)
-                deadline = job.deadline
-                finishTime = interval.endTime
-                if finishTime > deadline:
-                    print("Task {0} Job {1} - r: {2}, d: {3}, f:{4}".format(job.task.id, job.id, job.releaseTime, deadline, finishTime))
-                    return False
+        index = self.getIndex()
+        checked = set()
+        for key in index.jobKeys():
+            if key[:2] in checked:
+                continue
+            checked.add(key[:2])
+
+            finishTime = index.completionTime(key[0], key[1])
+            if finishTime is None:
+                continue
+            job = self.taskSet.getTaskById(key[0]).getJobById(key[1])
+            deadline = job.deadline
+            if finishTime > deadline:
+                print("Task {0} Job {1} - r: {2}, d: {3}, f:{4}".format(job.task.id, job.id, job.releaseTime, deadline, finishTime))
+                return False
         return True
 
     def checkFeasibility(self):
@@ -182,7 +232,7 @@ class ScheduleInterval(object):
     def initialize(self, startTime, endTime, job, didPreemptPrevious, coreId, jobCompleted):
         self.startTime = startTime
 
-        if job is -1: #handles Fail periods
+        if job == -1: #handles Fail periods
             self.taskId = -1
         elif job is not None:
             self.taskId = job.task.id
@@ -44,6 +44,18 @@ class PriorityQueue(object):
             return True
         return False
 
+    def _takeJob(self, index):
+        """
+        Removes and returns the job at index. A job with pending active backups
+        leaves the next backup in its slot, so the copies are dispatched in the
+        same order as if they had all been queued.
+        """
+        job = self.jobs[index]
+        if job.pendingBackups > 0:
+            self.jobs[index] = job.takeBackup()
+            return job
+        return self.jobs.pop(index)
+
     def getFirst(self, t):
         """
         Returns the job with highest priority at time t, or None
@@ -62,7 +74,7 @@ class PriorityQueue(object):
         """
         index = self._findFirst(t)
         if index >= 0:
-            return self.jobs.pop(index)
+            return self._takeJob(index)
 
     def _popJob(self, t):
         raise NotImplementedError
@@ -86,13 +98,36 @@ class PriorityQueue(object):
         return False
 
 class SchedulerAlgorithm(object):
-    def __init__(self, taskSet, coreSet):
+    def __init__(self, taskSet, coreSet, stats=None):
         self.taskSet = taskSet
         self.coreSet = coreSet
 
         self.schedule = Schedule(None, taskSet, coreSet)
         self.time = 0 #TODO:do we need this?
 
+        # Optional SchedulerStats; None means no timing at all
+        self.stats = stats
+        # event name -> list of callbacks; stays empty unless someone registers
+        self.observers = {}
+
+    def addObserver(self, event, callback):
+        """
+        Registers callback(event, time, coreId, job) for one of the
+        SchedulerEvents names.
+        """
+        self.observers.setdefault(event, []).append(callback)
+
+    def removeObserver(self, event, callback):
+        callbacks = self.observers.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if len(callbacks) == 0 and event in self.observers:
+            del self.observers[event]
+
+    def _notify(self, event, t, coreId, job):
+        for callback in self.observers.get(event, ()):
+            callback(event, t, coreId, job)
+
     def buildSchedule(self):
         raise NotImplementedError()
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""
+search.py - design questions answered by bisection instead of full sweeps
+
+How many active backups does a taskset need to meet every deadline with
+probability at least target? How high can lambda_b or lambda_r get before
+it no longer does? Rather than running a fixed number of trials at every
+candidate value, the searches bisect over the candidates, and each probe (one
+candidate) runs trials in growing rounds only until the Wilson score interval
+of its success rate lies wholly above or below the target.
+
+Trial i of every probe uses fault seed seed + i (common random numbers). The
+burst/gap model draws one uniform cutoff per tick for every core not yet
+failed permanently, so the draws of two probes stay aligned only while the
+same cores fail permanently at the same ticks. Probes of different backup
+counts draw identical faults, as faults do not depend on the schedule. Probes
+of different lambda_b or lambda_r keep the same permanent faults too (those
+depend only on lambda_c, which is not searched), so a higher rate fails a
+core transiently at every tick a lower one does and more. A search over
+lambda_c would not have this: after the first permanent fault one probe has
+and the other lacks, their draws shift apart. Common random numbers make
+probes less noisy relative to each other, but the measured success rates can
+still come out non-monotone between probes.
+
+Both searches assume the success probability is monotonic in the searched
+value: nondecreasing in the active backups (up to the answer, at least; past
+some count the copies overload the cores), nonincreasing in the fault rates.
+Where the rates measured by the probes are not, the answer is one the
+bisection found, not necessarily the smallest (or largest) passing value.
+
+wilsonInterval: Wilson score interval of a success rate
+probe: adaptive trials of one configuration against a target
+minimumBackups: the fewest active backups reaching the target
+maximumFaultRate: the highest lambda_b or lambda_r still reaching it
+"""
+
+import math
+from statistics import NormalDist
+
+from rareevent import ImportanceSampler
+
+def wilsonInterval(successes, trials, confidence=0.95):
+    """
+    Returns the (low, high) Wilson score interval of successes / trials.
+    """
+    if trials == 0:
+        return (0.0, 1.0)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    rate = successes / trials
+    denominator = 1.0 + z * z / trials
+    center = (rate + z * z / (2.0 * trials)) / denominator
+    halfWidth = z * math.sqrt(rate * (1.0 - rate) / trials + z * z / (4.0 * trials * trials)) / denominator
+    return (max(0.0, center - halfWidth), min(1.0, center + halfWidth))
+
+def probe(taskSetData, activeBackups, coreSetParams, target, seed=0, minTrials=8, maxTrials=256, confidence=0.95):
+    """
+    Runs trials of one configuration, minTrials first and then doubling,
+    until the Wilson interval of the success rate is decided against target
+    or maxTrials have run. Returns a dict with the successes, trials, rate,
+    interval, whether it was decided and whether it passes (by the interval
+    when decided, by the rate otherwise).
+    """
+    sampler = ImportanceSampler(taskSetData, activeBackups, coreSetParams)
+    successes = 0
+    trials = 0
+    batch = minTrials
+    while True:
+        batch = min(batch, maxTrials - trials)
+        missed, _ = sampler.runTrials(range(seed + trials, seed + trials + batch))
+        successes += batch - int(missed.sum())
+        trials += batch
+        low, high = wilsonInterval(successes, trials, confidence)
+        decided = low >= target or high < target
+        if decided or trials >= maxTrials:
+            break
+        batch = trials
+
+    rate = successes / trials
+    return {
+        "successes": successes,
+        "trials": trials,
+        "rate": rate,
+        "interval": [low, high],
+        "decided": decided,
+        "passes": low >= target if decided else rate >= target,
+    }
+
+def _result(name, value, target, probes):
+    return {
+        "parameter": name,
+        "value": value,
+        "target": target,
+        "probes": [dict(probes[v], value=v) for v in sorted(probes)],
+        "simulations": sum(p["trials"] for p in probes.values()),
+    }
+
+def minimumBackups(taskSetData, coreSetParams, target, low=0, high=10, **probeOptions):
+    """
+    Returns the fewest active backups in [low, high] whose success
+    probability reaches target (value None if none up to high does), with
+    every probe made and the number of simulations they took. The search
+    gallops up from low (low, low + 1, low + 3, low + 7, ...) to the first
+    count that passes and bisects below it, so counts far above the answer,
+    where the copies may overload the cores, are never probed.
+    probeOptions: seed, minTrials, maxTrials, confidence (see probe)
+    """
+    probes = {}
+    def passes(backups):
+        probes[backups] = probe(taskSetData, backups, coreSetParams, target, **probeOptions)
+        return probes[backups]["passes"]
+
+    # Invariant: failing at lo (or lo is below the range), passing at hi
+    lo, hi = low - 1, low
+    step = 1
+    while not passes(hi):
+        if hi >= high:
+            return _result("activeBackups", None, target, probes)
+        lo, hi = hi, min(hi + step, high)
+        step *= 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if passes(mid):
+            hi = mid
+        else:
+            lo = mid
+    return _result("activeBackups", hi, target, probes)
+
+def maximumFaultRate(taskSetData, activeBackups, coreSetParams, target, parameter="lambda_b", low=0.0, high=1.0,
+                     tolerance=1e-3, **probeOptions):
+    """
+    Returns the highest value of parameter (lambda_b or lambda_r) in
+    [low, high], to within tolerance, whose success probability still
+    reaches target (value None if even low does not), with every probe made
+    and the number of simulations they took. The other CoreSet parameters
+    come from coreSetParams.
+    """
+    # lambda_c is left out: probes of different lambda_c lose their common random numbers (see above)
+    if parameter not in ("lambda_b", "lambda_r"):
+        raise ValueError("Can only search lambda_b or lambda_r, not {0}".format(parameter))
+
+    probes = {}
+    def passes(rate):
+        params = dict(coreSetParams, **{parameter: rate})
+        probes[rate] = probe(taskSetData, activeBackups, params, target, **probeOptions)
+        return probes[rate]["passes"]
+
+    if not passes(low):
+        return _result(parameter, None, target, probes)
+    if passes(high):
+        return _result(parameter, high, target, probes)
+    # Invariant: passing at lo, failing at hi
+    lo, hi = low, high
+    while hi - lo > tolerance:
+        mid = (lo + hi) / 2.0
+        if passes(mid):
+            lo = mid
+        else:
+            hi = mid
+    return _result(parameter, lo, target, probes)
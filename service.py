@@ -0,0 +1,483 @@
+#!/usr/bin/env python
+
+"""
+service.py - long-running local schedulability service
+
+Tools that ask many small questions (is this taskset schedulable with k
+backups on these cores?) should not pay interpreter start-up and imports for
+each one. ScheduleService answers them over HTTP on localhost or on a Unix
+socket. An asyncio front end parses requests, answers what it can from a
+ResultCache, and batches the rest into a process pool that is started (and
+warmed up) once: work arriving within batchDelay seconds of each other goes to
+the workers together, split into one chunk per worker.
+
+Requests and responses are JSON:
+    POST /schedulability
+        {"taskset": {...}, "activeBackups": 1 or [1, 2, 3], "trials": 20,
+         "coreSet": {CoreSet keyword arguments}, "seed": 0, "horizon": 50,
+         "cancelSiblings": false, "quantum": null, "preemptionOverhead": 0,
+         "migrationOverhead": 0, "affinity": false}
+        -> {"schedulability": {"1": 0.95, ...}, "missedJobs": {"1": 0.05, ...},
+            "cached": trials found in the cache, "simulated": trials run}
+        Trials are sweep.runTrial's, so they share the cache with sweeps.
+    POST /simulate
+        {"taskset": {...}, "activeBackups": 1, "coreSet": {...}, "seed": 0,
+         "horizon": 50, "cancelSiblings": false, "quantum": null,
+         "preemptionOverhead": 0, "migrationOverhead": 0, "affinity": false,
+         "stats": false, "schedule": false}
+        -> {"meetsDeadlines": ..., "missedJobs": [[taskId, jobId, backupId], ...],
+            "ticks": ..., "migrations": ..., "stats": {...}, "schedule": {...}}
+        Overheads are in taskset time units; "schedule" lists the intervals
+        in ticks.
+    GET /status
+        -> {"workers": ..., "queued": ..., "batches": ..., "cache": {...}}
+Errors come back as {"error": message} with status 400 (bad request), 404 or 500.
+A simulation or trial that runs longer than the service's maxSeconds is
+stopped and answered with 400, and so is a /schedulability request for more
+than maxTrials trials in all.
+
+ScheduleService: the server; start() then serveForever(), or run()
+simulateRequest: runs one /simulate request (in a worker)
+"""
+
+import asyncio
+import json
+import os
+import random
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from taskset import TaskSet, TaskSetError, toFraction
+from coreset import CoreSet
+from instrumentation import SchedulerStats
+import ftmgedf
+import sweep
+
+class RequestError(ValueError):
+    # A request the client got wrong; answered with status 400
+    pass
+
+class RequestTimeout(RequestError):
+    # A simulation over the service's time limit; answered with status 400
+    pass
+
+class WorkerError(Exception):
+    # A failure in a worker that is not the client's fault; answered with status 500
+    pass
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+def simulateRequest(request):
+    """
+    Runs the simulation a /simulate request describes and returns its response.
+    """
+    seed = request.get("seed", 0)
+    random.seed(seed)
+    np.random.seed(seed)
+
+    taskSet = TaskSet(data=request["taskset"], active_backups=request.get("activeBackups", 1),
+                      quantum=request.get("quantum"))
+    coreSet = CoreSet(**request.get("coreSet", sweep.DEFAULT_CORESET))
+    stats = SchedulerStats() if request.get("stats") else None
+    ftm = ftmgedf.FtmGedfScheduler(taskSet, coreSet, stats=stats,
+                                   cancelSiblings=request.get("cancelSiblings", False),
+                                   preemptionOverhead=taskSet.ceilTicks(request.get("preemptionOverhead", 0)),
+                                   migrationOverhead=taskSet.ceilTicks(request.get("migrationOverhead", 0)),
+                                   affinity=request.get("affinity", False))
+    schedule = ftm.buildSchedule(0, taskSet.ceilTicks(request.get("horizon", 50)))
+
+    response = {
+        "meetsDeadlines": ftm.doesMeetDeadlines(),
+        "missedJobs": [[job.task.id, job.id, job.backupId] for job in ftm.missedJobs],
+        "ticks": ftm.time,
+        "migrations": ftm.migrations,
+    }
+    if stats is not None:
+        response["stats"] = stats.toDict()
+    if request.get("schedule"):
+        response["schedule"] = {
+            "quantum": float(taskSet.quantum),
+            "endTime": schedule.endTime,
+            "intervals": [[interval.coreId, interval.taskId, interval.jobId, interval.backupId,
+                           interval.startTime, interval.endTime, interval.jobCompleted]
+                          for interval in schedule.intervals],
+            "fields": ["coreId", "taskId", "jobId", "backupId", "startTime", "endTime", "jobCompleted"],
+        }
+    return response
+
+def _checkCoreSet(params):
+    if not isinstance(params, dict):
+        raise RequestError("invalid coreSet: expected an object of CoreSet arguments")
+    try:
+        coreSet = CoreSet(**params)
+    except TypeError as e:
+        raise RequestError("invalid coreSet: {0}".format(e))
+    if coreSet.m < 1 or not 0 <= coreSet.num_faulty <= coreSet.m:
+        raise RequestError("invalid coreSet: needs m >= 1 and 0 <= num_faulty <= m, not m={0}, num_faulty={1}".format(
+            coreSet.m, coreSet.num_faulty))
+
+def _checkQuantum(value):
+    if value is None:
+        return
+    try:
+        quantum = None if isinstance(value, bool) else toFraction(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        quantum = None
+    if quantum is None or quantum <= 0:
+        raise RequestError("'quantum' must be a positive number or fraction such as \"1/4\", not {0!r}".format(value))
+
+def _checkInteger(name, value, minimum=None):
+    # bool is an int subclass, but "trials": true is a client mistake
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RequestError("'{0}' must be an integer, not {1!r}".format(name, value))
+    if minimum is not None and value < minimum:
+        raise RequestError("'{0}' must be at least {1}, not {2}".format(name, minimum, value))
+    return value
+
+def _checkNumber(name, value, positive=False):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0 or (positive and value == 0):
+        raise RequestError("'{0}' must be a {1} number, not {2!r}".format(name, "positive" if positive else "non-negative", value))
+    return value
+
+def _checkRun(request):
+    """
+    Checks the fields /schedulability and /simulate share, so the client's
+    mistakes are answered with 400 before any work is queued.
+    """
+    if "taskset" not in request:
+        raise RequestError("missing 'taskset'")
+    if "coreSet" in request:
+        _checkCoreSet(request["coreSet"])
+    _checkInteger("seed", request.get("seed", 0))
+    _checkQuantum(request.get("quantum"))
+    _checkNumber("horizon", request.get("horizon", 50), positive=True)
+    for name in ("preemptionOverhead", "migrationOverhead"):
+        _checkNumber(name, request.get(name, 0))
+
+def _runChunk(chunk, maxSeconds=None):
+    """
+    Runs a chunk of (kind, payload) work items in a worker, each stopped
+    after maxSeconds (None: no limit). An item that fails returns {"error":
+    message, "status": 400 or 500} rather than failing its chunk: 400 for
+    the client's mistakes and timeouts, 500 for anything else.
+    """
+    def timeout(signum, frame):
+        raise RequestTimeout("simulation stopped after the service's limit of {0} s".format(maxSeconds))
+    if maxSeconds:
+        signal.signal(signal.SIGALRM, timeout)
+
+    results = []
+    for (kind, payload) in chunk:
+        try:
+            if maxSeconds:
+                signal.setitimer(signal.ITIMER_REAL, maxSeconds)
+            try:
+                if kind == "trial":
+                    result = sweep.runTrial(payload)
+                else:
+                    result = simulateRequest(payload)
+            finally:
+                if maxSeconds:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            results.append(result)
+        except (RequestError, TaskSetError) as e:
+            results.append({"error": str(e), "status": 400})
+        except Exception as e:
+            results.append({"error": "{0}: {1}".format(type(e).__name__, e), "status": 500})
+    return results
+
+def _checkResult(result):
+    if "error" in result:
+        if result["status"] == 400:
+            raise RequestError(result["error"])
+        raise WorkerError(result["error"])
+
+def _warmUp():
+    # Imports are done by now; this makes the first real request skip lazy setup too
+    return os.getpid()
+
+class ScheduleService(object):
+    def __init__(self, host="127.0.0.1", port=8642, socketPath=None, workers=None, cache=None,
+                 batchDelay=0.002, maxBatch=256, maxBody=16 << 20, maxSeconds=60, maxTrials=10000):
+        """
+        host, port: where to listen, unless socketPath names a Unix socket
+        workers: worker processes (default: one per CPU)
+        cache: a ResultCache for /schedulability trials, or None
+        batchDelay: seconds to wait for more work before dispatching a batch
+        maxBatch: work items that dispatch a batch without waiting
+        maxBody: largest request body accepted, in bytes
+        maxSeconds: longest a simulation or trial may run (None: no limit)
+        maxTrials: most trials one /schedulability request may ask for, over
+        all its backup counts; maxSeconds only bounds each trial
+        """
+        self.host = host
+        self.port = port
+        self.socketPath = socketPath
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.batchDelay = batchDelay
+        self.maxBatch = maxBatch
+        self.maxBody = maxBody
+        self.maxSeconds = maxSeconds
+        self.maxTrials = maxTrials
+        self.batches = 0
+        self.pool = None
+        self.cacheThread = None
+        self.server = None
+        self._queue = None
+        self._batcher = None
+
+    async def start(self):
+        """
+        Starts the worker pool, waits until every worker is up and starts listening.
+        """
+        loop = asyncio.get_running_loop()
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.cacheThread = ThreadPoolExecutor(1)
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _warmUp) for _ in range(self.workers)])
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._batchLoop())
+        if self.socketPath:
+            if os.path.exists(self.socketPath):
+                os.remove(self.socketPath) # left over from a previous run
+            self.server = await asyncio.start_unix_server(self._handleConnection, path=self.socketPath)
+        else:
+            self.server = await asyncio.start_server(self._handleConnection, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serveForever(self):
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+        if self.cacheThread is not None:
+            self.cacheThread.shutdown(wait=False)
+            self.cacheThread = None
+        if self.socketPath and os.path.exists(self.socketPath):
+            os.remove(self.socketPath)
+
+    def run(self):
+        """
+        Serves until interrupted or sent SIGTERM.
+        """
+        async def main():
+            await self.start()
+            # SIGTERM stops it like Ctrl-C, closing the pool and removing the socket
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            print("Serving on {0}".format(self.address()), file=sys.stderr)
+            await self.serveForever()
+        try:
+            asyncio.run(main())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+
+    def address(self):
+        return self.socketPath if self.socketPath else "http://{0}:{1}".format(self.host, self.port)
+
+    # Batching
+
+    def _submit(self, kind, payload):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((kind, payload, future))
+        return future
+
+    async def _batchLoop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batchDelay
+            while len(batch) < self.maxBatch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            # One chunk per worker, so a batch costs one round trip to each
+            size = -(-len(batch) // self.workers)
+            for start in range(0, len(batch), size):
+                chunk = batch[start:start + size]
+                task = loop.run_in_executor(self.pool, _runChunk, [(kind, payload) for (kind, payload, _) in chunk],
+                                            self.maxSeconds)
+                task.add_done_callback(lambda done, chunk=chunk: self._deliver(done, chunk))
+
+    @staticmethod
+    def _deliver(done, chunk):
+        error = done.exception()
+        for (i, (_, _, future)) in enumerate(chunk):
+            if future.done():
+                continue # its client went away
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[i])
+
+    # Requests
+
+    async def schedulability(self, request):
+        """
+        Answers a /schedulability request: cached trials from the cache, the
+        others from the workers.
+        """
+        _checkRun(request)
+        backups = request.get("activeBackups", 1)
+        backups = backups if isinstance(backups, list) else [backups]
+        if len(backups) == 0:
+            raise RequestError("'activeBackups' must not be empty")
+        for numBackups in backups:
+            _checkInteger("activeBackups", numBackups, 0)
+        trials = _checkInteger("trials", request.get("trials", 20), 1)
+        if trials * len(backups) > self.maxTrials:
+            raise RequestError("{0} trials for each of {1} backup counts is over the service's limit of {2} trials".format(
+                trials, len(backups), self.maxTrials))
+        specs = sweep.buildTrials({"taskset": request["taskset"]}, backups, trials,
+                                  request.get("coreSet"), horizon=request.get("horizon", 50),
+                                  seed=request.get("seed", 0), cancelSiblings=request.get("cancelSiblings", False),
+                                  quantum=request.get("quantum"),
+                                  preemptionOverhead=request.get("preemptionOverhead", 0),
+                                  migrationOverhead=request.get("migrationOverhead", 0),
+                                  affinity=request.get("affinity", False))
+
+        results = await self._inCacheThread(self._cachedResults, specs)
+        missing = [i for (i, result) in enumerate(results) if result is None]
+        computed = await asyncio.gather(*[self._submit("trial", specs[i]) for i in missing])
+        for (i, result) in zip(missing, computed):
+            _checkResult(result)
+            results[i] = result
+        await self._inCacheThread(self._storeResults, [(specs[i], results[i]) for i in missing])
+
+        return {
+            "schedulability": sweep.summarize(results)["taskset"],
+            "missedJobs": sweep.summarize(results, "missedJobs")["taskset"],
+            "cached": len(specs) - len(missing),
+            "simulated": len(missing),
+        }
+
+    async def _inCacheThread(self, function, *args):
+        """
+        Runs a cache operation on the cache thread. The cache opens a file per
+        trial and evicting scans the whole directory, which would block every
+        other client on the event loop; one thread keeps its size count consistent.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.cacheThread, function, *args)
+
+    def _cachedResults(self, specs):
+        return [self.cache.get(spec) if self.cache is not None else None for spec in specs]
+
+    def _storeResults(self, pairs):
+        if self.cache is not None:
+            for (spec, result) in pairs:
+                self.cache.put(spec, result)
+
+    async def simulate(self, request):
+        _checkRun(request)
+        _checkInteger("activeBackups", request.get("activeBackups", 1), 0)
+        result = await self._submit("simulate", request)
+        _checkResult(result)
+        return result
+
+    async def status(self):
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "cache": await self._inCacheThread(self.cache.stats) if self.cache is not None else None,
+        }
+
+    async def _route(self, method, path, body):
+        routes = {"/schedulability": self.schedulability, "/simulate": self.simulate}
+        if path == "/status":
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            return 200, await self.status()
+        if path not in routes:
+            return 404, {"error": "no such endpoint: {0}".format(path)}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            return 400, {"error": "invalid JSON: {0}".format(e)}
+        if not isinstance(request, dict):
+            return 400, {"error": "the request must be a JSON object"}
+        try:
+            return 200, await routes[path](request)
+        except (RequestError, TaskSetError) as e:
+            return 400, {"error": str(e)}
+        except WorkerError as e:
+            return 500, {"error": str(e)}
+
+    async def _handleConnection(self, reader, writer):
+        """
+        Serves HTTP/1.1 requests on one connection until the client closes it
+        or asks to.
+        """
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                try:
+                    method, target, version = requestLine.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keepAlive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, False)
+                    break
+                if length > self.maxBody:
+                    await self._respond(writer, 413, {"error": "request body over {0} bytes".format(self.maxBody)}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, response = await self._route(method, target.split("?", 1)[0], body)
+                except Exception as e:
+                    status, response = 500, {"error": "{0}: {1}".format(type(e).__name__, e)}
+                await self._respond(writer, status, response, keepAlive)
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, response, keepAlive):
+        body = json.dumps(response, sort_keys=True).encode("utf-8")
+        head = "HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\nConnection: {3}\r\n\r\n".format(
+            status, REASONS.get(status, ""), len(body), "keep-alive" if keepAlive else "close")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
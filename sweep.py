@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+"""
+sweep.py - batch runner for schedulability experiments
+
+A sweep runs FtmGedfScheduler on every (taskset, active backups) cell for a
+number of seeded trials. It reports the fraction of trials in which every job
+met its deadline. Trials are plain dicts so they can be sent to worker
+processes, and nothing here imports pygame or matplotlib at module level.
+runBatchSweep runs the same sweep on the vectorized engine in batchsim.py, and
+compareEngines checks that the two agree.
+"""
+
+import json
+import random
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from taskset import TaskSet
+from coreset import CoreSet
+from analytics import ScheduleAnalytics
+import ftmgedf
+import batchsim
+
+DEFAULT_CORESET = {"m": 4, "num_faulty": 4, "lambda_c": 0.0}
+
+def buildTrials(tasksets, backups, trials, coreSetParams=None, horizon=50, seed=0, cancelSiblings=False,
+                quantum=None, preemptionOverhead=0, migrationOverhead=0, affinity=False):
+    """
+    Returns the list of trial specs for a sweep.
+
+    tasksets: dict of label -> taskset JSON data
+    backups: list of active backup counts to try
+    trials: number of trials per cell; trial i uses seed + i in every cell
+    coreSetParams: keyword arguments for CoreSet
+    cancelSiblings: completion policy passed to FtmGedfScheduler
+    quantum: time quantum passed to TaskSet (None picks one per taskset)
+    preemptionOverhead, migrationOverhead: in taskset time units, rounded
+    up to ticks for FtmGedfScheduler
+    affinity: dispatch policy passed to FtmGedfScheduler
+    """
+    coreSetParams = dict(coreSetParams or DEFAULT_CORESET)
+    specs = []
+    for label in tasksets:
+        for numBackups in backups:
+            for i in range(trials):
+                specs.append({
+                    "label": label,
+                    "taskset": tasksets[label],
+                    "activeBackups": numBackups,
+                    "coreSet": coreSetParams,
+                    "horizon": horizon,
+                    "seed": seed + i,
+                    "cancelSiblings": cancelSiblings,
+                    "quantum": quantum,
+                    "preemptionOverhead": preemptionOverhead,
+                    "migrationOverhead": migrationOverhead,
+                    "affinity": affinity,
+                })
+    return specs
+
+def buildShards(tasksets, backups, trials, seedsPerShard=10, seed=0):
+    """
+    Splits the trials of a sweep into shards: one (taskset label, active
+    backups) cell and a range of seeds [seedStart, seedStop) each. The shards
+    only depend on the arguments, so every host that builds them gets the
+    same list in the same order.
+    """
+    shards = []
+    for label in tasksets:
+        for numBackups in backups:
+            for start in range(seed, seed + trials, seedsPerShard):
+                shards.append({
+                    "id": "shard-{0:06d}".format(len(shards)),
+                    "label": label,
+                    "activeBackups": numBackups,
+                    "seedStart": start,
+                    "seedStop": min(start + seedsPerShard, seed + trials),
+                })
+    return shards
+
+def shardTrials(shard, tasksets, coreSetParams=None, horizon=50, cancelSiblings=False, quantum=None,
+                preemptionOverhead=0, migrationOverhead=0, affinity=False):
+    """
+    Returns the trial specs of one shard, the same ones buildTrials makes for
+    its cell and seeds.
+    """
+    coreSetParams = dict(coreSetParams or DEFAULT_CORESET)
+    return [{
+        "label": shard["label"],
+        "taskset": tasksets[shard["label"]],
+        "activeBackups": shard["activeBackups"],
+        "coreSet": coreSetParams,
+        "horizon": horizon,
+        "seed": trialSeed,
+        "cancelSiblings": cancelSiblings,
+        "quantum": quantum,
+        "preemptionOverhead": preemptionOverhead,
+        "migrationOverhead": migrationOverhead,
+        "affinity": affinity,
+    } for trialSeed in range(shard["seedStart"], shard["seedStop"])]
+
+def runTrial(spec):
+    """
+    Runs a single trial spec on a fresh TaskSet/CoreSet and returns its result.
+    """
+    random.seed(spec["seed"])
+    np.random.seed(spec["seed"])
+
+    taskSet = TaskSet(data=spec["taskset"], active_backups=spec["activeBackups"], quantum=spec.get("quantum"))
+    coreSet = CoreSet(**spec["coreSet"])
+
+    ftm = ftmgedf.FtmGedfScheduler(taskSet, coreSet, cancelSiblings=spec.get("cancelSiblings", False),
+                                   preemptionOverhead=taskSet.ceilTicks(spec.get("preemptionOverhead", 0)),
+                                   migrationOverhead=taskSet.ceilTicks(spec.get("migrationOverhead", 0)),
+                                   affinity=spec.get("affinity", False))
+    schedule = ftm.buildSchedule(0, taskSet.ceilTicks(spec["horizon"]))
+    work = ScheduleAnalytics(schedule).work()["total"]
+
+    return {
+        "label": spec["label"],
+        "activeBackups": spec["activeBackups"],
+        "seed": spec["seed"],
+        "meetsDeadlines": ftm.doesMeetDeadlines(),
+        "missedJobs": len(ftm.missedJobs),
+        "ticks": ftm.time,
+        "wastedWork": work["wasted"],
+        "executedWork": work["executed"],
+    }
+
+def runSweep(specs, workers=1, cache=None):
+    """
+    Runs every trial spec, in a process pool when workers > 1.
+    Results come back in the order of specs. With a ResultCache, only the
+    specs it has no result for are run, and their results are added to it.
+    """
+    results = [cache.get(spec) if cache is not None else None for spec in specs]
+    missing = [i for (i, result) in enumerate(results) if result is None]
+    todo = [specs[i] for i in missing]
+
+    if workers <= 1 or len(todo) <= 1:
+        computed = [runTrial(spec) for spec in todo]
+    else:
+        with Pool(workers) as pool:
+            computed = pool.map(runTrial, todo, chunksize=max(1, len(todo) // (4 * workers)))
+
+    for (i, result) in zip(missing, computed):
+        results[i] = result
+        if cache is not None:
+            cache.put(specs[i], result)
+    return results
+
+def _runBatchCell(cell):
+    return batchsim.runBatchTrials(*cell)
+
+def runBatchSweep(tasksets, backups, trials, coreSetParams=None, seed=0, cancelSiblings=False, quantum=None,
+                  workers=1):
+    """
+    Runs a sweep with batchsim.BatchGedfSimulator, every trial of a cell in
+    one batch, cells in a process pool when workers > 1. Results have the
+    statistics of runSweep's, but each cell's faults come from one generator
+    seeded with seed, so individual trials do not match any FtmGedfScheduler
+    trial (nor the cache). They therefore report "batchSeed" and "trial"
+    rather than "seed" (see batchsim.runBatchTrials).
+    """
+    coreSetParams = dict(coreSetParams or DEFAULT_CORESET)
+    cells = [(label, tasksets[label], numBackups, trials, coreSetParams, seed, cancelSiblings, quantum)
+             for label in tasksets for numBackups in backups]
+    if workers <= 1 or len(cells) <= 1:
+        cellResults = [_runBatchCell(cell) for cell in cells]
+    else:
+        with Pool(workers) as pool:
+            cellResults = pool.map(_runBatchCell, cells)
+    return [result for results in cellResults for result in results]
+
+def compareEngines(taskSetData, activeBackups, trials, coreSetParams=None, seed=0, cancelSiblings=False,
+                   quantum=None, workers=1):
+    """
+    Runs trials trials of one sweep cell on each engine and returns their
+    success rates (the fraction of trials meeting every deadline) and the
+    two-proportion z score of batch minus exact. The engines draw different
+    faults, so only the rates are comparable: |z| above 3 points to a
+    difference between the models rather than to chance.
+    """
+    exact = summarize(runSweep(buildTrials({"cell": taskSetData}, [activeBackups], trials, coreSetParams, seed=seed,
+                                           cancelSiblings=cancelSiblings, quantum=quantum), workers))
+    batch = summarize(runBatchSweep({"cell": taskSetData}, [activeBackups], trials, coreSetParams, seed=seed,
+                                    cancelSiblings=cancelSiblings, quantum=quantum))
+    exactRate, batchRate = exact["cell"][activeBackups], batch["cell"][activeBackups]
+    pooled = (exactRate + batchRate) / 2.0
+    spread = (2.0 * pooled * (1.0 - pooled) / trials) ** 0.5
+    z = (batchRate - exactRate) / spread if spread > 0 else 0.0
+    return {"exact": exactRate, "batch": batchRate, "trials": trials, "z": z}
+
+def summarize(results, metric="meetsDeadlines"):
+    """
+    Returns {label: {activeBackups: mean of metric over the trials}}; for the
+    default metric, the fraction of trials meeting all deadlines.
+    """
+    totals = {}
+    for result in results:
+        cell = totals.setdefault(result["label"], {}).setdefault(result["activeBackups"], [0, 0])
+        cell[0] += float(result[metric])
+        cell[1] += 1
+
+    summary = {}
+    for label in totals:
+        summary[label] = {}
+        for numBackups in sorted(totals[label]):
+            total, count = totals[label][numBackups]
+            summary[label][numBackups] = total / count
+    return summary
+
+def plotSummary(summary):
+    """
+    Plots schedulability against the number of backups, one line per taskset.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+
+    LINE_STYLE = ['b:+', 'g-^', 'r-s', 'c--o', 'm-.x', 'y-d']
+
+    for (styleId, label) in enumerate(summary):
+        backups = sorted(summary[label], key=int)
+        yvals = [summary[label][k] for k in backups]
+        plt.plot([int(k) for k in backups], yvals, LINE_STYLE[styleId % len(LINE_STYLE)], label=label)
+
+    plt.legend(loc="best")
+
+    plt.xlabel("Number of backups")
+    plt.ylabel("FTS-GEDF Schedulability")
+    plt.title("Number of backups for different task systems")
+
+    plt.show()
+
+if __name__ == "__main__":
+    tasksets = {}
+    for file_path in sys.argv[1:] or ["tasksets/test4.json"]:
+        with open(file_path) as json_data:
+            tasksets[file_path] = json.load(json_data)
+
+    specs = buildTrials(tasksets, backups=list(range(1, 11)), trials=20)
+    summary = summarize(runSweep(specs))
+    print(json.dumps(summary, indent=2))
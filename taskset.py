@@ -5,7 +5,9 @@ taskset.py - parser for task set from JSON file
 """
 
 import json
+import math
 import sys
+from fractions import Fraction
 
 class TaskSetJsonKeys(object):
     # Task set
@@ -27,6 +29,74 @@ class TaskSetJsonKeys(object):
     KEY_RELEASETIMES_JOBRELEASE = "timeInstant"
     KEY_RELEASETIMES_TASKID = "taskId"
 
+class TaskSetError(ValueError):
+    # Reasons in the errors list
+    MALFORMED = "malformed"
+    UNKNOWN_TASK = "unknownTask"
+    NOT_MULTIPLE = "notMultiple"
+    NOT_MONOTONIC = "notMonotonic"
+    TOO_SOON = "tooSoon"
+
+    def __init__(self, message, errors=()):
+        """
+        Invalid taskset input. errors is a list of dicts, one per problem,
+        each with a "reason" and, for releases, the "row", "taskId" and
+        "timeInstant" of the offending release.
+        """
+        ValueError.__init__(self, message)
+        self.errors = list(errors)
+
+def toFraction(value):
+    """
+    Returns a time value from the JSON data as an exact Fraction. Floats go
+    through their shortest repr, so 0.1 becomes 1/10 rather than the binary
+    approximation.
+    """
+    if isinstance(value, float):
+        return Fraction(repr(value))
+    return Fraction(value)
+
+def dataTimeValues(data):
+    """
+    Yields the time values in taskset JSON data that pick its quantum: the
+    task parameters. Schedule bounds and release instants are left out: a
+    streamed file may hold them after the tasks, where the quantum must
+    already be known, and every loader must pick the same one.
+    """
+    if not isinstance(data, dict):
+        return
+    for taskData in data.get(TaskSetJsonKeys.KEY_TASKSET, []):
+        for key in (TaskSetJsonKeys.KEY_TASK_PERIOD, TaskSetJsonKeys.KEY_TASK_WCET,
+                    TaskSetJsonKeys.KEY_TASK_DEADLINE, TaskSetJsonKeys.KEY_TASK_OFFSET):
+            if key in taskData:
+                yield taskData[key]
+
+def timeQuantum(data):
+    """
+    Returns the largest quantum, at most 1, that every task parameter in the
+    data is an integer multiple of: the GCD of 1 and all those values as
+    fractions. Task sets with integer parameters keep a quantum of 1.
+    """
+    numerator, denominator = 1, 1
+    for value in dataTimeValues(data):
+        value = abs(toFraction(value))
+        # gcd(a/b, c/d) = gcd(a*d, c*b) / (b*d), reduced by Fraction
+        quantum = Fraction(math.gcd(numerator * value.denominator, value.numerator * denominator),
+                           denominator * value.denominator)
+        numerator, denominator = quantum.numerator, quantum.denominator
+    return Fraction(numerator, denominator)
+
+def toTicks(value, quantum):
+    """
+    Returns value as an integer number of quanta, or raises ValueError if it
+    is not a multiple of the quantum.
+    """
+    ticks = toFraction(value) / quantum
+    if ticks.denominator != 1:
+        raise TaskSetError("Time value {0} is not a multiple of the time quantum {1}".format(value, quantum),
+                           [{"reason": TaskSetError.NOT_MULTIPLE, "timeInstant": value}])
+    return int(ticks)
+
 class TaskSetIterator:
     def __init__(self, taskSet):
         self.taskSet = taskSet
@@ -38,70 +108,101 @@ class TaskSetIterator:
         return self.taskSet.tasks[key]
 
 class TaskSet(object):
-    def __init__(self, data, active_backups=0):
+    def __init__(self, data, active_backups=0, quantum=None, releases=None):
+        """
+        Every time in the task set is converted to integer ticks of quantum
+        (a Fraction, or anything Fraction accepts), so the simulator runs on
+        exact integer arithmetic. quantum None picks the largest one that fits
+        the data (see timeQuantum); multiply ticks by self.quantum to get back
+        to the units of the data.
+
+        releases: iterable of (taskIds, times) array chunks to release the jobs
+        from instead of the data's releaseTimes (see releaseloader.py)
+
+        Raises TaskSetError for invalid tasks or releases.
+        """
+        self.quantum = timeQuantum(data) if quantum is None else toFraction(quantum)
+        if self.quantum <= 0:
+            raise TaskSetError("Time quantum must be positive")
         self.parseDataToTasks(data)
-        self.buildJobReleases(data)
-        print(self.jobs)
+        self.buildJobReleases(data, releases)
         self.num_active_backups = active_backups
+        # Active backups are not created up front: each primary carries a count
+        # and the queue turns one into a Job when it is dispatched. Their backup
+        # ids 1..active_backups are reserved, so passive backups start after them.
         self.backup_ids = {}
-        job_copies = []
         for job in self.jobs:
-            self.backup_ids[(job.task.id,job.id)] = 1
-            for i in range(active_backups):
-                job_copies.append(self.copyJob(job.task.id, job.id))
-        for job in job_copies:
-            self.addNewJob(job)
+            self.backup_ids[(job.task.id,job.id)] = 1 + active_backups
+            job.pendingBackups = active_backups
 
     def parseDataToTasks(self, data):
-        taskSet = {}
+        if not isinstance(data, dict) or not isinstance(data.get(TaskSetJsonKeys.KEY_TASKSET), list):
+            raise TaskSetError("Missing task set: expected a \"{0}\" list".format(TaskSetJsonKeys.KEY_TASKSET),
+                               [{"reason": TaskSetError.MALFORMED}])
 
-        try:
-            for taskData in data[TaskSetJsonKeys.KEY_TASKSET]:
-                task = Task(taskData)
+        taskSet = {}
+        for (row, taskData) in enumerate(data[TaskSetJsonKeys.KEY_TASKSET]):
+            try:
+                task = Task(taskData, self.quantum)
+            except TaskSetError:
+                raise
+            except (KeyError, TypeError, ValueError) as e:
+                raise TaskSetError("Malformed task at index {0}: {1!r}".format(row, e), [{"reason": TaskSetError.MALFORMED, "row": row}])
 
-                if task.id in taskSet:
-                    print("Error: duplicate task ID: {0}".format(task.id))
-                    return
+            if task.id in taskSet:
+                raise TaskSetError("Duplicate task ID: {0}".format(task.id), [{"reason": TaskSetError.MALFORMED, "row": row, "taskId": task.id}])
 
-                if task.period < 0 and task.relativeDeadline < 0:
-                    print("Error: aperiodic task must have positive relative deadline")
-                    return
+            if task.period < 0 and task.relativeDeadline < 0:
+                raise TaskSetError("Aperiodic task {0} must have a positive relative deadline".format(task.id),
+                                   [{"reason": TaskSetError.MALFORMED, "row": row, "taskId": task.id}])
 
-                taskSet[task.id] = task
-        except:
-            self.tasks = data
-            return
+            taskSet[task.id] = task
 
         self.tasks = taskSet
 
-    def buildJobReleases(self, data):
-        jobs = []
+    def buildJobReleases(self, data, releases=None):
+        if releases is None and TaskSetJsonKeys.KEY_RELEASETIMES in data:  # necessary for sporadic releases
+            from releaseloader import releaseChunks
+            releases = releaseChunks(data[TaskSetJsonKeys.KEY_RELEASETIMES])
 
+        if releases is not None:
+            self.jobs = []
+            self.addReleases(releases)
+            return
 
-        if TaskSetJsonKeys.KEY_RELEASETIMES in data:  # necessary for sporadic releases
-            for jobRelease in data[TaskSetJsonKeys.KEY_RELEASETIMES]:
-                releaseTime = float(jobRelease[TaskSetJsonKeys.KEY_RELEASETIMES_JOBRELEASE])
-                taskId = int(jobRelease[TaskSetJsonKeys.KEY_RELEASETIMES_TASKID])
-
-                job = self.getTaskById(taskId).spawnJob(releaseTime)
-                jobs.append(job)
-        else:
-            scheduleStartTime = float(data[TaskSetJsonKeys.KEY_SCHEDULE_START])
-            scheduleEndTime = float(data[TaskSetJsonKeys.KEY_SCHEDULE_END])
-            for task in self:
-                t = max(task.offset, scheduleStartTime)
-                while t < scheduleEndTime:
-                    job = task.spawnJob(t)
-                    if job is not None:
-                        jobs.append(job)
-
-                    if task.period >= 0:
-                        t += task.period # periodic
-                    else:
-                        t = scheduleEndTime # aperiodic
+        jobs = []
+        # The bounds do not pick the quantum, so they round up to the first tick in range
+        scheduleStartTime = self.ceilTicks(data[TaskSetJsonKeys.KEY_SCHEDULE_START])
+        scheduleEndTime = self.ceilTicks(data[TaskSetJsonKeys.KEY_SCHEDULE_END])
+        for task in self:
+            t = max(task.offset, scheduleStartTime)
+            while t < scheduleEndTime:
+                jobs.append(task.spawnJob(t))
+
+                if task.period >= 0:
+                    t += task.period # periodic
+                else:
+                    t = scheduleEndTime # aperiodic
 
         self.jobs = jobs
 
+    def addReleases(self, chunks, maxErrors=100):
+        """
+        Adds a job for each release in chunks of (taskIds, times) arrays, in
+        order. Every release is checked first (see ReleaseValidator); if any
+        is invalid, raises TaskSetError listing up to maxErrors of them.
+        """
+        from releaseloader import ReleaseValidator
+
+        validator = ReleaseValidator(self, maxErrors)
+        for (taskIds, times) in chunks:
+            ticks, valid = validator.check(taskIds, times)
+            if validator.errorCount:
+                continue # the load fails anyway; keep checking to report every error
+            for (taskId, releaseTime) in zip(taskIds.tolist(), ticks.tolist()):
+                self.jobs.append(self.tasks[taskId].addJob(releaseTime))
+        validator.raiseIfInvalid()
+
     def __contains__(self, elt):
         return elt in self.tasks
 
@@ -114,6 +215,18 @@ class TaskSet(object):
     def getTaskById(self, taskId):
         return self.tasks[taskId]
 
+    def ceilTicks(self, time):
+        """
+        Returns a time in the units of the task set data as ticks, rounded up.
+        """
+        return math.ceil(toFraction(time) / self.quantum)
+
+    def toTime(self, ticks):
+        """
+        Returns a number of ticks in the units of the task set data.
+        """
+        return float(ticks * self.quantum)
+
     def printTasks(self):
         print("\nTask Set:")
         for task in self:
@@ -146,27 +259,35 @@ class TaskSet(object):
                 task.jobs.append(newJob)
 
 class Task(object):
-    def __init__(self, taskDict):
+    def __init__(self, taskDict, quantum=1):
+        # All times are integer ticks of quantum
         self.id = int(taskDict[TaskSetJsonKeys.KEY_TASK_ID])
-        self.period = float(taskDict[TaskSetJsonKeys.KEY_TASK_PERIOD])
-        self.wcet = float(taskDict[TaskSetJsonKeys.KEY_TASK_WCET])
-        self.relativeDeadline = float(taskDict.get(TaskSetJsonKeys.KEY_TASK_DEADLINE, taskDict[TaskSetJsonKeys.KEY_TASK_PERIOD]))
-        self.offset = float(taskDict.get(TaskSetJsonKeys.KEY_TASK_OFFSET, 0.0))
+        self.period = toTicks(taskDict[TaskSetJsonKeys.KEY_TASK_PERIOD], quantum)
+        self.wcet = toTicks(taskDict[TaskSetJsonKeys.KEY_TASK_WCET], quantum)
+        self.relativeDeadline = toTicks(taskDict.get(TaskSetJsonKeys.KEY_TASK_DEADLINE, taskDict[TaskSetJsonKeys.KEY_TASK_PERIOD]), quantum)
+        self.offset = toTicks(taskDict.get(TaskSetJsonKeys.KEY_TASK_OFFSET, 0), quantum)
 
         self.lastJobId = 0
-        self.lastReleasedTime = 0.0
+        self.lastReleasedTime = 0
 
         self.jobs = []
 
     def spawnJob(self, releaseTime):
         if self.lastReleasedTime > 0 and releaseTime < self.lastReleasedTime:
-            print("INVALID: release time of job is not monotonic")
-            return None
+            raise TaskSetError("Release of task {0} at {1} is before its previous release".format(self.id, releaseTime),
+                               [{"reason": TaskSetError.NOT_MONOTONIC, "taskId": self.id, "timeInstant": releaseTime}])
 
         if self.lastReleasedTime > 0 and releaseTime < self.lastReleasedTime + self.period:
-            print("INVALID: release times are not separated by period")
-            return None
+            raise TaskSetError("Releases of task {0} at {1} are less than a period apart".format(self.id, releaseTime),
+                               [{"reason": TaskSetError.TOO_SOON, "taskId": self.id, "timeInstant": releaseTime}])
+
+        return self.addJob(releaseTime)
 
+    def addJob(self, releaseTime):
+        """
+        Releases the next job without spawnJob's checks, for releases that
+        were already validated.
+        """
         self.lastJobId += 1
         self.lastReleasedTime = releaseTime
 
@@ -196,7 +317,7 @@ class Task(object):
         return "task {0}: (Φ,T,C,D) = ({1}, {2}, {3}, {4})".format(self.id, self.offset, self.period, self.wcet, self.relativeDeadline)
 
 class Job(object):
-    def __init__(self, task, jobId, releaseTime, backupId, remainingTime=None):
+    def __init__(self, task, jobId, releaseTime, backupId, remainingTime=None, pendingBackups=0):
         self.task = task
         self.id = jobId
         self.releaseTime = releaseTime
@@ -204,6 +325,10 @@ class Job(object):
 
         self.remainingTime = self.task.wcet
         self.backupId = backupId
+        # active backups of this job that have not been dispatched yet (ids backupId+1 ...)
+        self.pendingBackups = pendingBackups
+        # core this copy last ran on; None until it is first dispatched
+        self.lastCoreId = None
 
     def execute(self, time):
         executionTime = min(self.remainingTime, time)
@@ -216,8 +341,18 @@ class Job(object):
     def isCompleted(self):
         return self.remainingTime == 0
 
-    def createCopy(self, backupId):
-        return Job(self.task, self.id, self.releaseTime, backupId)
+    def createCopy(self, backupId, pendingBackups=0):
+        return Job(self.task, self.id, self.releaseTime, backupId, pendingBackups=pendingBackups)
+
+    def takeBackup(self):
+        """
+        Returns this job's next pending active backup as a Job of its own,
+        still owning the rest of the pending backups, and clears the count on
+        this one. Only called for a job with pendingBackups > 0.
+        """
+        backup = self.createCopy(self.backupId + 1, self.pendingBackups - 1)
+        self.pendingBackups = 0
+        return backup
 
     def __str__(self):
         return "[{0}:{1}:{4}] released at {2} -> deadline at {3}".format(self.task.id, self.id, self.releaseTime, self.deadline,self.backupId)
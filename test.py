@@ -1,13 +1,13 @@
-import pygame
 from taskset import TaskSetJsonKeys, Task, TaskSet
 from coreset import CoreSet
 import ftmgedf as f
 
-import matplotlib.pyplot as plt
 import random
 import json
 
 def plotResults(vals, results):
+    import matplotlib.pyplot as plt
+
     plt.figure()
 
     LINE_STYLE = ['b:+', 'g-^', 'r-s']
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+workqueue.py - sweeps sharded over many hosts through a shared directory
+
+A sweep is split into shards (see sweep.buildShards) that are written as
+files to a queue directory on a shared filesystem. Any number of workers, on
+any hosts, claim shards by renaming them, run them and write their results
+next to them; a merge step combines the results. There is no server and no
+lock: every state change is a single rename, which POSIX filesystems (and
+NFS) perform atomically, so exactly one worker wins each claim.
+
+Layout of the queue directory:
+    manifest.json        sweep parameters and taskset data, written once
+    pending/<id>.json    shards waiting for a worker
+    claimed/<id>.json@<worker>
+                         shards being run; the file's mtime is the lease,
+                         renewed after every trial
+    results/<id>.json    trial results of finished shards
+
+A claim whose lease is older than leaseSeconds is put back in pending/. Trials
+are deterministic per seed, so if a slow worker finishes a shard that was
+given to another one, both write the same results and either copy is kept.
+
+ShardQueue: the queue directory
+runWorker: claims and runs shards until none are left
+mergeResults: the trial results of a set of result files, in sweep order
+mergeQueue: the merged results of a queue directory and their summary
+"""
+
+import hashlib
+import json
+import os
+import socket
+import time
+import uuid
+
+import sweep
+
+class ShardQueue(object):
+    MANIFEST = "manifest.json"
+    PENDING = "pending"
+    CLAIMED = "claimed"
+    RESULTS = "results"
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pendingDir = os.path.join(directory, ShardQueue.PENDING)
+        self.claimedDir = os.path.join(directory, ShardQueue.CLAIMED)
+        self.resultsDir = os.path.join(directory, ShardQueue.RESULTS)
+
+    @staticmethod
+    def create(directory, tasksets, backups, trials, coreSetParams=None, horizon=50, seed=0,
+               cancelSiblings=False, quantum=None, preemptionOverhead=0, migrationOverhead=0, affinity=False,
+               seedsPerShard=10):
+        """
+        Writes the manifest and one pending file per shard. Fails if the
+        directory already holds a sweep.
+        """
+        queue = ShardQueue(directory)
+        manifestPath = os.path.join(directory, ShardQueue.MANIFEST)
+        if os.path.exists(manifestPath):
+            raise FileExistsError("{0} already holds a sweep".format(directory))
+        for path in (queue.pendingDir, queue.claimedDir, queue.resultsDir):
+            os.makedirs(path, exist_ok=True)
+
+        manifest = {
+            "tasksets": tasksets,
+            "backups": list(backups),
+            "trials": trials,
+            "seed": seed,
+            "seedsPerShard": seedsPerShard,
+            "coreSet": dict(coreSetParams or sweep.DEFAULT_CORESET),
+            "horizon": horizon,
+            "cancelSiblings": cancelSiblings,
+            "quantum": quantum,
+            "preemptionOverhead": preemptionOverhead,
+            "migrationOverhead": migrationOverhead,
+            "affinity": affinity,
+        }
+        shards = sweep.buildShards(tasksets, backups, trials, seedsPerShard, seed)
+        for shard in shards:
+            shard["id"] = shardId(manifest, shard)
+        manifest["shards"] = [shard["id"] for shard in shards]
+        for shard in shards:
+            _writeJson(os.path.join(queue.pendingDir, shard["id"] + ".json"), shard)
+        # Workers start from the manifest, so it goes last: they never see half a queue
+        _writeJson(manifestPath, manifest, exclusive=True)
+        return queue
+
+    def manifest(self):
+        with open(os.path.join(self.directory, ShardQueue.MANIFEST)) as f:
+            return json.load(f)
+
+    def claim(self, workerId):
+        """
+        Moves one pending shard to claimed/ and returns (shard, claim path),
+        or None if no shard is pending. Losing a race for a shard just moves
+        on to the next one.
+        """
+        for name in sorted(os.listdir(self.pendingDir)):
+            if not name.endswith(".json"):
+                continue
+            pendingPath = os.path.join(self.pendingDir, name)
+            claimPath = os.path.join(self.claimedDir, "{0}@{1}".format(name, workerId))
+            try:
+                # A rename keeps the mtime, so start the lease first or the
+                # claim could look expired the moment it lands in claimed/
+                os.utime(pendingPath)
+                os.rename(pendingPath, claimPath)
+            except FileNotFoundError:
+                continue # another worker claimed it first
+            if os.path.exists(os.path.join(self.resultsDir, name)):
+                os.remove(claimPath) # requeued, but its first worker finished it after all
+                continue
+            with open(claimPath) as f:
+                return json.load(f), claimPath
+        return None
+
+    def renew(self, claimPath):
+        """
+        Extends a lease. Returns False if the claim has expired and was taken back.
+        """
+        try:
+            os.utime(claimPath)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, shard, claimPath, results):
+        _writeJson(os.path.join(self.resultsDir, shard["id"] + ".json"), {"shard": shard, "results": results})
+        try:
+            os.remove(claimPath)
+        except FileNotFoundError:
+            pass # expired and requeued meanwhile; requeueExpired drops it
+
+    def requeueExpired(self, leaseSeconds):
+        """
+        Puts claims whose lease ran out back in pending/ (or drops them if the
+        shard has finished anyway) and returns how many were requeued.
+        """
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(self.claimedDir):
+            claimPath = os.path.join(self.claimedDir, name)
+            shardName = name.rsplit("@", 1)[0]
+            try:
+                if now - os.stat(claimPath).st_mtime <= leaseSeconds:
+                    continue
+                if os.path.exists(os.path.join(self.resultsDir, shardName)):
+                    os.remove(claimPath)
+                else:
+                    os.rename(claimPath, os.path.join(self.pendingDir, shardName))
+                    requeued += 1
+            except FileNotFoundError:
+                continue # renewed into completion or requeued by another worker
+        return requeued
+
+    def status(self):
+        """
+        Returns the number of shards per state.
+        """
+        def count(path):
+            return sum(1 for name in os.listdir(path) if name.endswith(".json") or ".json@" in name)
+        return {
+            "pending": count(self.pendingDir),
+            "claimed": count(self.claimedDir),
+            "done": count(self.resultsDir),
+            "total": len(self.manifest()["shards"]),
+        }
+
+    def isDone(self):
+        status = self.status()
+        return status["done"] >= status["total"]
+
+# Manifest fields that do not change the result of a trial
+NON_RESULT_FIELDS = ("tasksets", "backups", "trials", "seed", "seedsPerShard", "shards")
+
+def shardId(manifest, shard):
+    """
+    Returns an id for a shard that only depends on the trials it runs: a hash
+    of its taskset data, active backups and the sweep's settings, and its
+    seeds. buildShards numbers the shards of every sweep from 0, so results
+    copied from several queues would collide on those ids; with these, two
+    shards share an id only if they give the same results.
+    """
+    key = dict((name, value) for (name, value) in manifest.items() if name not in NON_RESULT_FIELDS)
+    key["taskset"] = manifest["tasksets"][shard["label"]]
+    key["label"] = shard["label"]
+    key["activeBackups"] = shard["activeBackups"]
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return "shard-{0}-{1}-{2}".format(digest, shard["seedStart"], shard["seedStop"])
+
+def defaultWorkerId():
+    return "{0}-{1}-{2}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+def runWorker(directory, workerId=None, leaseSeconds=600, wait=False, poll=5, cache=None):
+    """
+    Claims and runs shards until none is pending and returns how many this
+    worker finished. Expired claims of crashed workers are run again. With
+    wait, keeps polling while other workers still hold claims, so the last
+    shard is retried if its worker dies. Trials found in cache (a
+    ResultCache, e.g. one per host) are not run again.
+    """
+    queue = ShardQueue(directory)
+    manifest = queue.manifest()
+    workerId = workerId or defaultWorkerId()
+
+    finished = 0
+    while True:
+        claimed = queue.claim(workerId)
+        if claimed is None:
+            if queue.requeueExpired(leaseSeconds) > 0:
+                continue
+            if wait and not queue.isDone():
+                time.sleep(poll)
+                continue
+            return finished
+
+        shard, claimPath = claimed
+        results = []
+        for spec in sweep.shardTrials(shard, manifest["tasksets"], manifest["coreSet"], manifest["horizon"],
+                                      manifest["cancelSiblings"], manifest["quantum"],
+                                      preemptionOverhead=manifest.get("preemptionOverhead", 0),
+                                      migrationOverhead=manifest.get("migrationOverhead", 0),
+                                      affinity=manifest.get("affinity", False)):
+            results.extend(sweep.runSweep([spec], cache=cache))
+            queue.renew(claimPath)
+        queue.complete(shard, claimPath, results)
+        finished += 1
+
+def mergeResults(paths, manifest=None):
+    """
+    Combines result files (a queue directory's results/*.json, or files
+    copied from several of them) into one list of trial results ordered by
+    label, active backups and seed. Duplicated shards are kept once. Given the
+    manifest, raises ValueError if any of its shards has no result or if a
+    result file belongs to another sweep.
+    """
+    shards = {}
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        shards[data["shard"]["id"]] = data
+
+    if manifest is not None:
+        ownShards = set(manifest["shards"])
+        foreign = [shardId for shardId in shards if shardId not in ownShards]
+        if foreign:
+            raise ValueError("{0} result file(s) are not from this sweep, e.g. shard {1}".format(len(foreign), foreign[0]))
+        missing = [shardId for shardId in manifest["shards"] if shardId not in shards]
+        if missing:
+            raise ValueError("{0} of {1} shards have no results, e.g. {2}".format(len(missing), len(manifest["shards"]), missing[0]))
+
+    labels = list(manifest["tasksets"]) if manifest is not None else sorted(set(d["shard"]["label"] for d in shards.values()))
+    order = dict((label, i) for (i, label) in enumerate(labels))
+    results = [result for data in shards.values() for result in data["results"]]
+    results.sort(key=lambda r: (order[r["label"]], r["activeBackups"], r["seed"]))
+    return results
+
+def mergeQueue(directory, extraPaths=(), allowPartial=False):
+    """
+    Returns (results, summary) for a queue directory plus any extra result files.
+    """
+    queue = ShardQueue(directory)
+    paths = [os.path.join(queue.resultsDir, name) for name in sorted(os.listdir(queue.resultsDir)) if name.endswith(".json")]
+    manifest = queue.manifest()
+    results = mergeResults(paths + list(extraPaths), None if allowPartial else manifest)
+    return results, sweep.summarize(results)
+
+def _writeJson(path, data, exclusive=False):
+    """
+    Writes data to a temporary file and renames it into place, so readers
+    never see a partial file. With exclusive, fails if path exists.
+    """
+    temporary = "{0}.tmp-{1}".format(path, uuid.uuid4().hex)
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    if exclusive:
+        try:
+            os.link(temporary, path) # fails if path exists, unlike rename
+        finally:
+            os.remove(temporary)
+    else:
+        os.replace(temporary, path)